@@ -10,14 +10,18 @@ def main() -> int:
         print('No arguments provided. Use -h or --help for help.')
         return 1
     if sys.argv[1] == '-h' or sys.argv[1] == '--help':
-        print('Usage: python -m materialxgltf <command> [options] where command is mtlx2gltf or gltf2mtlx')
+        print('Usage: python -m materialxgltf <command> [options] where command is mtlx2gltf, gltf2mtlx, benchmark or roundtrip')
 
     # Check if the command is valid
     cmdArgs = sys.argv[1:]
     if cmdArgs[0] == 'mtlx2gltf':
         cmdArgs[0] = 'mtlx2gltf.py'
     elif cmdArgs[0] == 'gltf2mtlx':
-        cmdArgs[0] = 'gltf2mtlx.py'
+        cmdArgs[0] = 'gltf2Mtlx.py'
+    elif cmdArgs[0] == 'benchmark':
+        cmdArgs[0] = 'benchmark.py'
+    elif cmdArgs[0] == 'roundtrip':
+        cmdArgs[0] = 'roundtrip.py'
     else:
         print('Unknown command specified:', cmdArgs[0])
         return 1
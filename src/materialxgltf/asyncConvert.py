@@ -0,0 +1,259 @@
+# asyncConvert.py
+
+'''
+@file
+This module contains asyncio entry points for MaterialX glTF conversion.
+
+Blocking MaterialX work is run on a managed thread pool executor while file reads and writes,
+including image reads when packaging binary glTF files, are issued concurrently.
+'''
+import asyncio, threading
+from concurrent.futures import ThreadPoolExecutor
+
+import MaterialX as mx # type: ignore
+from pygltflib import GLTF2 # type: ignore
+
+from materialxgltf.core import *
+
+class AsyncConverter:
+    '''
+    @brief Class to run glTF to MaterialX and MaterialX to glTF conversions from asyncio code.
+
+    The number of conversions running at once is bounded by a concurrency limit. Callers which
+    issue more conversions wait until a slot is free, which provides backpressure.
+    Cancelling a task which is awaiting a conversion requests the conversion to stop.
+    Cancellation takes effect between materials.
+    '''
+    def __init__(self, maxConcurrency=4, maxWorkers=None):
+        '''
+        @brief Constructor.
+        @param maxConcurrency Maximum number of conversions to run at once. Default is 4.
+        @param maxWorkers Maximum number of executor threads used for conversion and file I/O.
+        Default is twice the concurrency limit.
+        '''
+        self._maxConcurrency = max(1, maxConcurrency)
+        if not maxWorkers:
+            maxWorkers = 2 * self._maxConcurrency
+        self._executor = ThreadPoolExecutor(max_workers=maxWorkers, thread_name_prefix='materialxgltf')
+        # Created on first use so that it is bound to the running event loop
+        self._semaphore = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, excType, excValue, traceback):
+        await asyncio.get_running_loop().run_in_executor(None, self.close)
+
+    def close(self, wait=True):
+        '''
+        @brief Shut down the executor used by the converter.
+        @param wait Wait for running work to finish. Default is True.
+        '''
+        self._executor.shutdown(wait=wait)
+
+    def getMaxConcurrency(self) -> int:
+        '''
+        @brief Get the maximum number of conversions which can run at once.
+        @return The concurrency limit.
+        '''
+        return self._maxConcurrency
+
+    def _getSemaphore(self) -> asyncio.Semaphore:
+        if not self._semaphore:
+            self._semaphore = asyncio.Semaphore(self._maxConcurrency)
+        return self._semaphore
+
+    async def run(self, func, *args):
+        '''
+        @brief Run a blocking function on the converter's executor.
+        @param func The function to run.
+        @param args Arguments to pass to the function.
+        @return The result of the function.
+        '''
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, func, *args)
+
+    async def runCancellable(self, converter, func, *args):
+        '''
+        @brief Run a blocking conversion function on the converter's executor.
+        If the awaiting task is cancelled the conversion is asked to stop at the next material,
+        and the task waits for the worker to finish before the cancellation is propagated.
+        @param converter The GLTF2MtlxReader or MTLX2GLTFWriter performing the conversion.
+        @param func The function to run.
+        @param args Arguments to pass to the function.
+        @return The result of the function.
+        '''
+        cancelEvent = threading.Event()
+        converter.setCancelEvent(cancelEvent)
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(self._executor, func, *args)
+        try:
+            return await asyncio.shield(future)
+        except asyncio.CancelledError:
+            cancelEvent.set()
+            await asyncio.wait([future])
+            raise
+        finally:
+            converter.setCancelEvent(None)
+
+    @staticmethod
+    def _readFile(fileName, binary):
+        with open(fileName, 'rb' if binary else 'r') as f:
+            return f.read()
+
+    @staticmethod
+    def _writeFile(fileName, data):
+        with open(fileName, 'wb' if isinstance(data, bytes) else 'w') as f:
+            f.write(data)
+
+    async def readFile(self, fileName, binary=False):
+        '''
+        @brief Read a file without blocking the event loop.
+        @param fileName The file to read.
+        @param binary Read the file as bytes. Default is to read as text.
+        @return The file contents.
+        '''
+        return await self.run(self._readFile, fileName, binary)
+
+    async def writeFile(self, fileName, data):
+        '''
+        @brief Write a file without blocking the event loop.
+        @param fileName The file to write.
+        @param data String or bytes to write.
+        '''
+        await self.run(self._writeFile, fileName, data)
+
+    async def gltf2Mtlx(self, gltfFileName, mtlxFileName='', options=None) -> mx.Document:
+        '''
+        @brief Convert a glTF file to a MaterialX document.
+        @param gltfFileName Path to glTF file to convert
+        @param mtlxFileName Optional path to MaterialX file to write
+        @param options Options for conversion. Default options are used if not specified.
+        @return The converted MaterialX document if successful, otherwise None.
+        '''
+        async with self._getSemaphore():
+            reader = GLTF2MtlxReader()
+            reader.setOptions(options if options else GLTF2MtlxOptions())
+            gltfData = await self.readFile(gltfFileName, True)
+            doc = await self.runCancellable(reader, reader.convertString, gltfData)
+            if doc and mtlxFileName:
+                mtlxString = await self.run(Util.writeMaterialXDocString, doc)
+                await self.writeFile(mtlxFileName, mtlxString)
+            return doc
+
+    def _loadMaterialXDoc(self, mtlxString, searchPath) -> mx.Document:
+        doc, libFiles = Util.createMaterialXDoc()
+        mx.readFromXmlString(doc, mtlxString, searchPath)
+        return doc
+
+    def _foldConstants(self, writer, doc) -> mx.Document:
+        foldedCount = writer.foldConstants(doc)
+        writer.log('- Folded %d constant inputs.' % foldedCount)
+        return doc
+
+    def _translateAndBake(self, writer, doc, materialXFileName) -> mx.Document:
+        options = writer.getOptions()
+        translatedCount = writer.translateShaders(doc)
+        writer.log('- Translated %d shaders.' % translatedCount)
+        if options['bakeTextures'] and not writer.isCancelled():
+            bakedFileName = materialXFileName + '_baked.mtlx'
+            bakeResolution = options['bakeResolution'] if options['bakeResolution'] else 256
+            writer.bakeTextures(doc, False, bakeResolution, bakeResolution, False,
+                                False, False, bakedFileName)
+            writer.log('- Baked textures to: ' + bakedFileName)
+            doc, libFiles = Util.createMaterialXDoc()
+            mx.readFromXmlFile(doc, bakedFileName, options['searchPath'])
+            if Util.makeFilePathsRelative(doc, bakedFileName):
+                Util.writeMaterialXDoc(doc, bakedFileName)
+        return doc
+
+    async def mtlx2gltf(self, materialXFileName, gltfOutputFileName, options=None) -> tuple[bool, str]:
+        '''
+        @brief Convert a MaterialX file to a glTF file.
+        @param materialXFileName Path to MaterialX file to convert
+        @param gltfOutputFileName Path to glTF file to write
+        @param options Options for conversion. Default options are used if not specified.
+        @return status, error log.
+        '''
+        if not options:
+            options = MTLX2GLTFOptions()
+
+        async with self._getSemaphore():
+            writer = MTLX2GLTFWriter()
+            writer.setOptions(options)
+
+            mtlxString = await self.readFile(materialXFileName)
+            doc = await self.run(self._loadMaterialXDoc, mtlxString, options['searchPath'])
+
+            # Replace pattern graphs which evaluate to constants before translation and baking
+            if options['foldConstants']:
+                doc = await self.run(self._foldConstants, writer, doc)
+
+            if options['translateShaders']:
+                doc = await self.runCancellable(writer, self._translateAndBake, writer, doc, materialXFileName)
+
+            gltfJson = await self.runCancellable(writer, writer.convertToJson, doc)
+            if gltfJson is None:
+                return False, writer.getLog()
+            await self.run(Util.writeGLTFFile, gltfJson, gltfOutputFileName, options['compactJson'])
+
+            if options['packageBinary']:
+                binaryFileName = str(gltfOutputFileName).replace('.gltf', '.glb')
+                saved, images, buffers = await self.packageGLTF(writer, gltfOutputFileName, binaryFileName)
+                if not saved:
+                    return False, writer.getLog()
+
+            return True, ''
+
+    async def packageGLTF(self, writer, inputFile, outputFile) -> tuple[bool, list, list]:
+        '''
+        @brief Package a glTF file into a glb file. Referenced images are read concurrently.
+        @param writer The MTLX2GLTFWriter whose options provide the search path.
+        @param inputFile gltf file to package
+        @param outputFile Packaged glb file
+        @return status, image list, buffer list.
+        '''
+        gltf = await self.run(GLTF2.load, inputFile)
+        if not gltf:
+            return False, [], []
+        images, buffers = await self.run(writer.resolvePackageUris, gltf)
+
+        # Read all image files at once. Relative paths are resolved against the glTF file.
+        imageData = {}
+        parentPath = mx.FilePath(inputFile).getParentPath()
+        imagePaths = {}
+        for uri in images:
+            if uri and not uri.startswith('data:') and uri not in imagePaths:
+                filePath = mx.FilePath(uri)
+                if not filePath.isAbsolute():
+                    filePath = parentPath / filePath
+                if filePath.exists():
+                    imagePaths[uri] = filePath.asString()
+        contents = await asyncio.gather(*[self.readFile(path, True) for path in imagePaths.values()])
+        for uri, data in zip(imagePaths.keys(), contents):
+            imageData[uri] = data
+
+        saved = await self.run(writer.writeGLTFPackage, gltf, outputFile, imageData)
+        return saved, images, buffers
+
+async def gltf2MtlxAsync(gltfFileName, mtlxFileName='', options=None) -> mx.Document:
+    '''
+    @brief Utility to convert a glTF file to MaterialX using a temporary AsyncConverter.
+    @param gltfFileName Path to glTF file to convert
+    @param mtlxFileName Optional path to MaterialX file to write
+    @param options Options for conversion
+    @return The converted MaterialX document if successful, otherwise None.
+    '''
+    async with AsyncConverter(1) as converter:
+        return await converter.gltf2Mtlx(gltfFileName, mtlxFileName, options)
+
+async def mtlx2gltfAsync(materialXFileName, gltfOutputFileName, options=None) -> tuple[bool, str]:
+    '''
+    @brief Utility to convert a MaterialX file to glTF using a temporary AsyncConverter.
+    @param materialXFileName Path to MaterialX file to convert
+    @param gltfOutputFileName Path to glTF file to write
+    @param options Options for conversion
+    @return status, error log.
+    '''
+    async with AsyncConverter(1) as converter:
+        return await converter.mtlx2gltf(materialXFileName, gltfOutputFileName, options)
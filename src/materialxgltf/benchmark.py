@@ -0,0 +1,781 @@
+#!/usr/bin/env python
+# benchmark.py
+
+'''
+@file
+This module contains benchmarks for MaterialX glTF conversion.
+
+Synthetic glTF documents are generated with a configurable number of materials, textures,
+samplers, extensions, node depth and instances. The reader is run over a sweep of one of these
+parameters and the throughput, time per conversion phase and peak memory of each run are
+reported as JSON. A scaling exponent is fit per phase so that super-linear behavior shows up
+as an exponent noticeably greater than 1.
+
+The writer is measured with scenarios built from generated MaterialX documents and textures,
+covering material translation, metallic-roughness image merging, sampler reuse, procedural
+graph export, primitive creation per material and binary packaging.
+'''
+import argparse, concurrent.futures, contextlib, copy, json, math, multiprocessing, os, shutil, sys, tempfile, time, tracemalloc
+try:
+    import resource
+except ImportError:
+    resource = None
+
+import MaterialX as mx # type: ignore
+from MaterialX import PyMaterialXRender as mx_render # type: ignore
+
+from materialxgltf.core import *
+import materialxgltf
+
+# Version of the JSON report layout. Increment when the layout changes.
+BENCHMARK_SCHEMA_VERSION = 3
+
+# Texture slots used for generated materials, in the order they are added
+SYNTHETIC_TEXTURE_SLOTS = ['baseColorTexture', 'metallicRoughnessTexture', 'normalTexture', 'occlusionTexture', 'emissiveTexture']
+
+# Material extensions which can be added to generated materials
+SYNTHETIC_EXTENSIONS = ['KHR_materials_clearcoat', 'KHR_materials_sheen', 'KHR_materials_ior', 'KHR_materials_transmission',
+                        'KHR_materials_volume', 'KHR_materials_specular', 'KHR_materials_emissive_strength', 'KHR_materials_iridescence']
+
+class SyntheticGLTFOptions(dict):
+    '''
+    @brief Class to hold options for generating a synthetic glTF document.
+    Available options:
+        - 'materialCount' : Number of materials. Default is 100.
+        - 'textureCount' : Number of textures per material, up to 5. Default is 3.
+        - 'samplerCount' : Number of distinct samplers shared by all textures. Default is 1.
+        - 'extensionCount' : Number of material extensions per material, up to 8. Default is 3.
+        - 'nodeDepth' : Number of nodes from a scene root to each mesh instance. Default is 1.
+        - 'instanceCount' : Number of mesh instances per material. Default is 1.
+        - 'primitiveCount' : Number of primitives per mesh. Default is 1.
+    '''
+    def __init__(self, *args, **kwargs):
+        '''
+        @brief Constructor
+        '''
+        super().__init__(*args, **kwargs)
+
+        self['materialCount'] = 100
+        self['textureCount'] = 3
+        self['samplerCount'] = 1
+        self['extensionCount'] = 3
+        self['nodeDepth'] = 1
+        self['instanceCount'] = 1
+        self['primitiveCount'] = 1
+
+def generateExtension(extensionName, value) -> dict:
+    '''
+    @brief Generate the parameters of a material extension.
+    @param extensionName The name of the extension.
+    @param value A value in the range 0 to 1 used to vary the parameters.
+    @return Dictionary of extension parameters.
+    '''
+    if extensionName == 'KHR_materials_clearcoat':
+        return {'clearcoatFactor': value, 'clearcoatRoughnessFactor': 1.0 - value}
+    if extensionName == 'KHR_materials_sheen':
+        return {'sheenColorFactor': [value, 0.5, 1.0 - value], 'sheenRoughnessFactor': value}
+    if extensionName == 'KHR_materials_ior':
+        return {'ior': 1.0 + value}
+    if extensionName == 'KHR_materials_transmission':
+        return {'transmissionFactor': value}
+    if extensionName == 'KHR_materials_volume':
+        return {'thicknessFactor': value, 'attenuationColor': [1.0, value, value], 'attenuationDistance': 1.0 + value}
+    if extensionName == 'KHR_materials_specular':
+        return {'specularFactor': value, 'specularColorFactor': [value, value, 1.0]}
+    if extensionName == 'KHR_materials_emissive_strength':
+        return {'emissiveStrength': 1.0 + value}
+    if extensionName == 'KHR_materials_iridescence':
+        return {'iridescenceFactor': value, 'iridescenceIor': 1.3, 'iridescenceThicknessMinimum': 100.0,
+                'iridescenceThicknessMaximum': 100.0 + 300.0 * value}
+    return {}
+
+def generateGLTF(options=None) -> dict:
+    '''
+    @brief Generate a synthetic glTF document.
+    Each material has a unique set of factors and images so that no two materials are identical.
+    Each material is assigned to one mesh, which is instanced by a chain of nodes below a scene root.
+    Image and buffer data is not generated as the reader only examines the JSON.
+    @param options The SyntheticGLTFOptions to use. Default options are used if not specified.
+    @return The glTF document.
+    '''
+    if not options:
+        options = SyntheticGLTFOptions()
+    materialCount = options['materialCount']
+    textureCount = min(options['textureCount'], len(SYNTHETIC_TEXTURE_SLOTS))
+    samplerCount = max(options['samplerCount'], 1)
+    extensionCount = min(options['extensionCount'], len(SYNTHETIC_EXTENSIONS))
+    nodeDepth = max(options['nodeDepth'], 1)
+    instanceCount = options['instanceCount']
+    primitiveCount = max(options['primitiveCount'], 1)
+
+    wrapModes = [10497, 33071, 33648]
+    filterModes = [9728, 9729, 9987]
+    gltfJson = {
+        'asset': {'version': '2.0', 'generator': 'materialxgltf benchmark'},
+        'samplers': [ {'magFilter': filterModes[i % 3], 'minFilter': filterModes[(i + 1) % 3],
+                       'wrapS': wrapModes[i % 3], 'wrapT': wrapModes[(i // 3) % 3]} for i in range(samplerCount) ],
+        'images': [], 'textures': [], 'materials': [], 'meshes': [], 'nodes': [],
+        'scenes': [ {'nodes': []} ], 'scene': 0
+    }
+    images = gltfJson['images']
+    textures = gltfJson['textures']
+    nodes = gltfJson['nodes']
+    sceneNodes = gltfJson['scenes'][0]['nodes']
+
+    for materialIndex in range(materialCount):
+        value = (materialIndex % 101) / 100.0
+        material = {
+            'name': 'material_%d' % materialIndex,
+            'pbrMetallicRoughness': {'baseColorFactor': [value, 1.0 - value, (materialIndex % 7) / 7.0, 1.0],
+                                     'metallicFactor': value, 'roughnessFactor': 1.0 - value},
+            'emissiveFactor': [value, value, value]
+        }
+
+        for slotIndex in range(textureCount):
+            slot = SYNTHETIC_TEXTURE_SLOTS[slotIndex]
+            images.append({'uri': 'textures/material_%d_%s.png' % (materialIndex, slot)})
+            textures.append({'source': len(images) - 1, 'sampler': len(textures) % samplerCount})
+            textureInfo = {'index': len(textures) - 1}
+            if slot in ['baseColorTexture', 'metallicRoughnessTexture']:
+                material['pbrMetallicRoughness'][slot] = textureInfo
+            else:
+                material[slot] = textureInfo
+
+        if extensionCount:
+            material['extensions'] = {}
+            for extensionIndex in range(extensionCount):
+                extensionName = SYNTHETIC_EXTENSIONS[(materialIndex + extensionIndex) % len(SYNTHETIC_EXTENSIONS)]
+                material['extensions'][extensionName] = generateExtension(extensionName, value)
+
+        gltfJson['materials'].append(material)
+
+        primitives = [ {'attributes': {'POSITION': 0}, 'material': materialIndex} for i in range(primitiveCount) ]
+        gltfJson['meshes'].append({'name': 'mesh_%d' % materialIndex, 'primitives': primitives})
+        meshIndex = len(gltfJson['meshes']) - 1
+
+        for instanceIndex in range(instanceCount):
+            sceneNodes.append(len(nodes))
+            for depth in range(nodeDepth):
+                node = {'name': 'node_%d_%d_%d' % (materialIndex, instanceIndex, depth)}
+                if depth < nodeDepth - 1:
+                    node['children'] = [len(nodes) + 1]
+                else:
+                    node['mesh'] = meshIndex
+                nodes.append(node)
+
+    return gltfJson
+
+def timeReaderPhases(gltfJson, readerOptions) -> dict:
+    '''
+    @brief Convert a glTF document to MaterialX, timing each phase of the conversion.
+    @param gltfJson The glTF document to convert.
+    @param readerOptions The GLTF2MtlxOptions to convert with.
+    @return Dictionary of phase name to time in seconds.
+    '''
+    profiler = ConversionProfiler()
+    reader = GLTF2MtlxReader()
+    reader.setOptions(readerOptions)
+    reader.setProfiler(profiler)
+
+    doc = reader.convertJson(gltfJson)
+    with profiler.phase('serialize'):
+        Util.writeMaterialXDocString(doc)
+
+    recorded = profiler.getPhases()
+    phases = {}
+    for phase in ['libraryLoad', 'materials', 'sceneIndex', 'assignments', 'serialize']:
+        phases[phase] = recorded[phase]['seconds'] if phase in recorded else 0.0
+    # The scene index is built as part of creating assignments
+    phases['assignments'] -= phases['sceneIndex']
+
+    phases['total'] = sum(phases.values())
+    return phases
+
+def runReaderBenchmark(gltfOptions=None, readerOptions=None, repeat=1, measureMemory=False) -> dict:
+    '''
+    @brief Run the glTF to MaterialX benchmark for one set of generator options.
+    @param gltfOptions The SyntheticGLTFOptions to generate input with. Default options are used if not specified.
+    @param readerOptions The GLTF2MtlxOptions to convert with. If not specified assignments are created and debug output is disabled.
+    @param repeat Number of times to run the conversion. The minimum time of each phase is reported.
+    @param measureMemory Measure peak memory allocated by Python during a separate conversion using tracemalloc.
+    Memory allocated by MaterialX is not included.
+    @return Dictionary of results.
+    '''
+    if not gltfOptions:
+        gltfOptions = SyntheticGLTFOptions()
+    if not readerOptions:
+        readerOptions = GLTF2MtlxOptions()
+        readerOptions['createAssignments'] = True
+        readerOptions['debugOutput'] = False
+
+    gltfJson = generateGLTF(gltfOptions)
+
+    phases = {}
+    for i in range(max(repeat, 1)):
+        for phase, seconds in timeReaderPhases(gltfJson, readerOptions).items():
+            phases[phase] = min(seconds, phases[phase]) if phase in phases else seconds
+
+    result = {
+        'parameters': dict(gltfOptions),
+        'counts': { 'materials': len(gltfJson['materials']), 'textures': len(gltfJson['textures']),
+                    'nodes': len(gltfJson['nodes']), 'meshes': len(gltfJson['meshes']) },
+        'phases': phases,
+        'throughput': {
+            'materialsPerSecond': len(gltfJson['materials']) / phases['materials'] if phases['materials'] > 0 else 0.0,
+            'nodesPerSecond': len(gltfJson['nodes']) / phases['sceneIndex'] if phases['sceneIndex'] > 0 else 0.0
+        },
+        'peakMemoryBytes': None
+    }
+
+    if measureMemory:
+        tracemalloc.start()
+        reader = GLTF2MtlxReader()
+        reader.setOptions(readerOptions)
+        reader.convertJson(gltfJson)
+        result['peakMemoryBytes'] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    return result
+
+def computeScalingExponent(sizes, times) -> float:
+    '''
+    @brief Fit time = c * size^k by least squares on a log-log scale.
+    @param sizes List of input sizes.
+    @param times List of times for each size.
+    @return The exponent k, or None if there are fewer than two usable points.
+    '''
+    points = [ (math.log(size), math.log(seconds)) for size, seconds in zip(sizes, times) if size > 0 and seconds > 0 ]
+    if len(points) < 2:
+        return None
+    meanX = sum(x for x, y in points) / len(points)
+    meanY = sum(y for x, y in points) / len(points)
+    varianceX = sum((x - meanX) ** 2 for x, y in points)
+    if varianceX == 0:
+        return None
+    return sum((x - meanX) * (y - meanY) for x, y in points) / varianceX
+
+def getEnvironment() -> dict:
+    '''
+    @brief Get a description of the environment the benchmark is run in.
+    @return Dictionary of environment information.
+    '''
+    return {
+        'python': '%d.%d.%d' % sys.version_info[:3],
+        'platform': sys.platform,
+        'materialx': mx.__version__,
+        'materialxgltf': materialxgltf.__version__
+    }
+
+def runReaderSweep(parameter, values, gltfOptions=None, readerOptions=None, repeat=1, measureMemory=False,
+                   superLinearThreshold=1.2) -> dict:
+    '''
+    @brief Run the glTF to MaterialX benchmark over a range of values for one generator option.
+    @param parameter The SyntheticGLTFOptions option to vary.
+    @param values The list of values for the option.
+    @param gltfOptions The SyntheticGLTFOptions for the options which are not varied.
+    @param readerOptions The GLTF2MtlxOptions to convert with.
+    @param repeat Number of times to run each conversion.
+    @param measureMemory Measure peak Python memory for each conversion.
+    @param superLinearThreshold Scaling exponent above which a phase is reported as super-linear.
+    @return Dictionary report. See BENCHMARK_SCHEMA_VERSION.
+    '''
+    if not gltfOptions:
+        gltfOptions = SyntheticGLTFOptions()
+
+    results = []
+    for value in values:
+        runOptions = SyntheticGLTFOptions(gltfOptions)
+        runOptions[parameter] = value
+        results.append(runReaderBenchmark(runOptions, readerOptions, repeat, measureMemory))
+
+    scaling = {}
+    superLinear = []
+    if results:
+        for phase in results[0]['phases']:
+            exponent = computeScalingExponent(values, [result['phases'][phase] for result in results])
+            scaling[phase] = exponent
+            if exponent is not None and exponent > superLinearThreshold:
+                superLinear.append(phase)
+
+    return {
+        'schemaVersion': BENCHMARK_SCHEMA_VERSION,
+        'benchmark': 'gltf2mtlx',
+        'environment': getEnvironment(),
+        'sweep': { 'parameter': parameter, 'values': list(values) },
+        'repeat': repeat,
+        'results': results,
+        'scaling': scaling,
+        'superLinearThreshold': superLinearThreshold,
+        'superLinearPhases': superLinear,
+        'peakRSSBytes': getPeakRSS()
+    }
+
+#########################################################################################
+# MaterialX to glTF benchmarks
+#########################################################################################
+
+# Writer scenarios in the order they are run
+WRITER_SCENARIOS = ['materials', 'inputMappings', 'samplerReuse', 'ormMerge', 'graphToJson', 'primsPerMaterial', 'package']
+
+class SyntheticMaterialXOptions(dict):
+    '''
+    @brief Class to hold options for generating MaterialX documents and textures for writer benchmarks.
+    Available options:
+        - 'materialCount' : Number of materials. Default is 20.
+        - 'textureResolution' : Width and height of generated textures. Default is 128.
+        - 'graphNodeCount' : Number of nodes in the procedural graph of each material for the graphToJson scenario. Default is 10.
+    '''
+    def __init__(self, *args, **kwargs):
+        '''
+        @brief Constructor
+        '''
+        super().__init__(*args, **kwargs)
+
+        self['materialCount'] = 20
+        self['textureResolution'] = 128
+        self['graphNodeCount'] = 10
+
+def getPeakRSS() -> int:
+    '''
+    @brief Get the peak resident set size of the process. This is the high water mark over the lifetime
+    of the process, so writer scenarios are each run in a new process to report it per scenario.
+    @return Peak resident set size in bytes, or None if it is not available on this platform.
+    '''
+    if not resource:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Reported in kilobytes on Linux and bytes on macOS
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+def generateTexture(fileName, resolution) -> bool:
+    '''
+    @brief Write a texture with pseudo random texels so that it does not compress to a trivial size.
+    @param fileName The file to write.
+    @param resolution The width and height of the texture.
+    @return True if the texture was written.
+    '''
+    image = mx_render.createUniformImage(resolution, resolution, 3, mx_render.BaseType.UINT8, mx.Color4(0.0))
+    seed = 12345
+    for y in range(resolution):
+        for x in range(resolution):
+            seed = (seed * 1103515245 + 12345) & 0x7fffffff
+            image.setTexelColor(x, y, mx.Color4((seed & 0xff) / 255.0, ((seed >> 8) & 0xff) / 255.0, ((seed >> 16) & 0xff) / 255.0, 1.0))
+    loader = mx_render.StbImageLoader.create()
+    return loader.saveImage(fileName, image, False)
+
+def generateTextures(folder, fileNames, resolution) -> int:
+    '''
+    @brief Write a set of textures. One texture is generated and copied to each file name.
+    @param folder The folder to write to.
+    @param fileNames The file names to write.
+    @param resolution The width and height of the textures.
+    @return Total number of bytes written.
+    '''
+    if not fileNames:
+        return 0
+    sourceFile = os.path.join(folder, fileNames[0])
+    generateTexture(sourceFile, resolution)
+    for fileName in fileNames[1:]:
+        shutil.copyfile(sourceFile, os.path.join(folder, fileName))
+    return os.path.getsize(sourceFile) * len(fileNames)
+
+def addImageNode(doc, name, fileName, nodeType, samplerIndex) -> mx.Node:
+    '''
+    @brief Add a glTF image node with sampler settings which vary with an index.
+    @param doc The document to add the node to.
+    @param name The node name.
+    @param fileName The image file name.
+    @param nodeType The node output type.
+    @param samplerIndex Index used to choose address and filter modes.
+    @return The image node.
+    '''
+    addressModes = ['periodic', 'clamp', 'mirror']
+    filterTypes = ['linear', 'closest', 'cubic']
+    imageNode = doc.addNode(MTLX_GLTF_IMAGE, name, nodeType)
+    imageNode.setInputValue(mx.Implementation.FILE_ATTRIBUTE, fileName, mx.FILENAME_TYPE_STRING)
+    imageNode.setInputValue('uaddressmode', addressModes[samplerIndex % 3])
+    imageNode.setInputValue('vaddressmode', addressModes[(samplerIndex // 3) % 3])
+    imageNode.setInputValue('filtertype', filterTypes[(samplerIndex // 9) % 3])
+    return imageNode
+
+def generateMaterialXDocument(options, textured=False, separateMetallicRoughness=False, graphNodeCount=0, mappedInputs=False) -> tuple[mx.Document, list]:
+    '''
+    @brief Generate a MaterialX document with glTF PBR materials.
+    @param options The SyntheticMaterialXOptions to use.
+    @param textured Connect base color, normal and emissive images with varying sampler settings.
+    @param separateMetallicRoughness Connect metallic and roughness to different images so that the writer merges them.
+    @param graphNodeCount If non-zero, connect base color to a procedural graph with this many nodes.
+    @param mappedInputs Set a value on each input listed in GLTF_PBR_INPUT_MAPPINGS.
+    @return The document and the list of image file names referenced.
+    '''
+    doc, libFiles = Util.createMaterialXDoc()
+    # Node.addInputFromNodeDef() searches all definitions on every call
+    nodeDefCache = NodeDefCache()
+    fileNames = []
+    for materialIndex in range(options['materialCount']):
+        value = (materialIndex % 101) / 100.0
+        shaderNode = doc.addNode(MTLX_GLTF_PBR_CATEGORY, MTLX_SHADER_PREFIX + str(materialIndex), mx.SURFACE_SHADER_TYPE_STRING)
+        shaderNode.setInputValue('base_color', mx.Color3(value, 1.0 - value, 0.5))
+        shaderNode.setInputValue('metallic', value)
+        shaderNode.setInputValue('roughness', 1.0 - value)
+        doc.addMaterialNode(MTLX_MATERIAL_PREFIX + str(materialIndex), shaderNode)
+
+        if mappedInputs:
+            for mapping in GLTF_PBR_INPUT_MAPPINGS:
+                for inputName, inputType, textureProperty, factorProperty in mapping['inputs']:
+                    if inputType == 'color3':
+                        shaderNode.setInputValue(inputName, mx.Color3(value, 0.5, 1.0 - value))
+                    else:
+                        shaderNode.setInputValue(inputName, 0.25 + value)
+
+        if textured:
+            for inputName, nodeType in [('base_color', 'color3'), ('normal', 'vector3'), ('emissive', 'color3')]:
+                fileName = 'material_%d_%s.png' % (materialIndex, inputName)
+                imageNode = addImageNode(doc, 'image_%s_%d' % (inputName, materialIndex), fileName, nodeType, 
+                                         materialIndex * 3 + len(fileNames))
+                nodeDefCache.addInputFromNodeDef(shaderNode, inputName).setConnectedNode(imageNode)
+                fileNames.append(fileName)
+
+        if separateMetallicRoughness:
+            for inputName in ['metallic', 'roughness']:
+                fileName = 'material_%d_%s.png' % (materialIndex, inputName)
+                imageNode = addImageNode(doc, 'image_%s_%d' % (inputName, materialIndex), fileName, MTLX_FLOAT_STRING, materialIndex)
+                shaderNode.getInput(inputName).setConnectedNode(imageNode)
+                fileNames.append(fileName)
+
+        if graphNodeCount:
+            nodeGraph = doc.addNodeGraph('NG_' + str(materialIndex))
+            previousNode = nodeGraph.addNode('constant', 'constant_0', 'color3')
+            previousNode.setInputValue('value', mx.Color3(value, value, value))
+            for nodeIndex in range(1, graphNodeCount):
+                addNode = nodeGraph.addNode('add', 'add_%d' % nodeIndex, 'color3')
+                nodeDefCache.addInputFromNodeDef(addNode, 'in1').setConnectedNode(previousNode)
+                addNode.setInputValue('in2', mx.Color3(0.01, 0.01, 0.01))
+                previousNode = addNode
+            graphOutput = nodeGraph.addOutput('out', 'color3')
+            graphOutput.setConnectedNode(previousNode)
+            shaderNode.getInput('base_color').setConnectedOutput(graphOutput)
+
+    return doc, fileNames
+
+def createWriter(searchPath='', createProceduralTextures=False) -> MTLX2GLTFWriter:
+    '''
+    @brief Create a writer for benchmarking. Debug output and primitive creation are disabled.
+    @param searchPath Folder to search for textures.
+    @param createProceduralTextures Export procedural graphs.
+    @return The writer.
+    '''
+    options = MTLX2GLTFOptions()
+    options['debugOutput'] = False
+    options['primsPerMaterial'] = False
+    options['createProceduralTextures'] = createProceduralTextures
+    options['searchPath'] = mx.FileSearchPath(searchPath)
+    writer = MTLX2GLTFWriter()
+    writer.setOptions(options)
+    return writer
+
+def createScenarioResult(name, seconds, materialCount, byteCount=None, details=None) -> dict:
+    '''
+    @brief Create a writer scenario result. All results have the same keys.
+    @param name The scenario name.
+    @param seconds The time taken in seconds.
+    @param materialCount The number of materials processed.
+    @param byteCount Number of bytes processed, or None if not applicable.
+    @param details Dictionary of additional scenario specific values.
+    @return The scenario result.
+    '''
+    return {
+        'name': name,
+        'seconds': seconds,
+        'materials': materialCount,
+        'materialsPerSecond': materialCount / seconds if seconds > 0 else 0.0,
+        'bytes': byteCount,
+        'megabytesPerSecond': (byteCount / (1024.0 * 1024.0)) / seconds if (byteCount is not None and seconds > 0) else None,
+        'peakMemoryBytes': None,
+        'peakRSSBytes': None,
+        'details': details if details else {}
+    }
+
+def loadSampleGeometry() -> dict:
+    '''
+    @brief Load the sample shader ball geometry included with the package.
+    @return The glTF JSON of the geometry.
+    '''
+    geometryFile = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'shaderball.gltf')
+    with open(geometryFile, 'r') as f:
+        return json.load(f)
+
+def runWriterScenario(name, options, folder, repeat=1, measureMemory=False) -> dict:
+    '''
+    @brief Run one writer benchmark scenario.
+    The scenarios are:
+        - 'materials' : Convert textured materials to glTF.
+        - 'inputMappings' : Convert materials with values on all inputs written using GLTF_PBR_INPUT_MAPPINGS.
+        - 'samplerReuse' : Write image properties of all images to a single sampler list, which scans for existing samplers.
+        - 'ormMerge' : Convert materials with separate metallic and roughness images, which are merged per texel.
+        - 'graphToJson' : Convert materials with procedural graphs to KHR_procedurals.
+        - 'primsPerMaterial' : Create a primitive for each material on the sample geometry.
+        - 'package' : Package a glTF file with geometry and textures into a glb file.
+    @param name The scenario name.
+    @param options The SyntheticMaterialXOptions to use.
+    @param folder Folder to write textures and output files to.
+    @param repeat Number of times to run the scenario. The minimum time is reported.
+    @param measureMemory Measure peak memory allocated by Python during a separate call of the writer using tracemalloc.
+    Memory allocated while creating the input, and by MaterialX, is not included.
+    @return The scenario result.
+    '''
+    materialCount = options['materialCount']
+    resolution = options['textureResolution']
+    byteCount = None
+    details = {}
+
+    # Each scenario creates its input, then defines prepare(), which creates the state for one run
+    # of the writer outside of timing, and run(state), which is the timed writer call.
+    # The writer prints progress which is not wanted in reports
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        if name == 'materials':
+            doc, fileNames = generateMaterialXDocument(options, textured=True)
+            prepare = lambda: createWriter(folder)
+            run = lambda writer: writer.convertToJson(doc)
+
+        elif name == 'inputMappings':
+            doc, fileNames = generateMaterialXDocument(options, mappedInputs=True)
+            prepare = lambda: createWriter(folder)
+            run = lambda writer: writer.convertToJson(doc)
+
+        elif name == 'samplerReuse':
+            doc, fileNames = generateMaterialXDocument(options, textured=True)
+            imageNodes = [node for node in doc.getNodes() if node.getCategory() == MTLX_GLTF_IMAGE]
+            writer = createWriter(folder)
+            prepare = lambda: []
+            def run(samplers):
+                for imageNode in imageNodes:
+                    writer.writeImageProperties({}, samplers, imageNode)
+                return samplers
+
+        elif name == 'ormMerge':
+            doc, fileNames = generateMaterialXDocument(options, separateMetallicRoughness=True)
+            generateTextures(folder, fileNames, resolution)
+            prepare = lambda: createWriter(folder)
+            run = lambda writer: writer.convertToJson(doc)
+
+        elif name == 'graphToJson':
+            doc, fileNames = generateMaterialXDocument(options, graphNodeCount=options['graphNodeCount'])
+            prepare = lambda: createWriter(folder, createProceduralTextures=True)
+            run = lambda writer: writer.convertToJson(doc)
+
+        elif name == 'primsPerMaterial':
+            geometryJson = loadSampleGeometry()
+            writer = createWriter(folder)
+            def prepare():
+                gltfJson = copy.deepcopy(geometryJson)
+                gltfJson['materials'] = [ {'name': MTLX_MATERIAL_PREFIX + str(index)} for index in range(materialCount) ]
+                return gltfJson
+            def run(gltfJson):
+                writer.createPrimsForMaterials(gltfJson, int(math.sqrt(materialCount)))
+                return gltfJson
+
+        elif name == 'package':
+            geometryJson = loadSampleGeometry()
+            dataFolder = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+            gltfJson = copy.deepcopy(geometryJson)
+            for buffer in gltfJson.get('buffers', []):
+                if 'uri' in buffer and not buffer['uri'].startswith('data:'):
+                    shutil.copyfile(os.path.join(dataFolder, buffer['uri']), os.path.join(folder, buffer['uri']))
+            fileNames = [ 'package_%d.png' % index for index in range(materialCount) ]
+            byteCount = generateTextures(folder, fileNames, resolution)
+            byteCount += sum(os.path.getsize(os.path.join(folder, buffer['uri'])) for buffer in gltfJson.get('buffers', []) 
+                             if 'uri' in buffer and not buffer['uri'].startswith('data:'))
+            gltfJson['images'] = [ {'uri': fileName} for fileName in fileNames ]
+            gltfJson['textures'] = [ {'source': index} for index in range(materialCount) ]
+            gltfJson['materials'] = [ {'name': MTLX_MATERIAL_PREFIX + str(index), 
+                                       'pbrMetallicRoughness': {'baseColorTexture': {'index': index}}} for index in range(materialCount) ]
+            gltfFileName = os.path.join(folder, 'package.gltf')
+            Util.writeGLTFFile(gltfJson, gltfFileName)
+            writer = createWriter(folder)
+            prepare = lambda: None
+            run = lambda state: writer.packageGLTF(gltfFileName, os.path.join(folder, 'package.glb'))
+
+        else:
+            raise ValueError('Unknown writer scenario: ' + name)
+
+        times = []
+        for i in range(max(repeat, 1)):
+            state = prepare()
+            startTime = time.perf_counter()
+            output = run(state)
+            times.append(time.perf_counter() - startTime)
+
+        # Memory is traced during a separate call, as tracing slows the writer down
+        peakMemory = None
+        if measureMemory:
+            state = prepare()
+            tracemalloc.start()
+            try:
+                run(state)
+                peakMemory = tracemalloc.get_traced_memory()[1]
+            finally:
+                tracemalloc.stop()
+
+    if name == 'materials':
+        details['textures'] = len(output.get('textures', []))
+        details['samplers'] = len(output.get('samplers', []))
+    elif name == 'inputMappings':
+        details['extensions'] = sum(len(material.get('extensions', {})) for material in output.get('materials', []))
+    elif name == 'samplerReuse':
+        details['images'] = len(imageNodes)
+        details['samplers'] = len(output)
+    elif name == 'ormMerge':
+        details['texels'] = materialCount * resolution * resolution
+        details['texelsPerSecond'] = details['texels'] / min(times) if min(times) > 0 else 0.0
+    elif name == 'graphToJson':
+        details['graphNodes'] = materialCount * options['graphNodeCount']
+        details['procedurals'] = len(output.get('extensions', {}).get('KHR_procedurals', {}).get('procedurals', []))
+    elif name == 'primsPerMaterial':
+        details['meshes'] = len(output['meshes'])
+        details['nodes'] = len(output['nodes'])
+    elif name == 'package':
+        details['outputBytes'] = os.path.getsize(os.path.join(folder, 'package.glb'))
+
+    result = createScenarioResult(name, min(times), materialCount, byteCount, details)
+    result['peakMemoryBytes'] = peakMemory
+    return result
+
+def runWriterScenarioProcess(name, options, folder, repeat=1, measureMemory=False) -> dict:
+    '''
+    @brief Run one writer benchmark scenario in a new process, so that the peak resident set size
+    of the process is that of the scenario. See runWriterScenario() for parameters.
+    @return The scenario result.
+    '''
+    context = multiprocessing.get_context('spawn')
+    with concurrent.futures.ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+        return executor.submit(_runWriterScenarioWithRSS, name, options, folder, repeat, measureMemory).result()
+
+def _runWriterScenarioWithRSS(name, options, folder, repeat, measureMemory) -> dict:
+    result = runWriterScenario(name, options, folder, repeat, measureMemory)
+    result['peakRSSBytes'] = getPeakRSS()
+    return result
+
+def runWriterSweep(parameter, values, options=None, scenarios=None, repeat=1, measureMemory=False, superLinearThreshold=1.2) -> dict:
+    '''
+    @brief Run writer benchmark scenarios over a range of values for one generator option.
+    @param parameter The SyntheticMaterialXOptions option to vary.
+    @param values The list of values for the option.
+    @param options The SyntheticMaterialXOptions for the options which are not varied.
+    @param scenarios List of scenario names to run. Default is all of WRITER_SCENARIOS.
+    @param repeat Number of times to run each scenario.
+    @param measureMemory Measure peak Python memory for each scenario.
+    @param superLinearThreshold Scaling exponent above which a scenario is reported as super-linear.
+    Each scenario is run in a new process, and reports the peak resident set size of that process.
+    @return Dictionary report. See BENCHMARK_SCHEMA_VERSION.
+    '''
+    if not options:
+        options = SyntheticMaterialXOptions()
+    if not scenarios:
+        scenarios = WRITER_SCENARIOS
+
+    results = []
+    with tempfile.TemporaryDirectory() as folder:
+        for value in values:
+            runOptions = SyntheticMaterialXOptions(options)
+            runOptions[parameter] = value
+            scenarioResults = {}
+            for scenario in scenarios:
+                scenarioResults[scenario] = runWriterScenarioProcess(scenario, runOptions, folder, max(repeat, 1), measureMemory)
+            results.append({ 'parameters': dict(runOptions), 'scenarios': scenarioResults })
+
+    scaling = {}
+    superLinear = []
+    for scenario in scenarios:
+        exponent = computeScalingExponent(values, [result['scenarios'][scenario]['seconds'] for result in results])
+        scaling[scenario] = exponent
+        if exponent is not None and exponent > superLinearThreshold:
+            superLinear.append(scenario)
+
+    return {
+        'schemaVersion': BENCHMARK_SCHEMA_VERSION,
+        'benchmark': 'mtlx2gltf',
+        'environment': getEnvironment(),
+        'sweep': { 'parameter': parameter, 'values': list(values) },
+        'repeat': repeat,
+        'results': results,
+        'scaling': scaling,
+        'superLinearThreshold': superLinearThreshold,
+        'superLinearPhases': superLinear
+    }
+
+#########################################################################################
+# Command line interface
+#########################################################################################
+
+def parseOptionAssignment(assignment) -> tuple:
+    '''
+    @brief Parse a command line option of the form name=value or name=value1,value2,...
+    @param assignment The string to parse.
+    @return Tuple of option name and list of integer values.
+    '''
+    name, separator, valueString = assignment.partition('=')
+    if not separator:
+        raise argparse.ArgumentTypeError('Expected name=value: ' + assignment)
+    try:
+        values = [int(value) for value in valueString.split(',')]
+    except ValueError:
+        raise argparse.ArgumentTypeError('Expected integer values: ' + assignment)
+    return name, values
+
+def main():
+    '''
+    @brief Command line interface to run conversion benchmarks.
+    '''
+    parser = argparse.ArgumentParser(description='Run MaterialX glTF conversion benchmarks on generated data')
+    parser.add_argument('--suite', dest='suite', choices=['reader', 'writer'], default='reader',
+                        help='Benchmark glTF to MaterialX (reader) or MaterialX to glTF (writer). Default is reader')
+    parser.add_argument('--sweep', dest='sweep', type=parseOptionAssignment, default=None,
+                        help='Generator option to vary and its values. Default is materialCount=10,100,1000 for the reader and materialCount=10,20,40 for the writer')
+    parser.add_argument('--set', dest='settings', type=parseOptionAssignment, action='append', default=[],
+                        help='Set a generator option for all runs, e.g. --set textureCount=5. May be repeated')
+    parser.add_argument('--scenarios', dest='scenarios', default='',
+                        help='Comma separated list of writer scenarios to run. Default is all: ' + ','.join(WRITER_SCENARIOS))
+    parser.add_argument('--repeat', dest='repeat', type=int, default=1, help='Number of times to run each conversion. Default is 1')
+    parser.add_argument('--memory', dest='memory', action='store_true', help='Measure peak Python memory of each reader conversion or writer scenario')
+    parser.add_argument('--output', dest='output', default='', help='File to write the JSON report to. Default is to print the report')
+    opts = parser.parse_args()
+
+    isReader = opts.suite == 'reader'
+    generatorOptions = SyntheticGLTFOptions() if isReader else SyntheticMaterialXOptions()
+    parameter, values = opts.sweep if opts.sweep else ('materialCount', [10, 100, 1000] if isReader else [10, 20, 40])
+    for name in [parameter] + [name for name, settingValues in opts.settings]:
+        if name not in generatorOptions:
+            parser.error('Unknown generator option: ' + name)
+    for name, settingValues in opts.settings:
+        generatorOptions[name] = settingValues[0]
+
+    if isReader:
+        report = runReaderSweep(parameter, values, generatorOptions, None, opts.repeat, opts.memory)
+    else:
+        scenarios = opts.scenarios.split(',') if opts.scenarios else WRITER_SCENARIOS
+        for scenario in scenarios:
+            if scenario not in WRITER_SCENARIOS:
+                parser.error('Unknown writer scenario: ' + scenario)
+        report = runWriterSweep(parameter, values, generatorOptions, scenarios, opts.repeat, opts.memory)
+
+    reportString = json.dumps(report, indent=2)
+    if opts.output:
+        with open(opts.output, 'w') as outputFile:
+            outputFile.write(reportString)
+        for result in report['results']:
+            if isReader:
+                print('%s=%d: %.3fs total, %.1f materials/sec' % (parameter, result['parameters'][parameter],
+                                                                   result['phases']['total'], result['throughput']['materialsPerSecond']))
+            else:
+                for scenario in result['scenarios'].values():
+                    print('%s=%d: %s %.3fs, %.1f materials/sec' % (parameter, result['parameters'][parameter], scenario['name'],
+                                                                    scenario['seconds'], scenario['materialsPerSecond']))
+        if report['superLinearPhases']:
+            print('Super-linear: ' + ', '.join(report['superLinearPhases']))
+        print('Wrote benchmark report to: ' + opts.output)
+    else:
+        print(reportString)
+
+if __name__ == '__main__':
+    main()
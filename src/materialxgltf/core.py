@@ -20,7 +20,13 @@ from pygltflib import GLTF2, BufferFormat # type: ignore
 from pygltflib.utils import ImageFormat # type: ignore
 
 # Utilities
-import os, re, copy, math
+import os, sys, re, copy, math, base64, mimetypes, hashlib, time, contextlib, tracemalloc, shutil, ctypes, tempfile
+
+# Optional NumPy support used by the CPU texture baker
+try:
+    import numpy as np
+except ImportError:
+    np = None
 
 from materialxgltf.globals import *
 
@@ -30,90 +36,2527 @@ from materialxgltf.globals import *
 class Util:
 
     @staticmethod
-    def createMaterialXDoc() -> tuple[mx.Document, list]:
+    def createMaterialXDoc() -> tuple[mx.Document, list]:
+        '''
+        @brief Utility to create a MaterialX document with the default libraries loaded.
+        @return The created MaterialX document and the list of loaded library filenames.
+        '''
+        doc = mx.createDocument()
+        stdlib = mx.createDocument()
+        libFiles = []
+        searchPath = mx.getDefaultDataSearchPath()
+        libFiles = mx.loadLibraries(mx.getDefaultDataLibraryFolders(), searchPath, stdlib)
+        doc.importLibrary(stdlib)
+
+        return doc, libFiles
+
+    @staticmethod
+    def skipLibraryElement(elem) -> bool:
+        '''
+        @brief Utility to skip library elements when iterating over elements in a document.
+        @return True if the element is not in a library, otherwise False.
+        '''
+        return not elem.hasSourceUri()
+
+    @staticmethod
+    def writeMaterialXDoc(doc, filename, predicate=skipLibraryElement):
+        '''
+        @brief Utility to write a MaterialX document to a file.
+        @param doc The MaterialX document to write.
+        @param filename The name of the file to write to.
+        @param predicate A predicate function to determine if an element should be written. Default is to skip library elements.
+        '''
+        writeOptions = mx.XmlWriteOptions()
+        writeOptions.writeXIncludeEnable = False
+        writeOptions.elementPredicate = predicate
+
+        if filename:
+            mx.writeToXmlFile(doc, filename, writeOptions)
+    
+    @staticmethod
+    def writeMaterialXDocString(doc, predicate=skipLibraryElement):
+        '''
+        @brief Utility to write a MaterialX document to string.
+        @param doc The MaterialX document to write.
+        @param predicate A predicate function to determine if an element should be written. Default is to skip library elements.
+        @return The XML string representation of the MaterialX document.
+        '''
+        writeOptions = mx.XmlWriteOptions()
+        writeOptions.writeXIncludeEnable = False
+        writeOptions.elementPredicate = predicate
+
+        result =  mx.writeToXmlString(doc, writeOptions)
+        return result
+
+    @staticmethod
+    def hasRawValues(gltfJson) -> bool:
+        '''
+        @brief Utility to check if a glTF JSON dictionary has top level properties held as GLTFRawValue text.
+        @param gltfJson The glTF JSON dictionary.
+        @return True if any property is held as text.
+        '''
+        return any(isinstance(value, GLTFRawValue) for value in gltfJson.values())
+
+    @staticmethod
+    def iterEncodeGLTFJson(gltfJson, compact=False):
+        '''
+        @brief Utility to serialize a glTF JSON dictionary in chunks. The text of GLTFRawValue
+        values is output as is.
+        @param gltfJson The glTF JSON dictionary.
+        @param compact Write without indentation or extra whitespace. Default is False which writes
+        with an indentation of 2.
+        @return Iterator over the JSON string chunks.
+        '''
+        rawValues = []
+        def encodeRawValue(value):
+            if isinstance(value, GLTFRawValue):
+                rawValues.append(value)
+                return GLTF_RAW_VALUE_PLACEHOLDER
+            raise TypeError('Object of type %s is not JSON serializable' % type(value).__name__)
+
+        if compact:
+            encoder = json.JSONEncoder(separators=(',', ':'), default=encodeRawValue)
+        else:
+            encoder = json.JSONEncoder(indent=2, default=encodeRawValue)
+        placeholder = json.dumps(GLTF_RAW_VALUE_PLACEHOLDER)
+        for chunk in encoder.iterencode(gltfJson):
+            # The placeholder is encoded as a single chunk right after the value is replaced
+            if rawValues and chunk == placeholder:
+                yield from rawValues.pop().iterText()
+            else:
+                yield chunk
+
+    @staticmethod
+    def gltfJsonToString(gltfJson, compact=False) -> str:
+        '''
+        @brief Utility to serialize a glTF JSON dictionary to a string.
+        @param gltfJson The glTF JSON dictionary. The text of GLTFRawValue values is output as is.
+        @param compact Write without indentation or extra whitespace. Default is False which writes
+        with an indentation of 2.
+        @return The glTF JSON string.
+        '''
+        if Util.hasRawValues(gltfJson):
+            return ''.join(Util.iterEncodeGLTFJson(gltfJson, compact))
+        if compact:
+            return json.dumps(gltfJson, separators=(',', ':'))
+        return json.dumps(gltfJson, indent=2)
+
+    @staticmethod
+    def writeGLTFFile(gltfJson, filename, compact=False):
+        '''
+        @brief Utility to write a glTF JSON dictionary to a file. The JSON is streamed to the file
+        instead of being built as a single string.
+        @param gltfJson The glTF JSON dictionary. The text of GLTFRawValue values is output as is.
+        @param filename The name of the file to write to.
+        @param compact Write without indentation or extra whitespace. Default is False which writes
+        with an indentation of 2.
+        '''
+        with open(filename, 'w') as f:
+            if Util.hasRawValues(gltfJson):
+                for chunk in Util.iterEncodeGLTFJson(gltfJson, compact):
+                    f.write(chunk)
+            elif compact:
+                json.dump(gltfJson, f, separators=(',', ':'))
+            else:
+                json.dump(gltfJson, f, indent=2)
+
+    @staticmethod
+    def readGLTFData(gltfData) -> dict:
+        '''
+        @brief Utility to parse glTF data held in memory.
+        @param gltfData The glTF JSON as a string or bytes, or the contents of a binary glTF (glb) file.
+        @return The glTF JSON dictionary. A ValueError is raised if the data cannot be parsed.
+        '''
+        if isinstance(gltfData, (bytes, bytearray)) and gltfData[:4] == b'glTF':
+            # The JSON chunk is always the first chunk in a glb file
+            chunkLength = int.from_bytes(gltfData[12:16], 'little')
+            return json.loads(gltfData[20:20 + chunkLength])
+        return json.loads(gltfData)
+
+    @staticmethod
+    def readMaterialXDocString(mtlxString, searchPath=None) -> mx.Document:
+        '''
+        @brief Utility to read a MaterialX document from a string. The default libraries are loaded.
+        @param mtlxString The XML string to read.
+        @param searchPath Optional search path used to resolve XIncludes.
+        @return The MaterialX document.
+        '''
+        doc, libFiles = Util.createMaterialXDoc()
+        mx.readFromXmlString(doc, mtlxString, searchPath if searchPath else mx.FileSearchPath())
+        return doc
+    
+    @staticmethod
+    def makeFilePathsRelative(doc, docPath) -> list:
+        '''
+        @brief Utility to make file paths relative to a document path
+        @param doc The MaterialX document to update.
+        @param docPath The path to make file paths relapy -tive to.
+        @return List of tuples of unresolved and resolved file paths.
+        '''
+        result = []
+
+        for elem in doc.traverseTree():
+                valueElem = None
+                if elem.isA(mx.ValueElement):
+                    valueElem = elem
+                if not valueElem or valueElem.getType() != mx.FILENAME_TYPE_STRING:
+                    continue
+
+                unresolvedValue = mx.FilePath(valueElem.getValueString())
+                if unresolvedValue.isEmpty():
+                    continue
+
+                elementResolver = valueElem.createStringResolver()
+                if unresolvedValue.isAbsolute():
+                    elementResolver.setFilePrefix('')
+                resolvedValue = valueElem.getResolvedValueString(elementResolver)
+                resolvedValue = mx.FilePath(resolvedValue).getBaseName()
+                valueElem.setValueString(resolvedValue)
+
+                if unresolvedValue != resolvedValue:
+                    result.append([unresolvedValue.asString(mx.FormatPosix), resolvedValue])
+
+        return result  
+
+class NodeDefCache:
+    '''
+    @brief Cache of node definitions and input templates used while building a MaterialX document.
+    
+    Resolving a node definition requires matching category, type and version against all loaded
+    libraries. The cache resolves each (category, type, nodedef) combination once and keeps the
+    name, type and default value string of each nodedef input and output so that nodes can be
+    populated without further lookups. A cache should only be used for a single conversion.
+    '''
+    def __init__(self):
+        '''
+        @brief Constructor.
+        '''
+        self._nodeDefs : dict = {}
+        self._inputTemplates : dict = {}
+        self._outputTemplates : dict = {}
+        self._inputDefaults : dict = {}
+        self._populatedNodes : set = set()
+
+    def _getKey(self, node) -> tuple:
+        return (node.getCategory(), node.getType(), node.getNodeDefString())
+
+    def getNodeDef(self, node) -> mx.NodeDef:
+        '''
+        @brief Get the node definition for a node.
+        @param node The node to find the definition for.
+        @return The node definition if found, otherwise None.
+        '''
+        key = self._getKey(node)
+        if key not in self._nodeDefs:
+            nodedef = node.getNodeDef()
+            self._nodeDefs[key] = nodedef
+            inputTemplates = {}
+            outputTemplates = []
+            if nodedef:
+                for nodedefInput in nodedef.getActiveInputs():
+                    valueString = nodedefInput.getValueString() if nodedefInput.hasValueString() else None
+                    inputTemplates[nodedefInput.getName()] = (nodedefInput.getType(), valueString)
+                for nodedefOutput in nodedef.getActiveOutputs():
+                    outputTemplates.append((nodedefOutput.getName(), nodedefOutput.getType()))
+            self._inputTemplates[key] = inputTemplates
+            self._outputTemplates[key] = outputTemplates
+        return self._nodeDefs[key]
+
+    def getInputTemplates(self, node) -> dict:
+        '''
+        @brief Get the input templates for a node.
+        @param node The node to get input templates for.
+        @return Dictionary of input name to (type, default value string) in definition order.
+        The default value string is None if the definition input has no value.
+        '''
+        self.getNodeDef(node)
+        return self._inputTemplates[self._getKey(node)]
+
+    def getOutputTemplates(self, node) -> list:
+        '''
+        @brief Get the output templates for a node.
+        @param node The node to get output templates for.
+        @return List of (name, type) for each definition output.
+        '''
+        self.getNodeDef(node)
+        return self._outputTemplates[self._getKey(node)]
+
+    def getInputDefault(self, node, inputName):
+        '''
+        @brief Get the default value of a node input. Equivalent to node.getNodeDef().getInputValue().
+        Values are cached per definition and input name.
+        @param node The node to get the default value for.
+        @param inputName The name of the input.
+        @return The value of the definition input, or None if the node has no definition or the definition input has no value.
+        '''
+        nodedef = self.getNodeDef(node)
+        if not nodedef:
+            return None
+        key = (nodedef.getName(), inputName)
+        if key not in self._inputDefaults:
+            self._inputDefaults[key] = nodedef.getInputValue(inputName)
+        return self._inputDefaults[key]
+
+    def addInputFromNodeDef(self, node, inputName) -> mx.Input:
+        '''
+        @brief Add an input to a node based on its definition. Equivalent to Node.addInputFromNodeDef().
+        @param node The node to add the input to.
+        @param inputName The name of the input to add.
+        @return The existing or added input if the definition has the input, otherwise None.
+        '''
+        input = node.getInput(inputName)
+        if not input:
+            template = self.getInputTemplates(node).get(inputName)
+            if template:
+                input = node.addInput(inputName, template[0])
+                if template[1] is not None:
+                    input.setValueString(template[1])
+        return input
+
+    def addInputsFromNodeDef(self, node, skipInputs=None):
+        '''
+        @brief Add all inputs to a node based on its definition. Equivalent to Node.addInputsFromNodeDef().
+        @param node The node to add inputs to.
+        @param skipInputs Optional list of input names to not add.
+        '''
+        for inputName, template in self.getInputTemplates(node).items():
+            if skipInputs and inputName in skipInputs:
+                continue
+            if not node.getInput(inputName):
+                input = node.addInput(inputName, template[0])
+                if template[1] is not None:
+                    input.setValueString(template[1])
+
+    def populateOnce(self, node, skipInputs=None) -> bool:
+        '''
+        @brief Add all inputs to a node based on its definition if this has not been done for the node before.
+        @param node The node to add inputs to.
+        @param skipInputs Optional list of input names to not add.
+        @return True if inputs were added, False if the node was already populated.
+        '''
+        namePath = node.getNamePath()
+        if namePath in self._populatedNodes:
+            return False
+        self._populatedNodes.add(namePath)
+        self.addInputsFromNodeDef(node, skipInputs)
+        return True
+
+class UniqueNameAllocator:
+    '''
+    @brief Allocator for unique child names when generating a MaterialX document.
+
+    Element.createValidChildName() probes "name", "name2", "name3", ... until a free name
+    is found, which becomes slow when many children share a base name. The allocator keeps,
+    for each parent and requested name, the last free name returned along with the set of
+    names known to be in use, so that probing resumes where it previously stopped.
+    Names returned are identical to Element.createValidChildName(), assuming children are
+    not removed while the allocator is in use.
+    '''
+    def __init__(self):
+        '''
+        @brief Constructor.
+        '''
+        self._nextNames : dict = {}
+        self._usedNames : dict = {}
+
+    @staticmethod
+    def incrementName(name) -> str:
+        '''
+        @brief Increment the numeric suffix of a name, or append "2" if it has none.
+        Matches the naming sequence used by Element.createValidChildName().
+        @param name The name to increment.
+        @return The incremented name.
+        '''
+        split = len(name)
+        while split > 0 and name[split - 1].isdigit():
+            split -= 1
+        if split < len(name):
+            return name[:split] + str(int(name[split:]) + 1)
+        return name + '2'
+
+    def createValidChildName(self, parent, name) -> str:
+        '''
+        @brief Create a name which is unique among the children of a parent element.
+        The name is not reserved until a child with that name is added to the parent.
+        @param parent The parent element.
+        @param name The requested name.
+        @return A valid name that is not used by any child of the parent.
+        '''
+        name = mx.createValidName(name)
+        parentPath = parent.getNamePath()
+        usedNames = self._usedNames.setdefault(parentPath, set())
+        key = (parentPath, name)
+        candidate = self._nextNames.get(key, name)
+        while candidate in usedNames or parent.getChild(candidate):
+            usedNames.add(candidate)
+            candidate = self.incrementName(candidate)
+        self._nextNames[key] = candidate
+        return candidate
+
+#########################################################################################
+# Profiling utilities
+#########################################################################################
+class ConversionProfiler:
+    '''
+    @brief Class to collect phase timings, counters and optional memory peaks during a conversion.
+
+    Phases are named and may be nested. A phase can be associated with a material, in which case
+    any phases nested within it are attributed to the same material, so that time can be broken
+    down per material. Results are available as a report dictionary or as Chrome trace events
+    which can be loaded into chrome://tracing or Perfetto.
+
+    Memory peaks are measured with tracemalloc, so only memory allocated by Python is included.
+    '''
+    def __init__(self, measureMemory=False):
+        '''
+        @brief Constructor.
+        @param measureMemory Measure the peak traced memory of each phase. Default is False.
+        '''
+        self._measureMemory = measureMemory
+        self._startedTracing = False
+        self.reset()
+
+    def reset(self):
+        '''
+        @brief Clear all recorded phases and counters.
+        '''
+        self._origin = time.perf_counter()
+        # Open phases. Each entry is [name, material, start time, peak memory]
+        self._stack : list = []
+        # Completed phases. Each entry is (name, material, start time, duration, depth)
+        self._events : list = []
+        self._phases : dict = {}
+        self._counters : dict = {}
+        self._materials : dict = {}
+        self._peakMemory = 0
+
+    def isMeasuringMemory(self) -> bool:
+        '''
+        @brief Check if memory peaks are measured.
+        @return True if memory is measured, otherwise False.
+        '''
+        return self._measureMemory
+
+    def _resetTracedPeak(self) -> int:
+        current, peak = tracemalloc.get_traced_memory()
+        if hasattr(tracemalloc, 'reset_peak'):
+            tracemalloc.reset_peak()
+        return peak
+
+    def beginPhase(self, name, material=None):
+        '''
+        @brief Start timing a phase. Each call must be matched by a call to endPhase().
+        @param name The phase name.
+        @param material Optional material name the phase is for. If not specified the material
+        of the enclosing phase is used.
+        '''
+        if material is None and self._stack:
+            material = self._stack[-1][1]
+        if self._measureMemory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self._startedTracing = True
+            elif self._stack:
+                self._stack[-1][3] = max(self._stack[-1][3], self._resetTracedPeak())
+            else:
+                self._resetTracedPeak()
+        self._stack.append([name, material, time.perf_counter(), 0])
+
+    def endPhase(self, name=None) -> float:
+        '''
+        @brief Stop timing the most recently started phase.
+        @param name Optional phase name. If specified the phase is only ended if it is the most recently started phase.
+        @return The duration of the phase in seconds, or None if no matching phase was started.
+        '''
+        if not self._stack or (name and self._stack[-1][0] != name):
+            return None
+        endTime = time.perf_counter()
+        phaseName, material, startTime, peak = self._stack.pop()
+        duration = endTime - startTime
+
+        phase = self._phases.setdefault(phaseName, { 'seconds': 0.0, 'calls': 0 })
+        phase['seconds'] += duration
+        phase['calls'] += 1
+
+        if self._measureMemory and tracemalloc.is_tracing():
+            peak = max(peak, self._resetTracedPeak())
+            phase['peakMemoryBytes'] = max(phase.get('peakMemoryBytes', 0), peak)
+            self._peakMemory = max(self._peakMemory, peak)
+            if self._stack:
+                self._stack[-1][3] = max(self._stack[-1][3], peak)
+            elif self._startedTracing:
+                tracemalloc.stop()
+                self._startedTracing = False
+
+        if material is not None:
+            materialPhases = self._materials.setdefault(material, {})
+            materialPhases[phaseName] = materialPhases.get(phaseName, 0.0) + duration
+
+        self._events.append((phaseName, material, startTime - self._origin, duration, len(self._stack)))
+        return duration
+
+    @contextlib.contextmanager
+    def phase(self, name, material=None):
+        '''
+        @brief Context manager which times a phase.
+        @param name The phase name.
+        @param material Optional material name the phase is for.
+        '''
+        self.beginPhase(name, material)
+        try:
+            yield self
+        finally:
+            self.endPhase(name)
+
+    def increment(self, name, count=1):
+        '''
+        @brief Increment a counter.
+        @param name The counter name.
+        @param count The amount to increment by. Default is 1.
+        '''
+        self._counters[name] = self._counters.get(name, 0) + count
+
+    def getPhases(self) -> dict:
+        '''
+        @brief Get the total time and number of calls of each phase.
+        @return Dictionary of phase name to a dictionary with 'seconds', 'calls' and, if memory is measured, 'peakMemoryBytes'.
+        '''
+        return self._phases
+
+    def getCounters(self) -> dict:
+        '''
+        @brief Get the counters.
+        @return Dictionary of counter name to value.
+        '''
+        return self._counters
+
+    def getMaterials(self) -> dict:
+        '''
+        @brief Get the time spent in each phase per material.
+        @return Dictionary of material name to a dictionary of phase name to time in seconds.
+        '''
+        return self._materials
+
+    def getReport(self) -> dict:
+        '''
+        @brief Get a report of all recorded phases and counters.
+        @return Dictionary with 'phases', 'counters', 'materials' and 'peakMemoryBytes' entries.
+        The peak memory is None if memory is not measured.
+        '''
+        return {
+            'phases': self._phases,
+            'counters': self._counters,
+            'materials': self._materials,
+            'peakMemoryBytes': self._peakMemory if self._measureMemory else None
+        }
+
+    def getChromeTrace(self) -> dict:
+        '''
+        @brief Get the recorded phases as Chrome trace events.
+        @return Dictionary in Chrome trace event format.
+        '''
+        processId = os.getpid()
+        traceEvents = []
+        for name, material, startTime, duration, depth in sorted(self._events, key=lambda event: (event[2], event[4])):
+            event = { 'name': name, 'cat': 'material' if material is not None else 'conversion', 'ph': 'X',
+                      'ts': startTime * 1.0e6, 'dur': duration * 1.0e6, 'pid': processId, 'tid': 0 }
+            if material is not None:
+                event['args'] = { 'material': material }
+            traceEvents.append(event)
+        if self._counters:
+            endTime = max([event[2] + event[3] for event in self._events]) if self._events else 0.0
+            traceEvents.append({ 'name': 'counters', 'ph': 'C', 'ts': endTime * 1.0e6, 'pid': processId, 'tid': 0,
+                                 'args': dict(self._counters) })
+        return { 'traceEvents': traceEvents, 'displayTimeUnit': 'ms' }
+
+    def writeReport(self, fileName):
+        '''
+        @brief Write the report to a JSON file.
+        @param fileName The file to write.
+        '''
+        with open(fileName, 'w') as f:
+            json.dump(self.getReport(), f, indent=2)
+
+    def writeChromeTrace(self, fileName):
+        '''
+        @brief Write the recorded phases to a file in Chrome trace event format.
+        @param fileName The file to write.
+        '''
+        with open(fileName, 'w') as f:
+            json.dump(self.getChromeTrace(), f)
+
+    def write(self, reportFileName='', traceFileName='') -> list:
+        '''
+        @brief Write the JSON report and Chrome trace of the recorded conversion.
+        @param reportFileName The JSON report file to write. Not written if empty.
+        @param traceFileName The Chrome trace file to write. Not written if empty.
+        @return List of (description, file name) pairs of the files written.
+        '''
+        written = []
+        if reportFileName:
+            self.writeReport(reportFileName)
+            written.append(('profile', reportFileName))
+        if traceFileName:
+            self.writeChromeTrace(traceFileName)
+            written.append(('profile trace', traceFileName))
+        return written
+
+#########################################################################################
+# glTF scene utilities
+#########################################################################################
+class GLTFSceneIndex:
+    '''
+    @brief Flattened index of the node hierarchies of all scenes in a glTF document.
+
+    The hierarchies are traversed once, without recursion, in depth first order. Each visit
+    of a node is an entry with a parent entry, scene, node, mesh and path. Each mesh primitive
+    of an entry is a primitive entry with its primitive index and path. Paths are interned.
+
+    Paths are formed from valid MaterialX names. A node without a name is named using
+    GLTF_DEFAULT_NODE_PREFIX and the number of unnamed nodes above it, and a mesh without a
+    name using GLTF_DEFAULT_MESH_PREFIX and the number of unnamed meshes above it.
+    The path of a node includes the name of its mesh, if any. Primitives are named by index
+    using GLTF_DEFAULT_PRIMITIVE_PREFIX when a mesh has more than one primitive, otherwise
+    the primitive path is the node path.
+    '''
+    def __init__(self, gltfDoc):
+        '''
+        @brief Constructor. Builds the index for a glTF document.
+        @param gltfDoc The glTF document to index.
+        '''
+        # Node entry arrays
+        self._parents : list = []
+        self._sceneIndices : list = []
+        self._nodeIndices : list = []
+        self._meshIndices : list = []
+        self._paths : list = []
+        # Primitive entry arrays
+        self._primitiveEntries : list = []
+        self._primitiveIndices : list = []
+        self._primitivePaths : list = []
+        self._primitives : list = []
+        # Number of distinct primitive paths below each path. Computed on first use.
+        self._primitivePathCounts = None
+        # Primitive entries below each path, and primitive entries matched by each geometry path. Computed on first use.
+        self._primitivePrefixEntries = None
+        self._geomPathEntries : dict = {}
+
+        self._build(gltfDoc)
+
+    def _build(self, gltfDoc):
+        nodes = gltfDoc['nodes'] if 'nodes' in gltfDoc else []
+        meshes = gltfDoc['meshes'] if 'meshes' in gltfDoc else []
+        scenes = gltfDoc['scenes'] if 'scenes' in gltfDoc else []
+
+        # Names are commonly repeated, so keep the valid form of each name seen
+        validNames = {}
+        createValidName = mx.createValidName
+        intern = sys.intern
+        parents = self._parents
+        paths = self._paths
+
+        maxDepth = len(nodes)
+        for sceneIndex, scene in enumerate(scenes):
+            rootNodes = scene['nodes'] if 'nodes' in scene else []
+
+            # Stack of (node index, parent entry, parent path, unnamed node count, unnamed mesh count, depth)
+            stack = [(nodeIndex, -1, '', 0, 0, 0) for nodeIndex in reversed(rootNodes)]
+            while stack:
+                nodeIndex, parent, path, nodeCount, meshCount, depth = stack.pop()
+                # Nodes may not be their own ancestor. Stop if a cycle is found.
+                if depth > maxDepth:
+                    continue
+                node = nodes[nodeIndex]
+
+                if 'name' in node:
+                    nodeName = node['name']
+                else:
+                    nodeName = GLTF_DEFAULT_NODE_PREFIX + str(nodeCount)
+                    nodeCount = nodeCount + 1
+                validName = validNames.get(nodeName)
+                if validName is None:
+                    validName = validNames[nodeName] = createValidName(nodeName)
+                path = path + '/' + validName
+
+                meshIndex = -1
+                mesh = None
+                if 'mesh' in node:
+                    mesh = meshes[node['mesh']]
+                    if mesh:
+                        meshIndex = node['mesh']
+                        if 'name' in mesh:
+                            meshName = mesh['name']
+                        else:
+                            meshName = GLTF_DEFAULT_MESH_PREFIX + str(meshCount)
+                            meshCount = meshCount + 1
+                        validName = validNames.get(meshName)
+                        if validName is None:
+                            validName = validNames[meshName] = createValidName(meshName)
+                        path = path + '/' + validName
+                path = intern(path)
+
+                entry = len(parents)
+                parents.append(parent)
+                self._sceneIndices.append(sceneIndex)
+                self._nodeIndices.append(nodeIndex)
+                self._meshIndices.append(meshIndex)
+                paths.append(path)
+
+                if mesh and 'primitives' in mesh:
+                    primitives = mesh['primitives']
+                    primitiveCount = len(primitives)
+                    for primitiveIndex in range(primitiveCount):
+                        primitivePath = path
+                        if primitiveCount > 1:
+                            primitivePath = intern(path + '/' + GLTF_DEFAULT_PRIMITIVE_PREFIX + str(primitiveIndex))
+                        self._primitiveEntries.append(entry)
+                        self._primitiveIndices.append(primitiveIndex)
+                        self._primitivePaths.append(primitivePath)
+                        self._primitives.append(primitives[primitiveIndex])
+
+                if 'children' in node:
+                    depth = depth + 1
+                    for childIndex in reversed(node['children']):
+                        stack.append((childIndex, entry, path, nodeCount, meshCount, depth))
+
+    def getEntryCount(self) -> int:
+        '''
+        @brief Get the number of node entries.
+        @return The number of node entries.
+        '''
+        return len(self._parents)
+
+    def getParents(self) -> list:
+        '''
+        @brief Get the parent entry of each node entry.
+        @return List of parent entries. -1 is used for scene root nodes.
+        '''
+        return self._parents
+
+    def getSceneIndices(self) -> list:
+        '''
+        @brief Get the glTF scene index of each node entry.
+        @return List of scene indices.
+        '''
+        return self._sceneIndices
+
+    def getNodeIndices(self) -> list:
+        '''
+        @brief Get the glTF node index of each node entry.
+        @return List of node indices.
+        '''
+        return self._nodeIndices
+
+    def getMeshIndices(self) -> list:
+        '''
+        @brief Get the glTF mesh index of each node entry.
+        @return List of mesh indices. -1 is used for nodes without a mesh.
+        '''
+        return self._meshIndices
+
+    def getPaths(self) -> list:
+        '''
+        @brief Get the path of each node entry.
+        @return List of paths.
+        '''
+        return self._paths
+
+    def getPrimitiveEntries(self) -> list:
+        '''
+        @brief Get the node entry of each primitive entry.
+        @return List of node entries.
+        '''
+        return self._primitiveEntries
+
+    def getPrimitiveIndices(self) -> list:
+        '''
+        @brief Get the index of each primitive entry within its mesh.
+        @return List of primitive indices.
+        '''
+        return self._primitiveIndices
+
+    def getPrimitivePaths(self) -> list:
+        '''
+        @brief Get the path of each primitive entry.
+        @return List of paths.
+        '''
+        return self._primitivePaths
+
+    def getPrimitives(self) -> list:
+        '''
+        @brief Get the glTF primitive of each primitive entry.
+        @return List of glTF primitives.
+        '''
+        return self._primitives
+
+    @staticmethod
+    def getPathPrefixes(path) -> list:
+        '''
+        @brief Get the prefixes of a path by component, from shortest to longest.
+        For example the prefixes of '/a/b/c' are '/a', '/a/b' and '/a/b/c'.
+        @param path The path to split.
+        @return List of prefixes. The last prefix is the path itself.
+        '''
+        prefixes = []
+        index = path.find('/', 1)
+        while index > 0:
+            prefixes.append(path[:index])
+            index = path.find('/', index + 1)
+        prefixes.append(path)
+        return prefixes
+
+    def getPrimitivePathCounts(self) -> dict:
+        '''
+        @brief Get the number of distinct primitive paths below each path.
+        @return Dictionary of path to the number of distinct primitive paths which have the path as a prefix,
+        including the path itself.
+        '''
+        if self._primitivePathCounts is None:
+            counts = {}
+            for primitivePath in set(self._primitivePaths):
+                for prefix in self.getPathPrefixes(primitivePath):
+                    counts[prefix] = counts.get(prefix, 0) + 1
+            self._primitivePathCounts = counts
+        return self._primitivePathCounts
+
+    def getPrimitivePrefixEntries(self) -> dict:
+        '''
+        @brief Get the primitive entries below each path.
+        @return Dictionary of path to the list of primitive entries whose path has the path as a prefix,
+        including the path itself.
+        '''
+        if self._primitivePrefixEntries is None:
+            prefixEntries = {}
+            for entry, primitivePath in enumerate(self._primitivePaths):
+                for prefix in self.getPathPrefixes(primitivePath):
+                    prefixEntries.setdefault(prefix, []).append(entry)
+            self._primitivePrefixEntries = prefixEntries
+        return self._primitivePrefixEntries
+
+    def _matchGeomPath(self, geomPath) -> list:
+        entries = self._geomPathEntries.get(geomPath)
+        if entries is not None:
+            return entries
+
+        path = geomPath.strip()
+        if path and not path.startswith('/'):
+            path = '/' + path
+        path = path.rstrip('/')
+        prefixEntries = self.getPrimitivePrefixEntries()
+        if not geomPath.strip():
+            entries = []
+        elif not path:
+            # Universal path
+            entries = list(range(len(self._primitivePaths)))
+        elif '*' in path or '?' in path:
+            pattern = ''.join('[^/]*' if char == '*' else '[^/]' if char == '?' else re.escape(char) for char in path)
+            matcher = re.compile(pattern)
+            entries = []
+            for prefix in prefixEntries:
+                if matcher.fullmatch(prefix):
+                    entries.extend(prefixEntries[prefix])
+        else:
+            entries = prefixEntries.get(path, [])
+        self._geomPathEntries[geomPath] = entries
+        return entries
+
+    def matchGeomString(self, geomString) -> set:
+        '''
+        @brief Find the primitive entries matched by a MaterialX geometry string.
+        Each comma separated path matches the primitives at or below the path. The universal path '/'
+        matches all primitives, and '*' and '?' match any characters, or any one character, within
+        a path component. Matches are cached per path.
+        @param geomString The geometry string to match.
+        @return Set of primitive entries.
+        '''
+        entries = set()
+        for geomPath in geomString.split(','):
+            entries.update(self._matchGeomPath(geomPath))
+        return entries
+
+class GLTFRawValue:
+    '''
+    @brief A glTF JSON value held as the text it was read from. The text is written out as is when
+    the glTF JSON is serialized, and is only parsed if the value is requested.
+    The value refers to a span of the source text, so that the text is not copied.
+    '''
+    def __init__(self, text, start=0, end=None):
+        '''
+        @brief Constructor.
+        @param text The source text containing the value.
+        @param start The index of the first character of the value. Default is 0.
+        @param end The index after the last character of the value. Default is the end of the text.
+        '''
+        self._text = text
+        self._start = start
+        self._end = len(text) if end is None else end
+
+    def getText(self) -> str:
+        '''
+        @brief Get the JSON text of the value.
+        @return The JSON text.
+        '''
+        if self._start == 0 and self._end == len(self._text):
+            return self._text
+        return self._text[self._start:self._end]
+
+    def iterText(self, chunkSize=1 << 20):
+        '''
+        @brief Iterate over the JSON text of the value in chunks, to avoid copying all of the text at once.
+        @param chunkSize Maximum number of characters per chunk. Default is 1M.
+        @return Iterator over the text chunks.
+        '''
+        for start in range(self._start, self._end, chunkSize):
+            yield self._text[start:min(start + chunkSize, self._end)]
+
+    def getValue(self):
+        '''
+        @brief Parse the JSON text of the value.
+        @return The parsed value.
+        '''
+        return json.loads(self.getText())
+
+class GLTFGeometryTemplate:
+    '''
+    @brief Parsed glTF geometry shared by a batch of conversions.
+
+    The geometry is parsed and given default primitive materials once. Each conversion works on
+    an instance which shares the geometry data, such as buffers and accessors, with the template,
+    and has its own copy of the parts modified by a conversion: materials, textures, images,
+    samplers, extensions, the asset, meshes and their primitives, and the node and scene lists.
+
+    When loaded for passthrough, the accessors, buffer views and buffers are never parsed. Their
+    text is kept as GLTFRawValue and copied as is into the serialized output.
+    '''
+    # Top level properties which are copied for each instance
+    _CLONED_PROPERTIES = ['materials', 'textures', 'images', 'samplers', 'extensions', 'extensionsUsed', 'asset']
+    # Top level properties which are kept as text when passing geometry data through
+    _PASSTHROUGH_PROPERTIES = ['accessors', 'bufferViews', 'buffers']
+    # Patterns used to scan JSON text
+    _DELIMITERS = re.compile(r'["\[\]{}]')
+    _WHITESPACE = re.compile(r'[ \t\n\r]*')
+
+    def __init__(self, gltfJson):
+        '''
+        @brief Constructor. The template takes ownership of the glTF JSON, which should not be modified afterwards.
+        @param gltfJson The glTF JSON dictionary containing the geometry.
+        '''
+        self._gltfJson = gltfJson
+
+        # If no materials, add a default material
+        for mesh in gltfJson.get('meshes', []):
+            for primitive in mesh['primitives']:
+                if 'material' not in primitive:
+                    primitive['material'] = 0
+
+    @staticmethod
+    def load(fileName, passthrough=False, errors=None):
+        '''
+        @brief Load a template from a glTF file.
+        @param fileName Name of the glTF file.
+        @param passthrough If True the accessors, buffer views and buffers are not parsed, but kept as
+        GLTFRawValue text which is written out as is. Default is False.
+        @param errors Optional list to append the reason to if the file cannot be read or parsed.
+        @return The template if the file could be read, otherwise None.
+        '''
+        try:
+            with open(fileName, 'r') as gltfFile:
+                if passthrough:
+                    return GLTFGeometryTemplate(GLTFGeometryTemplate.parsePassthrough(gltfFile.read()))
+                return GLTFGeometryTemplate(json.load(gltfFile))
+        except (OSError, ValueError) as err:
+            if errors is not None:
+                errors.append(str(err))
+            return None
+
+    @staticmethod
+    def _skipValue(text, index) -> int:
+        '''
+        @brief Find the end of the JSON value starting at an index without parsing it.
+        Strings within arrays and objects are skipped using a search for the closing quote.
+        @param text The JSON text.
+        @param index The index of the first character of the value.
+        @return The index after the last character of the value.
+        '''
+        if text[index] not in '[{':
+            return json.JSONDecoder().raw_decode(text, index)[1]
+        delimiters = GLTFGeometryTemplate._DELIMITERS
+        depth = 0
+        while True:
+            match = delimiters.search(text, index)
+            if not match:
+                raise ValueError('Unterminated JSON value')
+            char = match.group()
+            index = match.end()
+            if char == '"':
+                while True:
+                    quote = text.find('"', index)
+                    if quote < 0:
+                        raise ValueError('Unterminated JSON string')
+                    index = quote + 1
+                    # The quote is escaped if preceded by an odd number of backslashes
+                    escape = quote
+                    while text[escape - 1] == '\\':
+                        escape -= 1
+                    if (quote - escape) % 2 == 0:
+                        break
+            elif char in '[{':
+                depth += 1
+            else:
+                depth -= 1
+                if depth == 0:
+                    return index
+
+    @staticmethod
+    def parsePassthrough(text, properties=None) -> dict:
+        '''
+        @brief Parse glTF JSON text, keeping the values of some top level properties as GLTFRawValue text.
+        @param text The glTF JSON text.
+        @param properties List of top level properties to keep as text. Default is the accessors,
+        buffer views and buffers.
+        @return The glTF JSON dictionary. A ValueError is raised if the text cannot be parsed.
+        '''
+        if properties is None:
+            properties = GLTFGeometryTemplate._PASSTHROUGH_PROPERTIES
+        decoder = json.JSONDecoder()
+        whitespace = GLTFGeometryTemplate._WHITESPACE
+        gltfJson = {}
+        try:
+            index = whitespace.match(text, 0).end()
+            if text[index] != '{':
+                raise ValueError('Expected a glTF JSON object')
+            index = whitespace.match(text, index + 1).end()
+            if text[index] == '}':
+                return gltfJson
+            while True:
+                if text[index] != '"':
+                    raise ValueError('Expected a property name at %d' % index)
+                key, index = json.decoder.scanstring(text, index + 1)
+                index = whitespace.match(text, index).end()
+                if text[index] != ':':
+                    raise ValueError('Expected \':\' at %d' % index)
+                index = whitespace.match(text, index + 1).end()
+                if key in properties:
+                    end = GLTFGeometryTemplate._skipValue(text, index)
+                    gltfJson[key] = GLTFRawValue(text, index, end)
+                else:
+                    gltfJson[key], end = decoder.raw_decode(text, index)
+                index = whitespace.match(text, end).end()
+                if text[index] == '}':
+                    return gltfJson
+                if text[index] != ',':
+                    raise ValueError('Expected \',\' or \'}\' at %d' % index)
+                index = whitespace.match(text, index + 1).end()
+        except IndexError:
+            raise ValueError('Unexpected end of glTF JSON')
+
+    def getJson(self) -> dict:
+        '''
+        @brief Get the glTF JSON dictionary of the template. The dictionary should not be modified.
+        @return The glTF JSON dictionary.
+        '''
+        return self._gltfJson
+
+    def instantiate(self) -> dict:
+        '''
+        @brief Create a glTF JSON dictionary for a conversion. Properties which are modified by a conversion
+        are copied, and all others are shared with the template.
+        @return The glTF JSON dictionary.
+        '''
+        gltfJson = dict(self._gltfJson)
+        for key in self._CLONED_PROPERTIES:
+            if key in gltfJson:
+                gltfJson[key] = copy.deepcopy(gltfJson[key])
+        if 'meshes' in gltfJson:
+            meshes = []
+            for mesh in gltfJson['meshes']:
+                mesh = dict(mesh)
+                mesh['primitives'] = [dict(primitive) for primitive in mesh['primitives']]
+                meshes.append(mesh)
+            gltfJson['meshes'] = meshes
+        if 'nodes' in gltfJson:
+            gltfJson['nodes'] = list(gltfJson['nodes'])
+        if 'scenes' in gltfJson:
+            scenes = []
+            for scene in gltfJson['scenes']:
+                scene = dict(scene)
+                if 'nodes' in scene:
+                    scene['nodes'] = list(scene['nodes'])
+                scenes.append(scene)
+            gltfJson['scenes'] = scenes
+        return gltfJson
+
+class GLTFSharedBuffers:
+    '''
+    @brief Buffers shared by a batch of glTF files written to a folder.
+
+    Each distinct buffer, either an external file or a data URI, is written to the folder once.
+    The buffers of each glTF file are then given URIs relative to the file which refer to the
+    shared buffers. A manifest lists which glTF files share each buffer.
+    '''
+    def __init__(self, folder):
+        '''
+        @brief Constructor.
+        @param folder The folder to write shared buffers and the manifest to.
+        '''
+        self._folder = os.path.abspath(folder)
+        # Shared buffer file names keyed by source file path or data URI
+        self._fileNames : dict = {}
+        # Manifest entries keyed by shared buffer file name
+        self._entries : dict = {}
+
+    def getFolder(self) -> str:
+        '''
+        @brief Get the folder shared buffers are written to.
+        @return The folder path.
+        '''
+        return self._folder
+
+    def _createFileName(self, name) -> str:
+        '''
+        @brief Create a buffer file name which is not used by another shared buffer.
+        @param name The preferred file name.
+        @return The file name.
+        '''
+        stem, extension = os.path.splitext(name)
+        fileName = name
+        count = 1
+        while fileName in self._entries:
+            fileName = '%s_%d%s' % (stem, count, extension)
+            count += 1
+        return fileName
+
+    def _shareBuffer(self, uri, index, searchPath):
+        '''
+        @brief Write a buffer to the folder if it has not been written already.
+        @param uri The buffer URI.
+        @param index The buffer index, used to name buffers held as data URIs.
+        @param searchPath Search path used to find buffer files.
+        @return The shared buffer file name, or None if the buffer could not be found.
+        '''
+        isDataUri = uri.startswith('data:')
+        if isDataUri:
+            source = uri
+        else:
+            path = searchPath.find(uri) if searchPath else mx.FilePath(uri)
+            source = os.path.abspath(path.asString())
+            if not os.path.isfile(source):
+                return None
+        if source in self._fileNames:
+            return self._fileNames[source]
+
+        if isDataUri:
+            fileName = self._createFileName('buffer%d.bin' % index)
+            header, _, data = uri.partition(',')
+            with open(os.path.join(self._folder, fileName), 'wb') as f:
+                f.write(base64.b64decode(data) if header.endswith(';base64') else data.encode('utf-8'))
+            sourceName = ''
+        else:
+            fileName = self._createFileName(os.path.basename(source))
+            target = os.path.join(self._folder, fileName)
+            if not os.path.exists(target) or not os.path.samefile(source, target):
+                shutil.copyfile(source, target)
+            sourceName = source
+        # Later lookups may find the shared copy in the folder instead of the source
+        self._fileNames[source] = fileName
+        self._fileNames[os.path.join(self._folder, fileName)] = fileName
+        self._entries[fileName] = { 'source' : sourceName, 'outputs' : [] }
+        return fileName
+
+    def shareBuffers(self, gltfJson, gltfFileName, searchPath=None) -> list:
+        '''
+        @brief Write the buffers of a glTF document to the folder and update the document to refer to them.
+        The buffer list of the document is replaced, so buffers shared with a GLTFGeometryTemplate are not modified.
+        Buffers without a URI, or whose file cannot be found, are left unchanged.
+        @param gltfJson The glTF JSON dictionary to update.
+        @param gltfFileName The name of the glTF file the document will be written to.
+        @param searchPath Optional search path used to find buffer files.
+        @return List of shared buffer file names used by the document.
+        '''
+        buffers = gltfJson.get('buffers', [])
+        if isinstance(buffers, GLTFRawValue):
+            buffers = buffers.getValue()
+        if not buffers:
+            return []
+
+        gltfFolder = os.path.dirname(os.path.abspath(gltfFileName))
+        outputName = os.path.relpath(os.path.abspath(gltfFileName), self._folder).replace(os.sep, '/')
+        sharedBuffers = []
+        fileNames = []
+        for index, buffer in enumerate(buffers):
+            fileName = self._shareBuffer(buffer['uri'], index, searchPath) if 'uri' in buffer else None
+            if fileName:
+                buffer = dict(buffer)
+                buffer['uri'] = os.path.relpath(os.path.join(self._folder, fileName), gltfFolder).replace(os.sep, '/')
+                outputs = self._entries[fileName]['outputs']
+                if outputName not in outputs:
+                    outputs.append(outputName)
+                fileNames.append(fileName)
+            sharedBuffers.append(buffer)
+        gltfJson['buffers'] = sharedBuffers
+        return fileNames
+
+    def getManifest(self) -> dict:
+        '''
+        @brief Get the manifest of shared buffers.
+        @return Dictionary with a 'buffers' list. Each entry gives the shared buffer 'uri' relative to the folder,
+        the 'source' file it was copied from, which is empty for data URIs, and the glTF 'outputs' which use it.
+        '''
+        buffers = []
+        for fileName, entry in self._entries.items():
+            buffers.append({ 'uri' : fileName, 'source' : entry['source'], 'outputs' : list(entry['outputs']) })
+        return { 'buffers' : buffers }
+
+    def writeManifest(self, fileName=GLTF_SHARED_BUFFERS_MANIFEST) -> str:
+        '''
+        @brief Write the manifest of shared buffers as JSON.
+        @param fileName The manifest file name. Relative names are relative to the folder.
+        Default is GLTF_SHARED_BUFFERS_MANIFEST.
+        @return The path of the manifest file written.
+        '''
+        path = os.path.join(self._folder, fileName)
+        with open(path, 'w') as f:
+            json.dump(self.getManifest(), f, indent=2)
+        return path
+
+#########################################################################################
+# MaterialX document utilities
+#########################################################################################
+class MaterialXShaderIndex:
+    '''
+    @brief Index of the shader nodes of a MaterialX document and of the elements connected to their inputs.
+
+    Shader nodes are found in a single pass over the material nodes and are kept by category
+    in material order. Inputs, upstream nodes, input values and resolved file names are looked
+    up on first use and cached by node path, so that each is computed once per conversion.
+
+    File names are resolved as ValueElement.getResolvedValueString() does, except that the
+    token substitutions of each ancestor element are only gathered once, instead of for
+    every resolved value.
+    An index should only be used while shader inputs and connections are not modified.
+    '''
+    def __init__(self, graphElement=None):
+        '''
+        @brief Constructor. Builds the index for a document or node graph.
+        @param graphElement The GraphElement whose material nodes are indexed. If not specified
+        no shader nodes are indexed, though lookups are still cached.
+        '''
+        self._shaderNodes : dict = {}
+        self._inputs : dict = {}
+        self._connectedNodes : dict = {}
+        self._inputValues : dict = {}
+        self._fileInputs : dict = {}
+        self._fileNames : dict = {}
+        self._tokenSubstitutions : dict = {}
+        self._nodeDefCache = NodeDefCache()
+
+        if graphElement:
+            self._build(graphElement)
+
+    def _build(self, graphElement):
+        for material in graphElement.getMaterialNodes():
+            for shaderNode in mx.getShaderNodes(material):
+                shaderNodes = self._shaderNodes.setdefault(shaderNode.getCategory(), {})
+                path = shaderNode.getNamePath()
+                if path not in shaderNodes:
+                    shaderNodes[path] = shaderNode
+
+    def getCategories(self) -> list:
+        '''
+        @brief Get the categories of the indexed shader nodes.
+        @return List of categories in the order first found.
+        '''
+        return list(self._shaderNodes.keys())
+
+    def getShaderNodes(self, category=None) -> dict:
+        '''
+        @brief Get the shader nodes referenced by material nodes.
+        @param category Optional shader node category to filter by.
+        @return Dictionary of shader node path to shader node. Nodes of each category are in material order.
+        '''
+        if category is not None:
+            return self._shaderNodes.get(category, {})
+        shaderNodes = {}
+        for categoryNodes in self._shaderNodes.values():
+            shaderNodes.update(categoryNodes)
+        return shaderNodes
+
+    def getInputs(self, node) -> dict:
+        '''
+        @brief Get the inputs of a node.
+        @param node The node to examine.
+        @return Dictionary of input name to input.
+        '''
+        path = node.getNamePath()
+        inputs = self._inputs.get(path)
+        if inputs is None:
+            inputs = self._inputs[path] = { input.getName() : input for input in node.getInputs() }
+        return inputs
+
+    def getInput(self, node, inputName) -> mx.Input:
+        '''
+        @brief Get an input of a node. Equivalent to Node.getInput().
+        @param node The node to examine.
+        @param inputName The name of the input.
+        @return The input if found, otherwise None.
+        '''
+        return self.getInputs(node).get(inputName)
+
+    def getConnectedNode(self, node, inputName) -> mx.Node:
+        '''
+        @brief Get the node connected upstream of an input. Equivalent to Node.getConnectedNode().
+        @param node The node to examine.
+        @param inputName The name of the input.
+        @return The connected node if any, otherwise None.
+        '''
+        key = (node.getNamePath(), inputName)
+        if key not in self._connectedNodes:
+            input = self.getInput(node, inputName)
+            self._connectedNodes[key] = input.getConnectedNode() if input else None
+        return self._connectedNodes[key]
+
+    def getInputValue(self, node, inputName):
+        '''
+        @brief Get the value of an input, or of the definition input if the node has no such input.
+        Equivalent to Node.getInputValue().
+        @param node The node to examine.
+        @param inputName The name of the input.
+        @return The value if found, otherwise None.
+        '''
+        key = (node.getNamePath(), inputName)
+        if key not in self._inputValues:
+            input = self.getInput(node, inputName)
+            self._inputValues[key] = input.getValue() if input else self.getInputDefault(node, inputName)
+        return self._inputValues[key]
+
+    def getNodeDef(self, node) -> mx.NodeDef:
+        '''
+        @brief Get the definition of a node. Definitions are cached using a NodeDefCache.
+        @param node The node to examine.
+        @return The node definition if found, otherwise None.
+        '''
+        return self._nodeDefCache.getNodeDef(node)
+
+    def getInputDefault(self, node, inputName):
+        '''
+        @brief Get the default value of a node input from its definition. Values are cached using a NodeDefCache.
+        @param node The node to examine.
+        @param inputName The name of the input.
+        @return The default value if found, otherwise None.
+        '''
+        return self._nodeDefCache.getInputDefault(node, inputName)
+
+    def getFileInput(self, imageNode) -> mx.Input:
+        '''
+        @brief Get the file input of an image node.
+        @param imageNode The image node to examine.
+        @return The file input if it is of type filename, otherwise None.
+        '''
+        path = imageNode.getNamePath()
+        if path not in self._fileInputs:
+            fileInput = self.getInput(imageNode, mx.Implementation.FILE_ATTRIBUTE)
+            if fileInput and fileInput.getAttribute(mx.TypedElement.TYPE_ATTRIBUTE) != mx.FILENAME_TYPE_STRING:
+                fileInput = None
+            self._fileInputs[path] = fileInput
+        return self._fileInputs[path]
+
+    def getFileName(self, imageNode) -> str:
+        '''
+        @brief Get the resolved file name of an image node.
+        @param imageNode The image node to examine.
+        @return The resolved file name, or an empty string if the node has no file input of type filename.
+        '''
+        path = imageNode.getNamePath()
+        if path not in self._fileNames:
+            fileInput = self.getFileInput(imageNode)
+            self._fileNames[path] = self.getResolvedValueString(fileInput) if fileInput else EMPTY_STRING
+        return self._fileNames[path]
+
+    def _getTokenSubstitutions(self, element) -> list:
+        path = element.getNamePath()
+        substitutions = self._tokenSubstitutions.get(path)
+        if substitutions is None:
+            substitutions = []
+            if element.isA(mx.InterfaceElement):
+                for token in element.getTokens():
+                    substitutions.append(('[' + token.getName() + ']', token.getResolvedValueString()))
+            self._tokenSubstitutions[path] = substitutions
+        return substitutions
+
+    def getResolvedValueString(self, valueElement) -> str:
+        '''
+        @brief Get the resolved value string of a value element. Equivalent to ValueElement.getResolvedValueString().
+        @param valueElement The value element to resolve.
+        @return The value string with prefixes and token substitutions applied.
+        '''
+        if valueElement.getType() not in (mx.FILENAME_TYPE_STRING, mx.GEOMNAME_TYPE_STRING):
+            return valueElement.getValueString()
+        # A document has no ancestors, so its resolver starts without token substitutions
+        resolver = valueElement.getDocument().createStringResolver()
+        resolver.setFilePrefix(valueElement.getActiveFilePrefix())
+        resolver.setGeomPrefix(valueElement.getActiveGeomPrefix())
+        # Nearer tokens take precedence over tokens of the same name further up
+        substituted = set()
+        parent = valueElement.getParent()
+        while parent:
+            for key, value in self._getTokenSubstitutions(parent):
+                if key not in substituted:
+                    resolver.setFilenameSubstitution(key, value)
+                    substituted.add(key)
+            parent = parent.getParent()
+        return resolver.resolve(valueElement.getValueString(), valueElement.getType())
+
+#########################################################################################
+# Texture baking utilities
+#########################################################################################
+class CPUTextureBaker:
+    '''
+    @brief Texture baker which evaluates pattern graphs on the CPU using NumPy.
+    Values are evaluated in single precision, as on the GPU.
+
+    Graphs are evaluated over a grid of texture coordinates covering the 0 to 1 range. The nodes
+    supported are: constant, image, texcoord, arithmetic and math nodes without noise, mix, clamp,
+    extract, combine, separate, convert, luminance, comparisons, ramps and splits, rotate2d and
+    normalmap when connected directly to a shader input. Other nodes with a node graph implementation,
+    such as place2d, tiledimage and the glTF image nodes, are evaluated through their graphs.
+
+    Graphs using other nodes, or geometric properties other than texture coordinates, cannot be baked.
+    In this case bakeAllMaterials() writes nothing and returns False, so that a GPU baker can be used.
+
+    Baked documents have the same layout as those written by the MaterialX TextureBaker. Uniform results
+    are written as linear shader input values, and omitted if equal to the shader input default. Other
+    results are written as images, named <material>_<shading model>_<input>, which are referenced from a
+    "NG_baked" node graph. 8-bit images of colors are sRGB encoded.
+    '''
+    # Channel count of each type which can be baked
+    _TYPE_CHANNELS = { 'float' : 1, 'integer' : 1, 'boolean' : 1, 'vector2' : 2,
+                       'vector3' : 3, 'color3' : 3, 'vector4' : 4, 'color4' : 4 }
+    # Types which can only be baked to uniform values
+    _VALUE_TYPES = [ 'integer', 'boolean' ]
+    # Types which are color managed
+    _COLOR_TYPES = [ 'color3', 'color4' ]
+    # Color spaces which are equivalent to the linear working color space
+    _LINEAR_COLOR_SPACES = [ EMPTY_STRING, 'lin_rec709' ]
+    # Channel index of each separate node output suffix
+    _CHANNEL_SUFFIXES = { 'x' : 0, 'r' : 0, 'y' : 1, 'g' : 1, 'z' : 2, 'b' : 2, 'w' : 3, 'a' : 3 }
+    # Errors raised by NumPy or MaterialX while evaluating a graph, after which the GPU baker can still be used
+    _EVALUATION_ERRORS = (ValueError, TypeError, IndexError, ArithmeticError, mx.Exception)
+
+    class UnsupportedError(Exception):
+        '''
+        @brief Raised when a graph uses nodes, types or geometric properties which cannot be evaluated.
+        '''
+
+    class GeomProp:
+        '''
+        @brief Result of evaluating a geometric property which cannot be baked.
+        '''
+        def __init__(self, name):
+            '''
+            @brief Constructor.
+            @param name The geometric property name.
+            '''
+            self.name = name
+
+    def __init__(self, width=256, height=256, hdr=False, average=False, searchPath=None):
+        '''
+        @brief Constructor.
+        @param width The width of baked images.
+        @param height The height of baked images.
+        @param hdr Bake to floating point images instead of 8-bit images. Default is False.
+        @param average Replace baked images with their average value. Default is False.
+        @param searchPath Optional search path used to find images.
+        '''
+        self._width = width
+        self._height = height
+        self._hdr = hdr
+        self._average = average
+        self._searchPath = searchPath if searchPath else mx.FileSearchPath()
+        self._imageLoader = mx_render.StbImageLoader.create()
+        self._error = ''
+        # Loaded images by resolved path, node results by node, output and graph context
+        self._images : dict = {}
+        self._values : dict = {}
+        # Graph contexts are kept alive while baking, as results are keyed by context identity
+        self._contexts : list = []
+        self._graphContexts : dict = {}
+        self._uv = None
+        # Set when a file name is evaluated, as results which depend on files are not folded to constants
+        self._usesFiles = False
+
+    @staticmethod
+    def isAvailable() -> bool:
+        '''
+        @brief Check if the CPU baker can be used.
+        @return True if NumPy is available.
+        '''
+        return np is not None
+
+    def getError(self) -> str:
+        '''
+        @brief Get the reason the last bake failed.
+        @return The error, or an empty string if the last bake succeeded.
+        '''
+        return self._error
+
+    @staticmethod
+    def srgbToLinear(data):
+        '''
+        @brief Convert sRGB encoded values to linear values.
+        @param data Array of sRGB encoded values.
+        @return Array of linear values.
+        '''
+        return np.where(data <= 0.04045, data / 12.92, np.power((np.maximum(data, 0.04045) + 0.055) / 1.055, 2.4))
+
+    @staticmethod
+    def linearToSrgb(data):
+        '''
+        @brief Convert linear values to sRGB encoded values.
+        @param data Array of linear values.
+        @return Array of sRGB encoded values.
+        '''
+        return np.where(data <= 0.0031308, data * 12.92, 1.055 * np.power(np.maximum(data, 0.0031308), 1.0 / 2.4) - 0.055)
+
+    @staticmethod
+    def _applyColorTransform(data, transform):
+        '''
+        @brief Apply a color transform to the color channels of an array, leaving any alpha channel unchanged.
+        '''
+        if data.shape[-1] == 4:
+            return np.concatenate([transform(data[..., :3]), data[..., 3:]], axis=-1)
+        return transform(data)
+
+    @staticmethod
+    def adaptChannels(data, channels):
+        '''
+        @brief Convert an array to a number of channels. Grey images are expanded to colors,
+        missing channels are set to 1, and extra channels are dropped.
+        @param data Array with channels in the last dimension.
+        @param channels The number of channels required.
+        @return The converted array.
+        '''
+        count = data.shape[-1]
+        if count == channels:
+            return data
+        if count <= 2 and channels >= 2:
+            grey = data[..., :1]
+            alpha = data[..., 1:2] if count == 2 else np.ones_like(grey)
+            if channels == 2:
+                return np.concatenate([grey, alpha], axis=-1)
+            colors = np.repeat(grey, 3, axis=-1)
+            return colors if channels == 3 else np.concatenate([colors, alpha], axis=-1)
+        if count > channels:
+            return data[..., :channels]
+        return np.concatenate([data, np.ones(data.shape[:-1] + (channels - count,), dtype=data.dtype)], axis=-1)
+
+    def _getUV(self):
+        '''
+        @brief Get the texture coordinates at the center of each baked texel. The first row is the top of the image.
+        '''
+        if self._uv is None:
+            u = (np.arange(self._width, dtype=np.float32) + 0.5) / self._width
+            v = 1.0 - (np.arange(self._height, dtype=np.float32) + 0.5) / self._height
+            uu, vv = np.meshgrid(u, v)
+            self._uv = np.stack([uu, vv], axis=-1)
+        return self._uv
+
+    def _evaluateGeomProp(self, element, name, portType):
+        '''
+        @brief Evaluate a geometric property. Texture coordinates are supported.
+        '''
+        geomPropDef = element.getDocument().getGeomPropDef(name)
+        if geomPropDef and geomPropDef.getGeomProp() == 'texcoord':
+            uv = self._getUV()
+            return np.concatenate([uv, np.zeros_like(uv[..., :1])], axis=-1) if portType == 'vector3' else uv
+        return CPUTextureBaker.GeomProp(name)
+
+    def _evaluateValue(self, port):
+        '''
+        @brief Evaluate the value of an unconnected port.
+        '''
+        portType = port.getType()
+        if portType == 'filename':
+            fileName = port.getResolvedValueString()
+            if fileName:
+                self._usesFiles = True
+            return (fileName, port.getActiveColorSpace())
+        if portType == 'string':
+            return port.getValueString()
+        value = port.getValue()
+        if value is None:
+            raise CPUTextureBaker.UnsupportedError('No value for: ' + port.getNamePath())
+        if isinstance(value, (bool, int, float)):
+            return np.full((1, 1, 1), value, dtype=np.float32)
+        if not hasattr(value, 'asTuple'):
+            raise CPUTextureBaker.UnsupportedError('Unsupported type %s for: %s' % (portType, port.getNamePath()))
+        data = np.array(value.asTuple(), dtype=np.float32).reshape(1, 1, -1)
+        if portType in self._COLOR_TYPES:
+            colorSpace = port.getActiveColorSpace()
+            if colorSpace == 'srgb_texture':
+                data = self._applyColorTransform(data, self.srgbToLinear)
+            elif colorSpace not in self._LINEAR_COLOR_SPACES:
+                raise CPUTextureBaker.UnsupportedError('Unsupported color space %s for: %s' % (colorSpace, port.getNamePath()))
+        return data
+
+    def _getGraphContext(self, graph):
+        '''
+        @brief Get the context of a node graph in a document, which maps its interface names to its inputs.
+        '''
+        graphPath = graph.getNamePath()
+        if graphPath not in self._graphContexts:
+            context = { graphInput.getName() : (graphInput, None) for graphInput in graph.getInputs() }
+            self._contexts.append(context)
+            self._graphContexts[graphPath] = context
+        return self._graphContexts[graphPath]
+
+    def _evaluatePort(self, port, context):
+        '''
+        @brief Evaluate an input or output, following its connection to a node, node graph output or interface input.
+        @param port The input or output to evaluate.
+        @param context Dictionary mapping interface names of the enclosing graph to (port, context) pairs.
+        @return Array with channels in the last dimension, a string, a (file name, color space) pair
+        for file names, or a GeomProp.
+        '''
+        interfaceName = port.getAttribute(MTLX_INTERFACEINPUT_NAME_ATTRIBUTE)
+        if interfaceName:
+            if not context or interfaceName not in context:
+                raise CPUTextureBaker.UnsupportedError('Unresolved interface input %s for: %s' % (interfaceName, port.getNamePath()))
+            interfacePort, interfaceContext = context[interfaceName]
+            return self._evaluatePort(interfacePort, interfaceContext)
+
+        outputName = port.getAttribute('output')
+        graphName = port.getAttribute(MTLX_NODEGRAPH_NAME_ATTRIBUTE)
+        if graphName:
+            graph = port.getDocument().getNodeGraph(graphName)
+            if not graph:
+                raise CPUTextureBaker.UnsupportedError('Cannot find node graph %s for: %s' % (graphName, port.getNamePath()))
+            output = graph.getOutput(outputName) if outputName else graph.getOutputs()[0]
+            return self._evaluatePort(output, self._getGraphContext(graph))
+
+        nodeName = port.getAttribute(MTLX_NODE_NAME_ATTRIBUTE)
+        if nodeName:
+            parent = port.getParent()
+            graph = parent if port.isA(mx.Output) else parent.getParent()
+            node = graph.getNode(nodeName)
+            if not node:
+                raise CPUTextureBaker.UnsupportedError('Cannot find node %s for: %s' % (nodeName, port.getNamePath()))
+            return self._evaluateNode(node, outputName, context)
+
+        if port.isA(mx.Output):
+            raise CPUTextureBaker.UnsupportedError('Unconnected output: ' + port.getNamePath())
+        geomPropName = port.getAttribute('defaultgeomprop')
+        if geomPropName and not port.hasValueString():
+            return self._evaluateGeomProp(port, geomPropName, port.getType())
+        return self._evaluateValue(port)
+
+    def _evaluateNode(self, node, outputName, context):
+        '''
+        @brief Evaluate an output of a node. Results are cached per node, output and graph context.
+        '''
+        key = (node.getNamePath(), outputName, id(context))
+        if key not in self._values:
+            self._values[key] = self._computeNode(node, outputName, context)
+        return self._values[key]
+
+    def _getImplementationContext(self, node, nodedef, context):
+        '''
+        @brief Create the context used to evaluate the node graph implementation of a node instance.
+        @param node The node instance.
+        @param nodedef The definition of the node.
+        @param context The context the node instance is evaluated in.
+        @return Dictionary of interface input name to (port, context) pairs.
+        '''
+        graphContext = {}
+        for nodedefInput in nodedef.getActiveInputs():
+            nodeInput = node.getInput(nodedefInput.getName())
+            graphContext[nodedefInput.getName()] = (nodeInput, context) if nodeInput else (nodedefInput, None)
+        self._contexts.append(graphContext)
+        return graphContext
+
+    def _computeNode(self, node, outputName, context):
+        '''
+        @brief Compute an output of a node, using a built in operation or the node graph implementation of the node.
+        '''
+        nodedef = node.getNodeDef()
+        if not nodedef:
+            raise CPUTextureBaker.UnsupportedError('Cannot find definition for node: ' + node.getNamePath())
+        outputType = node.getType()
+        if outputType == MULTI_OUTPUT_TYPE_STRING:
+            output = nodedef.getActiveOutput(outputName)
+            outputType = output.getType() if output else EMPTY_STRING
+
+        def getInput(name, allowGeomProp=False):
+            nodeInput = node.getInput(name)
+            if nodeInput:
+                value = self._evaluatePort(nodeInput, context)
+            else:
+                nodedefInput = nodedef.getActiveInput(name)
+                if not nodedefInput:
+                    raise CPUTextureBaker.UnsupportedError('Cannot find input %s for: %s' % (name, node.getNamePath()))
+                value = self._evaluatePort(nodedefInput, None)
+            if not allowGeomProp and isinstance(value, CPUTextureBaker.GeomProp):
+                raise CPUTextureBaker.UnsupportedError('Cannot bake geometric property %s used by: %s' % (value.name, node.getNamePath()))
+            return value
+
+        category = node.getCategory()
+        operation = getattr(self, '_node_' + category, None)
+        if operation:
+            return operation(getInput, outputType, outputName, node)
+
+        implementation = nodedef.getImplementation()
+        if implementation and implementation.isA(mx.NodeGraph):
+            graphContext = self._getImplementationContext(node, nodedef, context)
+            output = implementation.getOutput(outputName) if outputName else implementation.getOutputs()[0]
+            return self._evaluatePort(output, graphContext)
+
+        raise CPUTextureBaker.UnsupportedError('Cannot bake node %s of category %s' % (node.getNamePath(), category))
+
+    # Built in node operations. Each takes an input getter, the output type and name, and the node.
+
+    def _node_constant(self, getInput, outputType, outputName, node):
+        return getInput('value')
+
+    def _node_dot(self, getInput, outputType, outputName, node):
+        return getInput('in', True)
+
+    def _node_texcoord(self, getInput, outputType, outputName, node):
+        return self._evaluateGeomProp(node, 'UV0', outputType)
+
+    def _node_add(self, getInput, outputType, outputName, node):
+        return getInput('in1') + getInput('in2')
+
+    def _node_subtract(self, getInput, outputType, outputName, node):
+        return getInput('in1') - getInput('in2')
+
+    def _node_multiply(self, getInput, outputType, outputName, node):
+        return getInput('in1') * getInput('in2')
+
+    def _node_divide(self, getInput, outputType, outputName, node):
+        return getInput('in1') / getInput('in2')
+
+    def _node_modulo(self, getInput, outputType, outputName, node):
+        in1, in2 = getInput('in1'), getInput('in2')
+        return in1 - in2 * np.floor(in1 / in2)
+
+    def _node_min(self, getInput, outputType, outputName, node):
+        return np.minimum(getInput('in1'), getInput('in2'))
+
+    def _node_max(self, getInput, outputType, outputName, node):
+        return np.maximum(getInput('in1'), getInput('in2'))
+
+    def _node_power(self, getInput, outputType, outputName, node):
+        return np.power(getInput('in1'), getInput('in2'))
+
+    def _node_invert(self, getInput, outputType, outputName, node):
+        return getInput('amount') - getInput('in')
+
+    def _node_absval(self, getInput, outputType, outputName, node):
+        return np.abs(getInput('in'))
+
+    def _node_sign(self, getInput, outputType, outputName, node):
+        return np.sign(getInput('in'))
+
+    def _node_floor(self, getInput, outputType, outputName, node):
+        return np.floor(getInput('in'))
+
+    def _node_ceil(self, getInput, outputType, outputName, node):
+        return np.ceil(getInput('in'))
+
+    def _node_sqrt(self, getInput, outputType, outputName, node):
+        return np.sqrt(getInput('in'))
+
+    def _node_exp(self, getInput, outputType, outputName, node):
+        return np.exp(getInput('in'))
+
+    def _node_ln(self, getInput, outputType, outputName, node):
+        return np.log(getInput('in'))
+
+    def _node_sin(self, getInput, outputType, outputName, node):
+        return np.sin(getInput('in'))
+
+    def _node_cos(self, getInput, outputType, outputName, node):
+        return np.cos(getInput('in'))
+
+    def _node_tan(self, getInput, outputType, outputName, node):
+        return np.tan(getInput('in'))
+
+    def _node_asin(self, getInput, outputType, outputName, node):
+        return np.arcsin(getInput('in'))
+
+    def _node_acos(self, getInput, outputType, outputName, node):
+        return np.arccos(getInput('in'))
+
+    def _node_atan2(self, getInput, outputType, outputName, node):
+        return np.arctan2(getInput('iny'), getInput('inx'))
+
+    def _node_clamp(self, getInput, outputType, outputName, node):
+        return np.minimum(np.maximum(getInput('in'), getInput('low')), getInput('high'))
+
+    def _node_smoothstep(self, getInput, outputType, outputName, node):
+        low, high = getInput('low'), getInput('high')
+        t = np.clip((getInput('in') - low) / (high - low), 0.0, 1.0)
+        return t * t * (3.0 - 2.0 * t)
+
+    def _node_remap(self, getInput, outputType, outputName, node):
+        inLow, outLow = getInput('inlow'), getInput('outlow')
+        return outLow + (getInput('in') - inLow) * (getInput('outhigh') - outLow) / (getInput('inhigh') - inLow)
+
+    def _node_mix(self, getInput, outputType, outputName, node):
+        background = getInput('bg')
+        return background + (getInput('fg') - background) * getInput('mix')
+
+    def _node_extract(self, getInput, outputType, outputName, node):
+        index = int(getInput('index').flat[0])
+        return getInput('in')[..., index:index + 1]
+
+    def _combine(self, getInput, count):
+        channels = [ getInput('in%d' % (index + 1)) for index in range(count) ]
+        shape = np.broadcast_shapes(*[ channel.shape[:-1] + (1,) for channel in channels ])
+        return np.concatenate([ np.broadcast_to(channel, shape[:-1] + channel.shape[-1:]) for channel in channels ], axis=-1)
+
+    def _node_combine2(self, getInput, outputType, outputName, node):
+        return self._combine(getInput, 2)
+
+    def _node_combine3(self, getInput, outputType, outputName, node):
+        return self._combine(getInput, 3)
+
+    def _node_combine4(self, getInput, outputType, outputName, node):
+        return self._combine(getInput, 4)
+
+    def _separate(self, getInput, outputName):
+        index = self._CHANNEL_SUFFIXES.get(outputName[-1:]) if outputName else None
+        if index is None:
+            raise CPUTextureBaker.UnsupportedError('Unsupported separate output: ' + outputName)
+        return getInput('in')[..., index:index + 1]
+
+    def _node_separate2(self, getInput, outputType, outputName, node):
+        return self._separate(getInput, outputName)
+
+    def _node_separate3(self, getInput, outputType, outputName, node):
+        return self._separate(getInput, outputName)
+
+    def _node_separate4(self, getInput, outputType, outputName, node):
+        return self._separate(getInput, outputName)
+
+    def _node_convert(self, getInput, outputType, outputName, node):
+        data = getInput('in')
+        channels = self._TYPE_CHANNELS.get(outputType)
+        if not channels or isinstance(data, (str, tuple)):
+            raise CPUTextureBaker.UnsupportedError('Unsupported conversion for: ' + node.getNamePath())
+        if data.shape[-1] == 1:
+            return np.repeat(data, channels, axis=-1)
+        if data.shape[-1] == 2 and channels > 2:
+            # Vectors are extended with 0 for z, and 1 for w
+            extended = np.concatenate([data, np.zeros_like(data[..., :1])], axis=-1)
+            return self.adaptChannels(extended, channels)
+        return self.adaptChannels(data, channels)
+
+    def _node_luminance(self, getInput, outputType, outputName, node):
+        data = getInput('in')
+        luminance = np.sum(data[..., :3] * getInput('lumacoeffs'), axis=-1, keepdims=True)
+        return np.concatenate([np.repeat(luminance, 3, axis=-1)] + ([data[..., 3:]] if data.shape[-1] == 4 else []), axis=-1)
+
+    def _node_dotproduct(self, getInput, outputType, outputName, node):
+        return np.sum(getInput('in1') * getInput('in2'), axis=-1, keepdims=True)
+
+    def _node_magnitude(self, getInput, outputType, outputName, node):
+        return np.sqrt(np.sum(np.square(getInput('in')), axis=-1, keepdims=True))
+
+    def _node_normalize(self, getInput, outputType, outputName, node):
+        data = getInput('in')
+        return data / np.sqrt(np.sum(np.square(data), axis=-1, keepdims=True))
+
+    def _condition(self, getInput, compare):
+        condition = compare(getInput('value1'), getInput('value2'))
+        return np.where(np.all(condition, axis=-1, keepdims=True), getInput('in1'), getInput('in2'))
+
+    def _node_ifgreater(self, getInput, outputType, outputName, node):
+        return self._condition(getInput, np.greater)
+
+    def _node_ifgreatereq(self, getInput, outputType, outputName, node):
+        return self._condition(getInput, np.greater_equal)
+
+    def _node_ifequal(self, getInput, outputType, outputName, node):
+        return self._condition(getInput, np.equal)
+
+    def _node_ramplr(self, getInput, outputType, outputName, node):
+        left = getInput('valuel')
+        return left + (getInput('valuer') - left) * np.clip(getInput('texcoord')[..., 0:1], 0.0, 1.0)
+
+    def _node_ramptb(self, getInput, outputType, outputName, node):
+        bottom = getInput('valueb')
+        return bottom + (getInput('valuet') - bottom) * np.clip(getInput('texcoord')[..., 1:2], 0.0, 1.0)
+
+    def _node_splitlr(self, getInput, outputType, outputName, node):
+        step = getInput('texcoord')[..., 0:1] >= getInput('center')
+        return np.where(step, getInput('valuer'), getInput('valuel'))
+
+    def _node_splittb(self, getInput, outputType, outputName, node):
+        step = getInput('texcoord')[..., 1:2] >= getInput('center')
+        return np.where(step, getInput('valuet'), getInput('valueb'))
+
+    def _node_rotate2d(self, getInput, outputType, outputName, node):
+        data = getInput('in')
+        radians = np.radians(getInput('amount'))
+        sa, ca = np.sin(radians), np.cos(radians)
+        x, y = data[..., 0:1], data[..., 1:2]
+        return np.concatenate([ca * x + sa * y, -sa * x + ca * y], axis=-1)
+
+    def _node_roughness_anisotropy(self, getInput, outputType, outputName, node):
+        roughnessSquared = np.clip(np.square(getInput('roughness')), 1e-8, 1.0)
+        anisotropy = getInput('anisotropy')
+        aspect = np.sqrt(1.0 - np.clip(anisotropy, 0.0, 0.98))
+        anisotropic = anisotropy > 0.0
+        x = np.where(anisotropic, np.minimum(roughnessSquared / aspect, 1.0), roughnessSquared)
+        y = np.where(anisotropic, roughnessSquared * aspect, roughnessSquared)
+        x, y = np.broadcast_arrays(x, y)
+        return np.concatenate([x, y], axis=-1)
+
+    def _node_image(self, getInput, outputType, outputName, node):
+        fileName, colorSpace = getInput('file')
+        default = getInput('default')
+        channels = self._TYPE_CHANNELS.get(outputType)
+        if not channels:
+            raise CPUTextureBaker.UnsupportedError('Unsupported image type for: ' + node.getNamePath())
+        data = self._loadImage(fileName) if fileName else None
+        if data is None:
+            return default
+
+        data = self.adaptChannels(data, channels)
+        if outputType in self._COLOR_TYPES:
+            if colorSpace == 'srgb_texture':
+                data = self._applyColorTransform(data, self.srgbToLinear)
+            elif colorSpace not in self._LINEAR_COLOR_SPACES:
+                raise CPUTextureBaker.UnsupportedError('Unsupported color space %s for: %s' % (colorSpace, node.getNamePath()))
+
+        texcoord = np.broadcast_to(getInput('texcoord'), (self._height, self._width, 2))
+        return self.sampleImage(data, texcoord, getInput('uaddressmode'), getInput('vaddressmode'),
+                                getInput('filtertype'), default)
+
+    @staticmethod
+    def _wrapIndices(indices, size, addressMode):
+        '''
+        @brief Wrap texel indices using a MaterialX address mode.
+        '''
+        if addressMode == 'periodic':
+            return np.mod(indices, size)
+        if addressMode == 'mirror':
+            indices = np.mod(indices, 2 * size)
+            return np.where(indices < size, indices, 2 * size - 1 - indices)
+        return np.clip(indices, 0, size - 1)
+
+    @staticmethod
+    def sampleImage(data, texcoord, uAddressMode='periodic', vAddressMode='periodic', filterType='linear', default=None):
+        '''
+        @brief Sample an image at texture coordinates.
+        @param data Image array of height, width and channels. The first row is the top of the image.
+        @param texcoord Array of texture coordinates with 2 channels.
+        @param uAddressMode MaterialX address mode in u: 'periodic', 'mirror', 'clamp' or 'constant'.
+        @param vAddressMode MaterialX address mode in v.
+        @param filterType 'closest' for nearest texel filtering, otherwise linear filtering is used.
+        @param default Value used outside the 0 to 1 range for the 'constant' address mode.
+        @return Array of sampled values.
+        '''
+        height, width, _ = data.shape
+        u = texcoord[..., 0]
+        v = texcoord[..., 1]
+        x = u * width - 0.5
+        y = (1.0 - v) * height - 0.5
+        if filterType == 'closest':
+            xi = CPUTextureBaker._wrapIndices(np.floor(x + 0.5).astype(np.int64), width, uAddressMode)
+            yi = CPUTextureBaker._wrapIndices(np.floor(y + 0.5).astype(np.int64), height, vAddressMode)
+            result = data[yi, xi]
+        else:
+            x0 = np.floor(x)
+            y0 = np.floor(y)
+            fx = (x - x0)[..., np.newaxis]
+            fy = (y - y0)[..., np.newaxis]
+            x0 = x0.astype(np.int64)
+            y0 = y0.astype(np.int64)
+            xa = CPUTextureBaker._wrapIndices(x0, width, uAddressMode)
+            xb = CPUTextureBaker._wrapIndices(x0 + 1, width, uAddressMode)
+            ya = CPUTextureBaker._wrapIndices(y0, height, vAddressMode)
+            yb = CPUTextureBaker._wrapIndices(y0 + 1, height, vAddressMode)
+            top = data[ya, xa] * (1.0 - fx) + data[ya, xb] * fx
+            bottom = data[yb, xa] * (1.0 - fx) + data[yb, xb] * fx
+            result = top * (1.0 - fy) + bottom * fy
+
+        if default is not None:
+            outside = np.zeros(u.shape, dtype=bool)
+            if uAddressMode == 'constant':
+                outside |= (u < 0.0) | (u > 1.0)
+            if vAddressMode == 'constant':
+                outside |= (v < 0.0) | (v > 1.0)
+            if np.any(outside):
+                result = np.where(outside[..., np.newaxis], default, result)
+        return result
+
+    def _loadImage(self, fileName):
+        '''
+        @brief Load an image found on the search path as an array of values between 0 and 1.
+        @return The image array, or None if the image cannot be loaded.
+        '''
+        filePath = self._searchPath.find(mx.FilePath(fileName))
+        path = filePath.asString()
+        if path not in self._images:
+            image = self._imageLoader.loadImage(filePath) if filePath.exists() else None
+            self._images[path] = self.imageToArray(image) if image else None
+        return self._images[path]
+
+    @staticmethod
+    def imageToArray(image):
+        '''
+        @brief Copy a MaterialX image to an array.
+        @param image The MaterialX image.
+        @return Array of height, width and channels, with integer formats scaled to the 0 to 1 range.
+        '''
+        formats = { mx_render.BaseType.UINT8 : (np.uint8, 255.0), mx_render.BaseType.UINT16 : (np.uint16, 65535.0),
+                    mx_render.BaseType.HALF : (np.float16, 1.0), mx_render.BaseType.FLOAT : (np.float32, 1.0) }
+        if image.getBaseType() not in formats or not image.getResourceBuffer():
+            return None
+        dtype, scale = formats[image.getBaseType()]
+        shape = (image.getHeight(), image.getWidth(), image.getChannelCount())
+        count = shape[0] * shape[1] * shape[2]
+        buffer = (ctypes.c_char * (count * image.getBaseStride())).from_address(image.getResourceBuffer())
+        return np.frombuffer(buffer, dtype=dtype, count=count).reshape(shape).astype(np.float32) / np.float32(scale)
+
+    def _encode(self, data, portType):
+        '''
+        @brief Encode baked values as stored in baked images. 8-bit colors are sRGB encoded and all
+        8-bit values are quantized.
+        '''
+        if self._hdr:
+            return data
+        if portType in self._COLOR_TYPES:
+            data = self._applyColorTransform(data, self.linearToSrgb)
+        return np.round(np.clip(data, 0.0, 1.0) * 255.0) / 255.0
+
+    def writeImage(self, data, fileName) -> bool:
+        '''
+        @brief Write an array to an image file, as 8-bit values unless baking to HDR.
+        @param data Array of height, width and channels of encoded values.
+        @param fileName The image file name.
+        @return True if the image was written.
+        '''
+        height, width, channels = data.shape
+        if self._hdr:
+            pixels = np.ascontiguousarray(data, dtype=np.float32)
+            image = mx_render.Image.create(width, height, channels, mx_render.BaseType.FLOAT)
+        else:
+            pixels = np.ascontiguousarray(np.round(np.clip(data, 0.0, 1.0) * 255.0), dtype=np.uint8)
+            image = mx_render.Image.create(width, height, channels, mx_render.BaseType.UINT8)
+        image.createResourceBuffer()
+        ctypes.memmove(image.getResourceBuffer(), pixels.ctypes.data, pixels.nbytes)
+        return self._imageLoader.saveImage(mx.FilePath(fileName), image, False)
+
+    @staticmethod
+    def formatValue(values, portType, exact=False) -> str:
         '''
-        @brief Utility to create a MaterialX document with the default libraries loaded.
-        @return The created MaterialX document and the list of loaded library filenames.
+        @brief Format baked channel values as a MaterialX value string.
+        @param values The channel values.
+        @param portType The MaterialX type of the value.
+        @param exact Write the shortest string which reproduces each single precision value,
+        instead of 6 significant digits. Default is False.
+        @return The value string.
         '''
-        doc = mx.createDocument()
-        stdlib = mx.createDocument()
-        libFiles = []
-        searchPath = mx.getDefaultDataSearchPath()
-        libFiles = mx.loadLibraries(mx.getDefaultDataLibraryFolders(), searchPath, stdlib)
-        doc.importLibrary(stdlib)
+        if portType == 'integer':
+            return str(int(round(values[0])))
+        if portType == 'boolean':
+            return 'true' if values[0] else 'false'
+        if exact:
+            return ', '.join(np.format_float_positional(np.float32(value), trim='-') for value in values)
+        return ', '.join('%g' % value for value in values)
+
+    def _isConnected(self, shaderInput) -> bool:
+        return any(shaderInput.getAttribute(attribute) for attribute in
+                   (MTLX_NODE_NAME_ATTRIBUTE, MTLX_NODEGRAPH_NAME_ATTRIBUTE, 'output', MTLX_INTERFACEINPUT_NAME_ATTRIBUTE))
+
+    def _bakeInput(self, shader, shaderInput):
+        '''
+        @brief Bake a shader input.
+        @return A tuple of (kind, data, normal map inputs) where kind is 'copy', 'omit', 'value' or 'image'.
+        '''
+        if not self._isConnected(shaderInput):
+            return ('copy', None, None)
+        portType = shaderInput.getType()
+        channels = self._TYPE_CHANNELS.get(portType)
+        if not channels:
+            raise CPUTextureBaker.UnsupportedError('Cannot bake input of type %s: %s' % (portType, shaderInput.getNamePath()))
+
+        # Tangent space normal maps are baked before the normal map is applied, which is then recreated
+        normalMapInputs = None
+        upstream = shaderInput.getConnectedNode()
+        parent = upstream.getParent() if upstream else None
+        context = self._getGraphContext(parent) if parent and parent.isA(mx.NodeGraph) else None
+        upstreamOutput = shaderInput.getOutputString()
+
+        # Look through node graph implementations whose output is a normal map, such as gltf_normalmap
+        while upstream and upstream.getCategory() != 'normalmap':
+            nodedef = upstream.getNodeDef()
+            implementation = nodedef.getImplementation() if nodedef else None
+            if not implementation or not implementation.isA(mx.NodeGraph):
+                break
+            output = implementation.getOutput(upstreamOutput) if upstreamOutput else implementation.getOutputs()[0]
+            inner = implementation.getNode(output.getNodeName()) if output and output.getNodeName() else None
+            if not inner:
+                break
+            context = self._getImplementationContext(upstream, nodedef, context)
+            upstream = inner
+            upstreamOutput = output.getOutputString()
+
+        if upstream and upstream.getCategory() == 'normalmap':
+            normalMapInputs = []
+            for normalMapInput in upstream.getInputs():
+                if normalMapInput.getName() == MTLX_IN_STRING:
+                    continue
+                if self._isConnected(normalMapInput):
+                    raise CPUTextureBaker.UnsupportedError('Cannot bake connected normal map input: ' + normalMapInput.getNamePath())
+                normalMapInputs.append(normalMapInput)
+            inInput = upstream.getInput(MTLX_IN_STRING)
+            if inInput:
+                data = self._evaluatePort(inInput, context)
+            else:
+                data = self._evaluatePort(upstream.getNodeDef().getActiveInput(MTLX_IN_STRING), None)
+        else:
+            data = self._evaluatePort(shaderInput, None)
+
+        nodedefInput = shader.getNodeDef().getActiveInput(shaderInput.getName()) if shader.getNodeDef() else None
+        if isinstance(data, CPUTextureBaker.GeomProp):
+            # Inputs which resolve to their default geometric property are left to use the default
+            if nodedefInput and nodedefInput.getAttribute('defaultgeomprop') == data.name:
+                return ('omit', None, None)
+            raise CPUTextureBaker.UnsupportedError('Cannot bake geometric property %s used by: %s' % (data.name, shaderInput.getNamePath()))
+        if isinstance(data, (str, tuple)):
+            raise CPUTextureBaker.UnsupportedError('Cannot bake input: ' + shaderInput.getNamePath())
+
+        data = self.adaptChannels(np.nan_to_num(data), channels)
+        if self._average and data.shape[:2] != (1, 1):
+            data = np.mean(data, axis=(0, 1), keepdims=True)
+
+        # Results are uniform if all texels are equal once encoded. Uniform values are written unencoded.
+        imageTypes = portType not in self._VALUE_TYPES
+        encoded = self._encode(data, portType) if imageTypes else data
+        pixels = encoded.reshape(-1, channels)
+        if normalMapInputs is None and np.all(pixels == pixels[0]):
+            values = np.mean(data.reshape(-1, channels), axis=0)
+            if nodedefInput and nodedefInput.hasValueString():
+                default = self.adaptChannels(self._evaluateValue(nodedefInput), channels).reshape(-1)
+                if np.allclose(values, default, rtol=1e-5, atol=1e-6):
+                    return ('omit', None, None)
+            return ('value', values, None)
+        if not imageTypes:
+            raise CPUTextureBaker.UnsupportedError('Cannot bake varying %s input: %s' % (portType, shaderInput.getNamePath()))
+        encoded = np.broadcast_to(encoded, (self._height, self._width, channels))
+        return ('image', encoded, normalMapInputs)
+
+    def _bakeShader(self, shader):
+        '''
+        @brief Bake the inputs of a shader.
+        @return List of (shader input, kind, data, normal map inputs) tuples.
+        '''
+        results = []
+        for shaderInput in shader.getInputs():
+            kind, data, normalMapInputs = self._bakeInput(shader, shaderInput)
+            if kind != 'omit':
+                results.append((shaderInput, kind, data, normalMapInputs))
+        return results
+
+    def _writeBakedMaterial(self, bakedDoc, material, shader, results, outputFolder, nameAllocator):
+        '''
+        @brief Add a baked material and shader to a document, writing baked images to a folder.
+        @return True if successful, otherwise False. getError() returns the reason.
+        '''
+        bakedShader = bakedDoc.addNode(shader.getCategory(), shader.getName(), shader.getType())
+        bakedGraph = None
+        extension = '.hdr' if self._hdr else '.png'
+        for shaderInput, kind, data, normalMapInputs in results:
+            inputName = shaderInput.getName()
+            portType = shaderInput.getType()
+            bakedInput = bakedShader.addInput(inputName, portType)
+            if kind == 'copy':
+                bakedInput.copyContentFrom(shaderInput)
+            elif kind == 'value':
+                bakedInput.setValueString(self.formatValue(data, portType))
+            else:
+                if not bakedGraph:
+                    bakedGraph = bakedDoc.addNodeGraph(nameAllocator.createValidChildName(bakedDoc, 'NG_baked'))
+                    if not self._hdr:
+                        bakedGraph.setColorSpace('srgb_texture')
+                fileName = os.path.join(outputFolder, '%s_%s_%s%s' % (material.getName(), shader.getCategory(), inputName, extension))
+                if not self.writeImage(data, fileName):
+                    self._error = 'Failed to write baked image: ' + fileName
+                    return False
+                imageNode = bakedGraph.addNode('image', inputName + '_baked', portType)
+                imageNode.addInput('file', 'filename').setValueString(mx.FilePath(fileName).asString(mx.FormatPosix))
+                outputNode = imageNode
+                if normalMapInputs is not None:
+                    outputNode = bakedGraph.addNode('normalmap', inputName + '_baked_map', portType)
+                    outputNode.addInput(MTLX_IN_STRING, portType).setConnectedNode(imageNode)
+                    for normalMapInput in normalMapInputs:
+                        outputNode.addInput(normalMapInput.getName(), normalMapInput.getType()).copyContentFrom(normalMapInput)
+                bakedOutput = bakedGraph.addOutput(inputName + '_output', portType)
+                bakedOutput.setConnectedNode(outputNode)
+                bakedInput.setConnectedOutput(bakedOutput)
+
+        bakedMaterial = bakedDoc.addNode(material.getCategory(), material.getName(), material.getType())
+        shaderInput = bakedMaterial.addInput(shader.getType(), shader.getType())
+        shaderInput.setConnectedNode(bakedShader)
+        return True
 
-        return doc, libFiles
+    def _evaluateConstant(self, port):
+        '''
+        @brief Evaluate a connected input if its result does not vary over the texture grid.
+        @return The channel values, or None if the result varies, depends on files or cannot be evaluated.
+        '''
+        self._values = {}
+        self._contexts = []
+        self._graphContexts = {}
+        self._usesFiles = False
+        parent = port.getParent().getParent()
+        context = self._getGraphContext(parent) if parent.isA(mx.NodeGraph) else None
+        try:
+            data = self._evaluatePort(port, context)
+        except (CPUTextureBaker.UnsupportedError,) + self._EVALUATION_ERRORS:
+            return None
+        if self._usesFiles or not isinstance(data, np.ndarray) or data.shape[:2] != (1, 1):
+            return None
+        return self.adaptChannels(np.nan_to_num(data), self._TYPE_CHANNELS[port.getType()]).reshape(-1)
 
-    @staticmethod
-    def skipLibraryElement(elem) -> bool:
+    def _foldInput(self, port, visited) -> int:
         '''
-        @brief Utility to skip library elements when iterating over elements in a document.
-        @return True if the element is not in a library, otherwise False.
+        @brief Fold an input connected to a constant subgraph, or otherwise the inputs of the node it is connected to.
+        @return The number of inputs folded.
         '''
-        return not elem.hasSourceUri()
+        namePath = port.getNamePath()
+        if namePath in visited:
+            return 0
+        visited.add(namePath)
+        if not port.getAttribute(MTLX_NODE_NAME_ATTRIBUTE) and not port.getAttribute(MTLX_NODEGRAPH_NAME_ATTRIBUTE):
+            return 0
+
+        portType = port.getType()
+        if portType in self._TYPE_CHANNELS:
+            values = self._evaluateConstant(port)
+            if values is not None:
+                for attribute in (MTLX_NODE_NAME_ATTRIBUTE, MTLX_NODEGRAPH_NAME_ATTRIBUTE, 'output', 'colorspace'):
+                    port.removeAttribute(attribute)
+                port.setValueString(self.formatValue(values, portType, True))
+                # Values are linear, so the color space inherited from parent elements is overridden
+                workingColorSpace = port.getDocument().getColorSpace() or 'lin_rec709'
+                if portType in self._COLOR_TYPES and port.getActiveColorSpace() not in (EMPTY_STRING, workingColorSpace):
+                    port.setColorSpace(workingColorSpace)
+                return 1
+
+        count = 0
+        upstream = port.getConnectedNode()
+        if upstream:
+            for upstreamInput in upstream.getInputs():
+                count += self._foldInput(upstreamInput, visited)
+        return count
+
+    def foldConstants(self, doc) -> int:
+        '''
+        @brief Replace connections to subgraphs which evaluate to a constant by the constant value. This is performed
+        for the inputs of the surface shaders of all materials, and for inputs upstream of them which cannot be folded.
+        Subgraphs which use images, geometric properties other than texture coordinates, or nodes which cannot be
+        evaluated are left unchanged. Nodes which are no longer connected are not removed.
+        @param doc The MaterialX document to modify.
+        @return The number of inputs replaced by values.
+        '''
+        if np is None or doc.getColorSpace() not in self._LINEAR_COLOR_SPACES:
+            return 0
+        count = 0
+        visited = set()
+        try:
+            with np.errstate(all='ignore'):
+                for material in doc.getMaterialNodes():
+                    for shader in mx.getShaderNodes(material):
+                        for shaderInput in shader.getInputs():
+                            count += self._foldInput(shaderInput, visited)
+        finally:
+            self._values = {}
+            self._contexts = []
+            self._graphContexts = {}
+        return count
+
+    def bakeAllMaterials(self, doc, outputFilename, writeDocumentPerMaterial=False) -> bool:
+        '''
+        @brief Bake the surface shaders of all materials in a document and write the baked document.
+        All materials are evaluated before anything is written, so nothing is written if any material
+        cannot be baked. Baked images are written to the folder of the output document.
+        @param doc The MaterialX document to bake.
+        @param outputFilename The baked document file name.
+        @param writeDocumentPerMaterial Write a document per material named <output name>_<material>.mtlx
+        instead of a single document. Default is False.
+        @return True if the materials were baked, otherwise False. getError() returns the reason.
+        '''
+        self._error = ''
+        if np is None:
+            self._error = 'NumPy is not available'
+            return False
 
-    @staticmethod
-    def writeMaterialXDoc(doc, filename, predicate=skipLibraryElement):
+        self._values = {}
+        self._contexts = []
+        self._graphContexts = {}
+        bakedMaterials = []
+        try:
+            if doc.getColorSpace() not in self._LINEAR_COLOR_SPACES:
+                raise CPUTextureBaker.UnsupportedError('Unsupported document color space: ' + doc.getColorSpace())
+            with np.errstate(all='ignore'):
+                for material in doc.getMaterialNodes():
+                    for shader in mx.getShaderNodes(material):
+                        bakedMaterials.append((material, shader, self._bakeShader(shader)))
+        except CPUTextureBaker.UnsupportedError as err:
+            self._error = str(err)
+            return False
+        except self._EVALUATION_ERRORS as err:
+            self._error = 'Evaluation failed with %s: %s' % (type(err).__name__, err)
+            return False
+        finally:
+            # Release intermediate results
+            self._values = {}
+            self._contexts = []
+            self._graphContexts = {}
+
+        outputFolder = os.path.dirname(os.path.abspath(outputFilename))
+        try:
+            bakedDoc = None
+            for material, shader, results in bakedMaterials:
+                if not bakedDoc:
+                    bakedDoc = mx.createDocument()
+                    bakedDoc.setColorSpace(doc.getColorSpace() or 'lin_rec709')
+                    nameAllocator = UniqueNameAllocator()
+                if not self._writeBakedMaterial(bakedDoc, material, shader, results, outputFolder, nameAllocator):
+                    return False
+                if writeDocumentPerMaterial:
+                    stem, extension = os.path.splitext(outputFilename)
+                    mx.writeToXmlFile(bakedDoc, stem + '_' + material.getName() + extension)
+                    bakedDoc = None
+            if not writeDocumentPerMaterial:
+                if not bakedDoc:
+                    bakedDoc = mx.createDocument()
+                mx.writeToXmlFile(bakedDoc, outputFilename)
+        except (OSError, mx.Exception) as err:
+            self._error = 'Failed to write baked document: ' + str(err)
+            return False
+        return True
+
+class TextureBakeCache:
+    '''
+    @brief On disk cache of baked materials, keyed by a hash of the content each material depends on.
+
+    The key of a material covers its shader and all upstream nodes, node graphs and input values, the
+    content of referenced images, and the baking settings. Each entry is a folder named by the key
+    holding the baked document of the material and its images. Entries are evicted in least recently
+    used order when the cache exceeds its maximum size.
+    '''
+    # File name of the baked document in each cache entry
+    _DOCUMENT_NAME = 'material.mtlx'
+    # Errors raised when a document cannot be read, after which the material is baked again
+    _READ_ERRORS = (mx.ExceptionFileMissing, mx.ExceptionParseError, mx.Exception)
+
+    def __init__(self, folder, maxSize=1024 * 1024 * 1024):
         '''
-        @brief Utility to write a MaterialX document to a file.
-        @param doc The MaterialX document to write.
-        @param filename The name of the file to write to.
-        @param predicate A predicate function to determine if an element should be written. Default is to skip library elements.
+        @brief Constructor.
+        @param folder The cache folder. It is created if it does not exist.
+        @param maxSize The maximum size of the cache in bytes. Default is 1 GB.
         '''
-        writeOptions = mx.XmlWriteOptions()
-        writeOptions.writeXIncludeEnable = False
-        writeOptions.elementPredicate = predicate
+        self._folder = os.path.abspath(folder)
+        self._maxSize = maxSize
+        # Image content hashes keyed by (path, modification time, size)
+        self._fileHashes : dict = {}
 
-        if filename:
-            mx.writeToXmlFile(doc, filename, writeOptions)
-    
-    @staticmethod
-    def writeMaterialXDocString(doc, predicate=skipLibraryElement):
+    def getFolder(self) -> str:
         '''
-        @brief Utility to write a MaterialX document to string.
-        @param doc The MaterialX document to write.
-        @param predicate A predicate function to determine if an element should be written. Default is to skip library elements.
-        @return The XML string representation of the MaterialX document.
+        @brief Get the cache folder.
+        @return The folder path.
         '''
-        writeOptions = mx.XmlWriteOptions()
-        writeOptions.writeXIncludeEnable = False
-        writeOptions.elementPredicate = predicate
+        return self._folder
 
-        result =  mx.writeToXmlString(doc, writeOptions)
-        return result
-    
-    @staticmethod
-    def makeFilePathsRelative(doc, docPath) -> list:
+    def _hashFile(self, path) -> str:
         '''
-        @brief Utility to make file paths relative to a document path
-        @param doc The MaterialX document to update.
-        @param docPath The path to make file paths relapy -tive to.
-        @return List of tuples of unresolved and resolved file paths.
+        @brief Compute the hash of a file's content.
+        @param path The file path.
+        @return The hash string, or an empty string if the file does not exist.
         '''
-        result = []
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return EMPTY_STRING
+        key = (path, stat.st_mtime_ns, stat.st_size)
+        if key not in self._fileHashes:
+            hasher = hashlib.sha1()
+            with open(path, 'rb') as fileHandle:
+                for chunk in iter(lambda: fileHandle.read(1 << 20), b''):
+                    hasher.update(chunk)
+            self._fileHashes[key] = hasher.hexdigest()
+        return self._fileHashes[key]
+
+    def _hashElement(self, element, searchPath, visited, lines):
+        '''
+        @brief Add an element, its inputs and all upstream elements to a canonical description.
+        @param element The element to add.
+        @param searchPath Search path used to find image files.
+        @param visited Set of the name paths of elements already added.
+        @param lines List of description lines to append to.
+        '''
+        namePath = element.getNamePath()
+        if namePath in visited:
+            return
+        visited.add(namePath)
+        attributes = [ '%s=%s' % (name, element.getAttribute(name)) for name in sorted(element.getAttributeNames()) ]
+        lines.append('%s %s %s' % (element.getCategory(), namePath, ' '.join(attributes)))
+
+        # Definitions in the document, unlike library definitions, may be edited along with the material
+        if element.isA(mx.Node):
+            nodedef = element.getNodeDef()
+            if nodedef and not nodedef.hasSourceUri():
+                self._hashElement(nodedef, searchPath, visited, lines)
+                implementation = nodedef.getImplementation()
+                if implementation and implementation.isA(mx.NodeGraph):
+                    for output in implementation.getOutputs():
+                        self._hashElement(output, searchPath, visited, lines)
+
+        # The interface inputs of enclosing node graphs are used by nodes and outputs in the graph
+        parent = element.getParent()
+        if parent and parent.isA(mx.NodeGraph):
+            self._hashElement(parent, searchPath, visited, lines)
+
+        ports = element.getInputs() if element.isA(mx.InterfaceElement) else []
+        if element.isA(mx.Output):
+            ports = [ element ]
+        for port in ports:
+            if port is not element:
+                attributes = [ '%s=%s' % (name, port.getAttribute(name)) for name in sorted(port.getAttributeNames()) ]
+                lines.append('  %s %s' % (port.getName(), ' '.join(attributes)))
+            if port.getType() == 'filename' and port.hasValueString():
+                fileName = port.getResolvedValueString()
+                path = searchPath.find(mx.FilePath(fileName)).asString() if searchPath else fileName
+                lines.append('  file %s %s %s' % (fileName, port.getActiveColorSpace(), self._hashFile(os.path.abspath(path))))
+            output = port.getConnectedOutput()
+            if output:
+                self._hashElement(output, searchPath, visited, lines)
+            node = port.getConnectedNode()
+            if node:
+                self._hashElement(node, searchPath, visited, lines)
+            if port.isA(mx.Input):
+                interfaceInput = port.getInterfaceInput()
+                if interfaceInput:
+                    self._hashElement(interfaceInput.getParent(), searchPath, visited, lines)
+
+    def computeKey(self, material, settings, searchPath=None) -> str:
+        '''
+        @brief Compute the cache key of a material.
+        @param material The material node.
+        @param settings List of baking settings, such as the resolution, which affect the baked result.
+        @param searchPath Search path used to find image files.
+        @return The key string.
+        '''
+        document = material.getDocument()
+        lines = [ mx.getVersionString(), repr(list(settings)), document.getColorSpace() ]
+        self._hashElement(material, searchPath, set(), lines)
+        return hashlib.sha1('\n'.join(lines).encode('utf-8')).hexdigest()
 
-        for elem in doc.traverseTree():
-                valueElem = None
-                if elem.isA(mx.ValueElement):
-                    valueElem = elem
-                if not valueElem or valueElem.getType() != mx.FILENAME_TYPE_STRING:
-                    continue
+    def _getEntryFolder(self, key) -> str:
+        return os.path.join(self._folder, key)
 
-                unresolvedValue = mx.FilePath(valueElem.getValueString())
-                if unresolvedValue.isEmpty():
-                    continue
+    def hasEntry(self, key) -> bool:
+        '''
+        @brief Check if the cache holds an entry.
+        @param key The entry key.
+        @return True if the entry exists, otherwise False.
+        '''
+        return os.path.isfile(os.path.join(self._getEntryFolder(key), self._DOCUMENT_NAME))
 
-                elementResolver = valueElem.createStringResolver()
-                if unresolvedValue.isAbsolute():
-                    elementResolver.setFilePrefix('')
-                resolvedValue = valueElem.getResolvedValueString(elementResolver)
-                resolvedValue = mx.FilePath(resolvedValue).getBaseName()
-                valueElem.setValueString(resolvedValue)
+    def addEntry(self, key, bakedFileName) -> bool:
+        '''
+        @brief Add a baked document of a single material to the cache, along with the images it references.
+        @param key The entry key.
+        @param bakedFileName The baked document file name. Relative image file names are relative to this file.
+        @return True if the entry was added, otherwise False.
+        '''
+        bakedDoc = mx.createDocument()
+        try:
+            mx.readFromXmlFile(bakedDoc, bakedFileName)
+        except self._READ_ERRORS:
+            return False
 
-                if unresolvedValue != resolvedValue:
-                    result.append([unresolvedValue.asString(mx.FormatPosix), resolvedValue])
+        entryFolder = self._getEntryFolder(key)
+        temporaryFolder = entryFolder + '.tmp'
+        shutil.rmtree(temporaryFolder, ignore_errors=True)
+        os.makedirs(temporaryFolder)
+        bakedFolder = os.path.dirname(os.path.abspath(bakedFileName))
+        for elem in bakedDoc.traverseTree():
+            if elem.isA(mx.Input) and elem.getType() == 'filename' and elem.hasValueString():
+                path = os.path.join(bakedFolder, elem.getResolvedValueString())
+                if os.path.isfile(path):
+                    shutil.copy2(path, os.path.join(temporaryFolder, os.path.basename(path)))
+                    elem.setValueString(os.path.basename(path))
+        bakedDoc.removeAttribute('fileprefix')
+        mx.writeToXmlFile(bakedDoc, os.path.join(temporaryFolder, self._DOCUMENT_NAME))
+
+        # Entries are completed by renaming so that a partially written entry is never used
+        shutil.rmtree(entryFolder, ignore_errors=True)
+        os.replace(temporaryFolder, entryFolder)
+        return True
 
-        return result  
+    def getEntry(self, key, outputFolder):
+        '''
+        @brief Get the baked document of an entry, copying its images to an output folder.
+        The entry is marked as most recently used.
+        @param key The entry key.
+        @param outputFolder The folder to copy images to. Image file names in the document refer to the copies.
+        @return The baked document, or None if the entry does not exist.
+        '''
+        entryFolder = self._getEntryFolder(key)
+        bakedDoc = mx.createDocument()
+        try:
+            mx.readFromXmlFile(bakedDoc, os.path.join(entryFolder, self._DOCUMENT_NAME))
+        except self._READ_ERRORS:
+            return None
+        os.utime(entryFolder)
+
+        os.makedirs(outputFolder, exist_ok=True)
+        for elem in bakedDoc.traverseTree():
+            if elem.isA(mx.Input) and elem.getType() == 'filename' and elem.hasValueString():
+                path = os.path.join(entryFolder, elem.getValueString())
+                if os.path.isfile(path):
+                    outputPath = os.path.join(outputFolder, elem.getValueString())
+                    shutil.copy2(path, outputPath)
+                    elem.setValueString(outputPath)
+        return bakedDoc
+
+    def evict(self, keep=None) -> list:
+        '''
+        @brief Remove least recently used entries until the cache is no larger than its maximum size.
+        @param keep Keys of entries which are not removed, such as those used by the current bake.
+        @return List of removed keys.
+        '''
+        keep = set(keep or [])
+        entries = []
+        totalSize = 0
+        if not os.path.isdir(self._folder):
+            return []
+        for key in os.listdir(self._folder):
+            entryFolder = self._getEntryFolder(key)
+            if not os.path.isdir(entryFolder):
+                continue
+            size = 0
+            for fileName in os.listdir(entryFolder):
+                size += os.path.getsize(os.path.join(entryFolder, fileName))
+            entries.append((os.path.getmtime(entryFolder), key, size))
+            totalSize += size
+
+        removed = []
+        for _, key, size in sorted(entries):
+            if totalSize <= self._maxSize:
+                break
+            if key in keep:
+                continue
+            shutil.rmtree(self._getEntryFolder(key), ignore_errors=True)
+            totalSize -= size
+            removed.append(key)
+        return removed
 
 #########################################################################################
 # gLTF to MaterialX Conversion classes
@@ -125,6 +2568,16 @@ class GLTF2MtlxOptions(dict):
         - 'addAllInputs' : Add all inputs from the node definition. Default is False. 
         - 'createAssignments' : Create MaterialX assignments for each glTF primitive. Default is False.
         - 'debugOutput' : Print debug output. Default is False.
+        - 'deduplicateMaterials' : Create a single MaterialX material for glTF materials which differ only by name.
+        Materials used with vertex colors are not merged with materials used without them. Default is False.
+        - 'compactAssignments' : Assign materials using a collection per material, replacing the paths below a
+        node by the node path when all of them have the same material. Default is False.
+        - 'selectMaterials' : List of glTF material indices or names to convert. Default is an empty list.
+        - 'selectMaterialPattern' : Regular expression. Convert glTF materials with a name containing a match. Default is an empty string.
+        - 'selectScenes' : List of glTF scene indices. Convert materials used by primitives in these scenes. Default is an empty list.
+        - 'selectNodes' : List of glTF node indices or names. Convert materials used by primitives at or below these nodes. Default is an empty list.
+        If any selection option is set, only materials matching at least one of them are converted.
+        Otherwise all materials are converted.
     '''
     def __init__(self, *args, **kwargs):
         '''
@@ -134,6 +2587,12 @@ class GLTF2MtlxOptions(dict):
 
         self['createAssignments'] = False
         self['addAllInputs'] = False
+        self['deduplicateMaterials'] = False
+        self['compactAssignments'] = False
+        self['selectMaterials'] = []
+        self['selectMaterialPattern'] = ''
+        self['selectScenes'] = []
+        self['selectNodes'] = []
         self['debugOutput'] = True
 
 class GLTF2MtlxReader:
@@ -144,6 +2603,22 @@ class GLTF2MtlxReader:
     _log = ''
     # Conversion options
     _options = GLTF2MtlxOptions()    
+    # Optional event used to request cancellation between materials
+    _cancelEvent = None
+    # MaterialX material names generated for each glTF material, indexed by glTF material index
+    _materialNames : list = []
+    # Number of MaterialX materials created by the last conversion
+    _uniqueMaterialCount = 0
+    # Scene index of the glTF document being converted
+    _sceneIndex = None
+    # Node definition cache for the current conversion
+    _nodeDefCache = NodeDefCache()
+    # Unique name allocator for the current conversion
+    _nameAllocator = UniqueNameAllocator()
+    # Optional profiler used to record conversions
+    _profiler = None
+    # Definition inputs which are not added to shader nodes when adding all inputs
+    SKIPPED_DEFAULT_INPUTS = ['tangent', 'normal', 'clearcoat_normal', 'attenuation_distance']
 
     def clearLog(self):
         '''
@@ -179,18 +2654,201 @@ class GLTF2MtlxReader:
         '''
         return self._options
 
+    def setCancelEvent(self, event):
+        '''
+        @brief Set an event which can be used to cancel a conversion in progress.
+        The event is checked between materials. 
+        @param event A threading.Event or any object with an is_set() method. None disables cancellation.
+        '''
+        self._cancelEvent = event
+
+    def isCancelled(self) -> bool:
+        '''
+        @brief Check if cancellation of the current conversion has been requested.
+        @return True if cancelled, otherwise False.
+        '''
+        return self._cancelEvent is not None and self._cancelEvent.is_set()
+
+    def setProfiler(self, profiler):
+        '''
+        @brief Set a profiler to record phase timings and counters of conversions.
+        @param profiler A ConversionProfiler. None disables profiling.
+        '''
+        self._profiler = profiler
+
+    def getProfiler(self) -> ConversionProfiler:
+        '''
+        @brief Get the profiler used to record conversions.
+        @return The profiler, or None if profiling is disabled.
+        '''
+        return self._profiler
+
+    def _beginPhase(self, name, material=None):
+        if self._profiler:
+            self._profiler.beginPhase(name, material)
+
+    def _endPhase(self, name):
+        if self._profiler:
+            self._profiler.endPhase(name)
+
+    def _profilePhase(self, name, material=None):
+        return self._profiler.phase(name, material) if self._profiler else contextlib.nullcontext()
+
+    def _count(self, name, count=1):
+        if self._profiler:
+            self._profiler.increment(name, count)
+
+    def getMaterialNames(self) -> list:
+        '''
+        @brief Get the MaterialX material names generated by the last conversion.
+        @return List of material names indexed by glTF material index. The name is None for materials which were not selected.
+        '''
+        return self._materialNames
+
+    def getSceneIndex(self, gltfDoc) -> GLTFSceneIndex:
+        '''
+        @brief Get the scene index for the glTF document being converted. The index is built on first use.
+        @param gltfDoc The glTF document being converted.
+        @return The scene index.
+        '''
+        if not self._sceneIndex:
+            self._sceneIndex = GLTFSceneIndex(gltfDoc)
+        return self._sceneIndex
+
+    def getSelectedMaterials(self, gltfDoc) -> set:
+        '''
+        @brief Get the glTF materials to convert based on the selection options.
+        @param gltfDoc The glTF document to convert.
+        @return The set of selected glTF material indices, or None if all materials are to be converted.
+        '''
+        selectMaterials = self._options.get('selectMaterials', [])
+        selectPattern = self._options.get('selectMaterialPattern', '')
+        selectScenes = self._options.get('selectScenes', [])
+        selectNodes = self._options.get('selectNodes', [])
+        if not selectMaterials and not selectPattern and not selectScenes and not selectNodes:
+            return None
+
+        materials = gltfDoc['materials'] if 'materials' in gltfDoc else []
+        selected = set()
+
+        # Select by index, name or name pattern
+        regex = re.compile(selectPattern) if selectPattern else None
+        for materialIndex, material in enumerate(materials):
+            materialName = material['name'] if 'name' in material else None
+            if materialIndex in selectMaterials:
+                selected.add(materialIndex)
+            elif materialName is not None:
+                if materialName in selectMaterials or (regex and regex.search(materialName)):
+                    selected.add(materialIndex)
+
+        # Select materials used by primitives in the given scenes or below the given nodes
+        if selectScenes or selectNodes:
+            nodes = gltfDoc['nodes'] if 'nodes' in gltfDoc else []
+            nodeSelected = [ (nodeIndex in selectNodes) or ('name' in node and node['name'] in selectNodes) 
+                             for nodeIndex, node in enumerate(nodes) ]
+
+            sceneIndex = self.getSceneIndex(gltfDoc)
+            parents = sceneIndex.getParents()
+            sceneIndices = sceneIndex.getSceneIndices()
+            nodeIndices = sceneIndex.getNodeIndices()
+
+            # Parents are visited before their children
+            entrySelected = []
+            for entry in range(sceneIndex.getEntryCount()):
+                parent = parents[entry]
+                entrySelected.append(sceneIndices[entry] in selectScenes or nodeSelected[nodeIndices[entry]] or
+                                     (parent >= 0 and entrySelected[parent]))
+
+            primitiveEntries = sceneIndex.getPrimitiveEntries()
+            for primitiveEntry, primitive in enumerate(sceneIndex.getPrimitives()):
+                if entrySelected[primitiveEntries[primitiveEntry]] and 'material' in primitive:
+                    selected.add(primitive['material'])
+
+        return selected
+
+    def getDeduplicationRatio(self) -> float:
+        '''
+        @brief Get the ratio of glTF materials to MaterialX materials created by the last conversion.
+        A ratio of 1 means no materials were deduplicated.
+        @return The deduplication ratio. 0 if no materials were created.
+        '''
+        if not self._uniqueMaterialCount:
+            return 0.0
+        return len([name for name in self._materialNames if name]) / self._uniqueMaterialCount
+
+    def canonicalizeGLTFValue(self, value, textures, images, samplers):
+        '''
+        @brief Get a canonical form of a glTF material value for comparison.
+        Names are removed and texture references are replaced by the texture, image and sampler they refer to.
+        @param value The glTF value to canonicalize.
+        @param textures The set of glTF textures.
+        @param images The set of glTF images.
+        @param samplers The set of glTF samplers.
+        @return The canonical value.
+        '''
+        if isinstance(value, list):
+            return [self.canonicalizeGLTFValue(item, textures, images, samplers) for item in value]
+        if not isinstance(value, dict):
+            return value
+
+        result = {}
+        for key, item in value.items():
+            if key == 'name':
+                continue
+            if key.endswith('Texture') and isinstance(item, dict) and 'index' in item:
+                textureInfo = self.canonicalizeGLTFValue(item, textures, images, samplers)
+                textureIndex = item['index']
+                texture = textures[textureIndex] if textureIndex < len(textures) else None
+                if texture:
+                    texture = dict(texture)
+                    source = texture.pop('source', None)
+                    if source is not None and source < len(images):
+                        texture['image'] = images[source]
+                    sampler = texture.pop('sampler', None)
+                    if sampler is not None and sampler < len(samplers):
+                        texture['sampler'] = samplers[sampler]
+                    textureInfo['index'] = self.canonicalizeGLTFValue(texture, textures, images, samplers)
+                result[key] = textureInfo
+            else:
+                result[key] = self.canonicalizeGLTFValue(item, textures, images, samplers)
+        return result
+
+    def getVertexColorMaterials(self, gltfDoc) -> set:
+        '''
+        @brief Get the materials used by primitives with vertex colors. The MaterialX material created for
+        such a glTF material multiplies its base color by the vertex color.
+        @param gltfDoc The glTF document.
+        @return Set of glTF material indices.
+        '''
+        vertexColorMaterials = set()
+        meshes = gltfDoc['meshes'] if 'meshes' in gltfDoc else []
+        for mesh in meshes:
+            for primitive in mesh.get('primitives', []):
+                if 'material' in primitive and 'COLOR' in primitive.get('attributes', {}):
+                    vertexColorMaterials.add(primitive['material'])
+        return vertexColorMaterials
+
+    def computeMaterialHash(self, material, textures, images, samplers) -> str:
+        '''
+        @brief Compute a hash of a glTF material's content. Materials which differ only by name have the same hash.
+        @param material The glTF material.
+        @param textures The set of glTF textures.
+        @param images The set of glTF images.
+        @param samplers The set of glTF samplers.
+        @return The hash string.
+        '''
+        canonical = self.canonicalizeGLTFValue(material, textures, images, samplers)
+        canonicalString = json.dumps(canonical, sort_keys=True, separators=(',', ':'))
+        return hashlib.sha1(canonicalString.encode('utf-8')).hexdigest()
+
     def addNodeDefOutputs(self, mx_node):
 
         # Handle with node outputs are not explicitly specified on
         # a multioutput node.
         if mx_node.getType() == MULTI_OUTPUT_TYPE_STRING:
-            mx_node_def = mx_node.getNodeDef()
-            if mx_node_def:
-                for mx_output in mx_node_def.getActiveOutputs():
-                    mx_output_name = mx_output.getName()
-                    if not mx_node.getOutput(mx_output_name):
-                        mx_output_type = mx_output.getType()
-                        mx_node.addOutput(mx_output_name, mx_output_type)
+            for mx_output_name, mx_output_type in self._nodeDefCache.getOutputTemplates(mx_node):
+                if not mx_node.getOutput(mx_output_name):
+                    mx_node.addOutput(mx_output_name, mx_output_type)
 
     def addMtlxImage(self, materials, nodeName, fileName, nodeCategory, nodeDefId, nodeType, colorspace='') -> mx.Node:
         '''
@@ -204,17 +2862,18 @@ class GLTF2MtlxReader:
         @param colorspace Color space of the image node. Default is empty string.
         @return The created image node.        
         '''
-        nodeName = materials.createValidChildName(nodeName)
+        nodeName = self._nameAllocator.createValidChildName(materials, nodeName)
         imageNode = materials.addNode(nodeCategory, nodeName, nodeType)
         if imageNode:
-            if not imageNode.getNodeDef():
+            self._count('images')
+            if not self._nodeDefCache.getNodeDef(imageNode):
                 self.log('Failed to create image node. Category,name,type: %s %s %s' % (nodeCategory, nodeName, nodeType))
                 return imageNode
 
             if len(nodeDefId):
                 imageNode.setAttribute(mx.InterfaceElement.NODE_DEF_ATTRIBUTE, nodeDefId)
                     
-            fileInput = imageNode.addInputFromNodeDef(mx.Implementation.FILE_ATTRIBUTE)
+            fileInput = self._nodeDefCache.addInputFromNodeDef(imageNode, mx.Implementation.FILE_ATTRIBUTE)
             if fileInput:
                 fileInput.setValue(fileName, mx.FILENAME_TYPE_STRING)                    
 
@@ -242,17 +2901,17 @@ class GLTF2MtlxReader:
         texcoordNode = None
         if parent:
 
-            texcoordName = parent.createValidChildName('texcoord')
+            texcoordName = self._nameAllocator.createValidChildName(parent, 'texcoord')
             texcoordNode = parent.addNode('texcoord', texcoordName, 'vector2')
 
             if texcoordNode:
 
-                uvIndexInput = texcoordNode.addInputFromNodeDef('index')
+                uvIndexInput = self._nodeDefCache.addInputFromNodeDef(texcoordNode, 'index')
                 if uvIndexInput:
                     uvIndexInput.setValue(uvindex)
 
                 # Connect to image node
-                texcoordInput = image.addInputFromNodeDef('texcoord')
+                texcoordInput = self._nodeDefCache.addInputFromNodeDef(image, 'texcoord')
                 if texcoordInput:
                     texcoordInput.setAttribute(MTLX_NODE_NAME_ATTRIBUTE, texcoordNode.getName())
         
@@ -289,19 +2948,19 @@ class GLTF2MtlxReader:
         if transformExtension:
             rotation = transformExtension['rotation'] if 'rotation' in transformExtension else None
             if rotation:
-                input = imageNode.addInputFromNodeDef('rotate')
+                input = self._nodeDefCache.addInputFromNodeDef(imageNode, 'rotate')
                 if input:
                     # Note: Rotation in glTF and MaterialX are opposite directions
                     # Direction is handled in the MaterialX implementation
                     input.setValueString (str(rotation * TO_DEGREE))
             offset = transformExtension['offset'] if 'offset' in transformExtension else None
             if offset:
-                input = imageNode.addInputFromNodeDef('offset')
+                input = self._nodeDefCache.addInputFromNodeDef(imageNode, 'offset')
                 if input:
                     input.setValueString ( str(offset).removeprefix('[').removesuffix(']'))
             scale = transformExtension['scale'] if 'scale' in transformExtension else None
             if scale:
-                input = imageNode.addInputFromNodeDef('scale')
+                input = self._nodeDefCache.addInputFromNodeDef(imageNode, 'scale')
                 if input:
                     input.setValueString (str(scale).removeprefix('[').removesuffix(']') )
 
@@ -331,13 +2990,13 @@ class GLTF2MtlxReader:
             # min filter if found
             magFilter = sampler['magFilter'] if 'magFilter' in sampler else None
             if magFilter:
-                input = imageNode.addInputFromNodeDef('filtertype')
+                input = self._nodeDefCache.addInputFromNodeDef(imageNode, 'filtertype')
                 if input:
                     filterString = filterMap[magFilter]
                     input.setValueString (filterString)
             minFilter = sampler['minFilter'] if 'minFilter' in sampler else None
             if minFilter:
-                input = imageNode.addInputFromNodeDef('filtertype')
+                input = self._nodeDefCache.addInputFromNodeDef(imageNode, 'filtertype')
                 if input:
                     filterString = filterMap[minFilter]
                     input.setValueString (filterString)
@@ -348,14 +3007,14 @@ class GLTF2MtlxReader:
             wrapMap[10497] = "periodic"
             wrapS = sampler['wrapS'] if 'wrapS' in sampler else None
             if wrapS:
-                input = imageNode.addInputFromNodeDef('uaddressmode')
+                input = self._nodeDefCache.addInputFromNodeDef(imageNode, 'uaddressmode')
                 if input:
                     input.setValueString (wrapMap[wrapS])
                 else:
                     self.log('Failed to add uaddressmode input')                
             wrapT = sampler['wrapT'] if 'wrapT' in sampler else None
             if wrapT:
-                input = imageNode.addInputFromNodeDef('vaddressmode')
+                input = self._nodeDefCache.addInputFromNodeDef(imageNode, 'vaddressmode')
                 if input:
                     input.setValueString (wrapMap[wrapT])
                 else:
@@ -387,14 +3046,14 @@ class GLTF2MtlxReader:
             textureIndex = texture['index']
             texture = gltf_textures[textureIndex] if textureIndex < len(gltf_textures) else None
             uri = self.getGLTFTextureUri(texture, gltf_images)    
-            imageNodeName = materials.createValidChildName(imageNodeName)
+            imageNodeName = self._nameAllocator.createValidChildName(materials, imageNodeName)
             imageNode = self.addMtlxImage(materials, imageNodeName, uri, nodeCategory, nodeDefId,                                   
                                         nodeType, EMPTY_STRING)
             if imageNode:
                 self.readGLTFImageProperties(imageNode, texture, gltf_samplers)
 
                 for inputName in inputNames:
-                    input = shaderNode.addInputFromNodeDef(inputName)
+                    input = self._nodeDefCache.addInputFromNodeDef(shaderNode, inputName)
                     if input:
                         input.setAttribute(MTLX_NODE_NAME_ATTRIBUTE, imageNode.getName())
                         input.removeAttribute(MTLX_VALUE_ATTRIBUTE)
@@ -405,7 +3064,7 @@ class GLTF2MtlxReader:
                 for i in range(0, len(values)):
                     inputName = inputNames[i]
                     value = values[i]
-                    input = shaderNode.addInputFromNodeDef(inputName)
+                    input = self._nodeDefCache.addInputFromNodeDef(shaderNode, inputName)
                     if input:
                         input.setValue(float(value))
 
@@ -449,14 +3108,11 @@ class GLTF2MtlxReader:
         assignedColorTexture = False 
         assignedAlphaTexture = False 
 
-        # Check to see if all inputs shoudl be added
+        # Check to see if all inputs should be added. This is only done once per shader node
+        # so that inputs connected or set by earlier calls are not removed.
         addAllInputs = self._options['addAllInputs']
         if addAllInputs:
-            shaderNode.addInputsFromNodeDef()
-            shaderNode.removeChild('tangent')
-            shaderNode.removeChild('normal')
-            shaderNode.removeChild('clearcoat_normal')
-            shaderNode.removeChild('attenuation_distance')
+            self._nodeDefCache.populateOnce(shaderNode, self.SKIPPED_DEFAULT_INPUTS)
 
         # Try to assign a texture (image node)
         if colorTexture:
@@ -464,7 +3120,7 @@ class GLTF2MtlxReader:
             textureIndex = colorTexture['index']
             texture = gltf_textures[textureIndex] if textureIndex < len(gltf_textures) else None
             uri = self.getGLTFTextureUri(texture, gltf_images)    
-            imageNodeName = materials.createValidChildName(imageNodeName)
+            imageNodeName = self._nameAllocator.createValidChildName(materials, imageNodeName)
             imageNode = self.addMtlxImage(materials, imageNodeName, uri, nodeCategory, nodeDefId, nodeType, colorspace)
 
             if imageNode:
@@ -474,7 +3130,7 @@ class GLTF2MtlxReader:
 
                 # Connect texture to color input on shader
                 if len(colorInputName):
-                    colorInput = shaderNode.addInputFromNodeDef(colorInputName)
+                    colorInput = self._nodeDefCache.addInputFromNodeDef(shaderNode, colorInputName)
                     if not colorInput:
                         self.log('Failed to add color input:' + colorInputName)
                     else:
@@ -485,7 +3141,7 @@ class GLTF2MtlxReader:
 
                 # Connect texture to alpha input on shader
                 if len(alphaInputName) and self.versionGreaterThan(1, 38, 10):            
-                    alphaInput = shaderNode.addInputFromNodeDef(alphaInputName)
+                    alphaInput = self._nodeDefCache.addInputFromNodeDef(shaderNode, alphaInputName)
                     if not alphaInput:
                         self.log('Failed to add alpha input:' + alphaInputName)
                     else:
@@ -498,9 +3154,8 @@ class GLTF2MtlxReader:
         # Assign constant color / alpha if no texture is assigned
         if color:
             if not assignedColorTexture and len(colorInputName):
-                colorInput = shaderNode.addInputFromNodeDef(colorInputName)
+                colorInput = self._nodeDefCache.addInputFromNodeDef(shaderNode, colorInputName)
                 if not colorInput:
-                    nd = shaderNode.getNodeDef()
                     self.log('Failed to add color input: %s' % colorInputName)
                 else:
                     colorInput.setValue(mx.Color3(color[0], color[1], color[2]))
@@ -508,7 +3163,7 @@ class GLTF2MtlxReader:
                         colorspaceattr = MTLX_COLOR_SPACE_ATTRIBUTE 
                         colorInput.setAttribute(colorspaceattr, colorspace)
             if not assignedAlphaTexture and len(alphaInputName):            
-                alphaInput = shaderNode.addInputFromNodeDef(alphaInputName)
+                alphaInput = self._nodeDefCache.addInputFromNodeDef(shaderNode, alphaInputName)
                 if not alphaInput:
                     self.log('Failed to add alpha input: %s' % alphaInputName)
                 else:
@@ -528,6 +3183,11 @@ class GLTF2MtlxReader:
         images = gltfDoc['images'] if 'images' in gltfDoc else []
         samplers = gltfDoc['samplers'] if 'samplers' in gltfDoc else []
 
+        self._materialNames = []
+        self._uniqueMaterialCount = 0
+        self._sceneIndex = None
+        self._nodeDefCache = NodeDefCache()
+        self._nameAllocator = UniqueNameAllocator()
         if not materials or len(materials) == 0:
             self.log('No materials found to convert')
             return False
@@ -538,7 +3198,35 @@ class GLTF2MtlxReader:
         alphaModeMap['MASK'] = 1
         alphaModeMap['BLEND'] = 2
 
-        for material in materials:
+        # Map from material content hash and vertex color use to MaterialX material name.
+        # Materials used with and without vertex colors are not merged, as vertex colors change the MaterialX material.
+        deduplicate = self._options.get('deduplicateMaterials', False)
+        materialHashes = {}
+        vertexColorMaterials = self.getVertexColorMaterials(gltfDoc) if deduplicate else set()
+
+        selectedMaterials = self.getSelectedMaterials(gltfDoc)
+        if selectedMaterials is not None:
+            self.log('- Selected %d of %d materials' % (len(selectedMaterials), len(materials)))
+
+        for materialIndex, material in enumerate(materials):
+            if self.isCancelled():
+                self.log('Conversion cancelled')
+                return False
+
+            # Skip materials which are not selected
+            if selectedMaterials is not None and materialIndex not in selectedMaterials:
+                self._materialNames.append(None)
+                continue
+
+            # Reuse an existing material if one with the same content has been created
+            materialHash = None
+            if deduplicate:
+                materialHash = (self.computeMaterialHash(material, textures, images, samplers),
+                                materialIndex in vertexColorMaterials)
+                if materialHash in materialHashes:
+                    self._materialNames.append(materialHashes[materialHash])
+                    self._count('duplicateMaterials')
+                    continue
 
             # Generate shader and material names
             shaderName = MTLX_DEFAULT_SHADER_NAME
@@ -548,486 +3236,462 @@ class GLTF2MtlxReader:
                 materialName = MTLX_MATERIAL_PREFIX + gltfMaterialName
                 shaderName = MTLX_SHADER_PREFIX + gltfMaterialName
                 shaderName = gltfMaterialName
-            shaderName = doc.createValidChildName(shaderName)
-            materialName = doc.createValidChildName(materialName)
-            # Overwrite name in glTF with generated name
-            material['name'] = materialName
-
-            # Create shader. Check if unlit shader is needed
-            use_unlit = True if 'unlit' in material else False
-            if 'extensions' in material:
-                mat_extensions = material['extensions']
-                if 'KHR_materials_unlit' in mat_extensions:
-                    use_unlit = True
-
-            shaderCategory = MTLX_UNLIT_CATEGORY_STRING if use_unlit else MTLX_GLTF_PBR_CATEGORY
-            nodedefString = 'ND_surface_unlit' if use_unlit else 'ND_gltf_pbr_surfaceshader'
-            comment = doc.addChildOfCategory('comment')
-            comment.setDocString(' Generated shader: ' + shaderName + ' ')         
-            shaderNode = doc.addNode(shaderCategory, shaderName, mx.SURFACE_SHADER_TYPE_STRING)
-            shaderNode.setAttribute(mx.InterfaceElement.NODE_DEF_ATTRIBUTE, nodedefString)
-
-            addInputsFromNodeDef = self._options['addAllInputs']
-            if addInputsFromNodeDef:
-                shaderNode.addInputsFromNodeDef()
-            shaderNode.removeChild('tangent')
-            shaderNode.removeChild('normal')
-
-            # Create a surface material for the shader node
-            comment = doc.addChildOfCategory('comment')
-            comment.setDocString(' Generated material: ' + materialName + ' ')         
-            materialNode = doc.addNode(mx.SURFACE_MATERIAL_NODE_STRING, materialName, mx.MATERIAL_TYPE_STRING)
-            shaderInput = materialNode.addInput(mx.SURFACE_SHADER_TYPE_STRING, mx.SURFACE_SHADER_TYPE_STRING)
-            shaderInput.setAttribute(MTLX_NODE_NAME_ATTRIBUTE, shaderNode.getName())
-
-            if self._options['debugOutput']:
-                print('- Convert gLTF material to MateriaLX: %s' % materialName)
-
-            # Check for separate occlusion - TODO
-            haveSeparateOcclusion = False
-
-            # ----------------------------
-            # Read in pbrMetallicRoughness
-            # ----------------------------
-            if 'pbrMetallicRoughness' in material:
-                pbrMetallicRoughness = material['pbrMetallicRoughness']
-
-                # Parse base color factor
-                # -----------------------
-                baseColorTexture = None
-                if 'baseColorTexture' in pbrMetallicRoughness:
-                    baseColorTexture = pbrMetallicRoughness['baseColorTexture']
-                baseColorFactor = None
-                if 'baseColorFactor' in pbrMetallicRoughness:
-                    baseColorFactor = pbrMetallicRoughness['baseColorFactor']
-                if baseColorTexture or baseColorFactor:
-                    colorInputName = 'base_color'                    
-                    alphaInputName = 'alpha'
-                    if use_unlit:
-                        colorInputName = 'emission_color'
-                        alphaInputName = 'opacity'
-                    imagename = 'image_' + colorInputName
-                    self.readColorInput(doc, baseColorTexture, baseColorFactor, imagename, 
-                                MTLX_GLTF_COLOR_IMAGE, MULTI_OUTPUT_TYPE_STRING, 
-                                    '', shaderNode, colorInputName, alphaInputName, 
-                                    textures, images, samplers, MTLX_DEFAULT_COLORSPACE)
+            shaderName = self._nameAllocator.createValidChildName(doc, shaderName)
+            materialName = self._nameAllocator.createValidChildName(doc, materialName)
+            # Record the generated name. The glTF material is left unmodified.
+            self._materialNames.append(materialName)
+            self._uniqueMaterialCount += 1
+            with self._profilePhase('material', materialName):
+                self._count('materials')
+                if materialHash:
+                    materialHashes[materialHash] = materialName
+
+                # Create shader. Check if unlit shader is needed
+                use_unlit = True if 'unlit' in material else False
+                if 'extensions' in material:
+                    mat_extensions = material['extensions']
+                    if 'KHR_materials_unlit' in mat_extensions:
+                        use_unlit = True
+
+                shaderCategory = MTLX_UNLIT_CATEGORY_STRING if use_unlit else MTLX_GLTF_PBR_CATEGORY
+                nodedefString = 'ND_surface_unlit' if use_unlit else 'ND_gltf_pbr_surfaceshader'
+                comment = doc.addChildOfCategory('comment', self._nameAllocator.createValidChildName(doc, 'comment1'))
+                comment.setDocString(' Generated shader: ' + shaderName + ' ')         
+                shaderNode = doc.addNode(shaderCategory, shaderName, mx.SURFACE_SHADER_TYPE_STRING)
+                shaderNode.setAttribute(mx.InterfaceElement.NODE_DEF_ATTRIBUTE, nodedefString)
+
+                addInputsFromNodeDef = self._options['addAllInputs']
+                if addInputsFromNodeDef:
+                    self._nodeDefCache.populateOnce(shaderNode, self.SKIPPED_DEFAULT_INPUTS)
+
+                # Create a surface material for the shader node
+                comment = doc.addChildOfCategory('comment', self._nameAllocator.createValidChildName(doc, 'comment1'))
+                comment.setDocString(' Generated material: ' + materialName + ' ')         
+                materialNode = doc.addNode(mx.SURFACE_MATERIAL_NODE_STRING, materialName, mx.MATERIAL_TYPE_STRING)
+                shaderInput = materialNode.addInput(mx.SURFACE_SHADER_TYPE_STRING, mx.SURFACE_SHADER_TYPE_STRING)
+                shaderInput.setAttribute(MTLX_NODE_NAME_ATTRIBUTE, shaderNode.getName())
 
-                # Parse metallic factor
-                # ---------------------
-                if 'metallicFactor' in pbrMetallicRoughness:
-                    metallicFactor = pbrMetallicRoughness['metallicFactor']
-                    metallicFactor = str(metallicFactor)
-                    metallicInput = shaderNode.addInputFromNodeDef('metallic')
-                    metallicInput.setValueString(metallicFactor)
+                if self._options['debugOutput']:
+                    print('- Convert gLTF material to MateriaLX: %s' % materialName)
+
+                # Check for separate occlusion - TODO
+                haveSeparateOcclusion = False
+
+                # ----------------------------
+                # Read in pbrMetallicRoughness
+                # ----------------------------
+                if 'pbrMetallicRoughness' in material:
+                    pbrMetallicRoughness = material['pbrMetallicRoughness']
+
+                    # Parse base color factor
+                    # -----------------------
+                    baseColorTexture = None
+                    if 'baseColorTexture' in pbrMetallicRoughness:
+                        baseColorTexture = pbrMetallicRoughness['baseColorTexture']
+                    baseColorFactor = None
+                    if 'baseColorFactor' in pbrMetallicRoughness:
+                        baseColorFactor = pbrMetallicRoughness['baseColorFactor']
+                    if baseColorTexture or baseColorFactor:
+                        colorInputName = 'base_color'                    
+                        alphaInputName = 'alpha'
+                        if use_unlit:
+                            colorInputName = 'emission_color'
+                            alphaInputName = 'opacity'
+                        imagename = 'image_' + colorInputName
+                        self.readColorInput(doc, baseColorTexture, baseColorFactor, imagename, 
+                                    MTLX_GLTF_COLOR_IMAGE, MULTI_OUTPUT_TYPE_STRING, 
+                                        '', shaderNode, colorInputName, alphaInputName, 
+                                        textures, images, samplers, MTLX_DEFAULT_COLORSPACE)
+
+                    # Parse metallic factor
+                    # ---------------------
+                    if 'metallicFactor' in pbrMetallicRoughness:
+                        metallicFactor = pbrMetallicRoughness['metallicFactor']
+                        metallicFactor = str(metallicFactor)
+                        metallicInput = self._nodeDefCache.addInputFromNodeDef(shaderNode, 'metallic')
+                        metallicInput.setValueString(metallicFactor)
             
-                # Parse roughness factor
+                    # Parse roughness factor
+                    # ---------------------
+                    if 'roughnessFactor' in pbrMetallicRoughness:
+                        roughnessFactor = pbrMetallicRoughness['roughnessFactor']
+                        roughnessFactor = str(roughnessFactor)
+                        roughnessInput = self._nodeDefCache.addInputFromNodeDef(shaderNode, 'roughness')
+                        roughnessInput.setValueString(roughnessFactor)
+
+                    # Parse texture for metalic, roughness, and occlusion (if not specified separately)
+                    # ---------------------------------------------------------------------
+
+                    # Check for occlusion/metallic/roughness texture
+                    texture = None
+                    if 'metallicRoughnessTexture' in pbrMetallicRoughness:
+                        texture = pbrMetallicRoughness['metallicRoughnessTexture']
+                    if texture:
+                        imageNode = self.readInput(doc, texture, [], 'image_orm', MTLX_GLTF_IMAGE, MTLX_VEC3_STRING, '',
+                                            shaderNode,  ['metallic', 'roughness', 'occlusion'], textures, images, samplers)
+                        self.readGLTFImageProperties(imageNode, texture, samplers)
+
+                        # Route individual channels on ORM image to the appropriate inputs on the shader
+                        indexName = [ 'x', 'y', 'z' ]
+                        outputName = [ 'outx', 'outy', 'outz' ]
+                        metallicInput = self._nodeDefCache.addInputFromNodeDef(shaderNode, 'metallic')
+                        roughnessInput = self._nodeDefCache.addInputFromNodeDef(shaderNode, 'roughness')
+                        occlusionInput = None if haveSeparateOcclusion else self._nodeDefCache.addInputFromNodeDef(shaderNode, 'occlusion')
+                        inputs = [ occlusionInput, roughnessInput, metallicInput ]
+                        addSeparateNode = False # TODO: This options is not supported on write parsing yet.
+                        addExtractNode = True
+                        separateNode = None
+                        if addSeparateNode:
+                            # Add a separate node to route the channels
+                            separateNodeName = self._nameAllocator.createValidChildName(doc, 'separate_orm')
+                            separateNode = doc.addNode('separate3', separateNodeName, MULTI_OUTPUT_TYPE_STRING)      
+                            seperateInput = self._nodeDefCache.addInputFromNodeDef(separateNode, MTLX_IN_STRING)
+                            seperateInput.setType(MTLX_VEC3_STRING)
+                            seperateInput.setAttribute(MTLX_NODE_NAME_ATTRIBUTE, imageNode.getName())                  
+                        for i in range(0,3): 
+                            input = inputs[i]
+                            if input:
+                                input.setType(MTLX_FLOAT_STRING)
+                                if addExtractNode:
+                                    extractNodeName = self._nameAllocator.createValidChildName(doc, 'extract_orm')
+                                    extractNode = doc.addNode('extract', extractNodeName, MTLX_FLOAT_STRING)
+                                    self._nodeDefCache.addInputsFromNodeDef(extractNode)
+                                    extractNodeInput = extractNode.getInput(MTLX_IN_STRING)
+                                    extractNodeInput.setType(MTLX_VEC3_STRING)    
+                                    extractNodeInput.removeAttribute(MTLX_VALUE_STRING)
+                                    extractNodeInput.setAttribute(MTLX_NODE_NAME_ATTRIBUTE, imageNode.getName())                                
+                                    extractNodeInput = extractNode.getInput('index')
+                                    extractNodeInput.setValue(i)
+
+                                    input.setAttribute(MTLX_NODE_NAME_ATTRIBUTE, extractNode.getName())
+                                elif separateNode:
+                                    input.setAttribute(MTLX_NODE_NAME_ATTRIBUTE, separateNode.getName())
+                                    input.setOutputString(outputName[i])
+
+                # Parse normal input
+                # ------------------
+                if 'normalTexture' in material:
+                    normalTexture = material['normalTexture']      
+                    self.readInput(doc, normalTexture, [], 'image_normal', MTLX_GLTF_NORMALMAP_IMAGE, MTLX_VEC3_STRING, '',
+                            shaderNode, ['normal'], textures, images, samplers)
+
+                # Parse occlusion input
                 # ---------------------
-                if 'roughnessFactor' in pbrMetallicRoughness:
-                    roughnessFactor = pbrMetallicRoughness['roughnessFactor']
-                    roughnessFactor = str(roughnessFactor)
-                    roughnessInput = shaderNode.addInputFromNodeDef('roughness')
-                    roughnessInput.setValueString(roughnessFactor)
-
-                # Parse texture for metalic, roughness, and occlusion (if not specified separately)
-                # ---------------------------------------------------------------------
-
-                # Check for occlusion/metallic/roughness texture
-                texture = None
-                if 'metallicRoughnessTexture' in pbrMetallicRoughness:
-                    texture = pbrMetallicRoughness['metallicRoughnessTexture']
-                if texture:
-                    imageNode = self.readInput(doc, texture, [], 'image_orm', MTLX_GLTF_IMAGE, MTLX_VEC3_STRING, '',
-                                        shaderNode,  ['metallic', 'roughness', 'occlusion'], textures, images, samplers)
-                    self.readGLTFImageProperties(imageNode, texture, samplers)
-
-                    # Route individual channels on ORM image to the appropriate inputs on the shader
-                    indexName = [ 'x', 'y', 'z' ]
-                    outputName = [ 'outx', 'outy', 'outz' ]
-                    metallicInput = shaderNode.addInputFromNodeDef('metallic')
-                    roughnessInput = shaderNode.addInputFromNodeDef('roughness')
-                    occlusionInput = None if haveSeparateOcclusion else shaderNode.addInputFromNodeDef('occlusion')
-                    inputs = [ occlusionInput, roughnessInput, metallicInput ]
-                    addSeparateNode = False # TODO: This options is not supported on write parsing yet.
-                    addExtractNode = True
-                    separateNode = None
-                    if addSeparateNode:
-                        # Add a separate node to route the channels
-                        separateNodeName = doc.createValidChildName('separate_orm')
-                        separateNode = doc.addNode('separate3', separateNodeName, MULTI_OUTPUT_TYPE_STRING)      
-                        seperateInput = separateNode.addInputFromNodeDef(MTLX_IN_STRING)
-                        seperateInput.setType(MTLX_VEC3_STRING)
-                        seperateInput.setAttribute(MTLX_NODE_NAME_ATTRIBUTE, imageNode.getName())                  
-                    for i in range(0,3): 
-                        input = inputs[i]
-                        if input:
-                            input.setType(MTLX_FLOAT_STRING)
-                            if addExtractNode:
-                                extractNodeName = doc.createValidChildName('extract_orm')
-                                extractNode = doc.addNode('extract', extractNodeName, MTLX_FLOAT_STRING)
-                                extractNode.addInputsFromNodeDef()
-                                extractNodeInput = extractNode.getInput(MTLX_IN_STRING)
-                                extractNodeInput.setType(MTLX_VEC3_STRING)    
-                                extractNodeInput.removeAttribute(MTLX_VALUE_STRING)
-                                extractNodeInput.setAttribute(MTLX_NODE_NAME_ATTRIBUTE, imageNode.getName())                                
-                                extractNodeInput = extractNode.getInput('index')
-                                extractNodeInput.setValue(i)
-
-                                input.setAttribute(MTLX_NODE_NAME_ATTRIBUTE, extractNode.getName())
-                            elif separateNode:
-                                input.setAttribute(MTLX_NODE_NAME_ATTRIBUTE, separateNode.getName())
-                                input.setOutputString(outputName[i])
-
-            # Parse normal input
-            # ------------------
-            if 'normalTexture' in material:
-                normalTexture = material['normalTexture']      
-                self.readInput(doc, normalTexture, [], 'image_normal', MTLX_GLTF_NORMALMAP_IMAGE, MTLX_VEC3_STRING, '',
-                        shaderNode, ['normal'], textures, images, samplers)
-
-            # Parse occlusion input
-            # ---------------------
-            occlusionTexture = None
-            if 'occlusionTexture' in material:
-                occlusionTexture = material['occlusionTexture']
-                self.readInput(doc, occlusionTexture, [], 'image_occlusion', MTLX_GLTF_IMAGE, MTLX_FLOAT_STRING, '',
-                        shaderNode, ['occlusion'], textures, images, samplers)
-
-            # Parse emissive inputs
-            # ----------------------
-            emissiveTexture = None
-            if 'emissiveTexture' in material:
-                emissiveTexture = material['emissiveTexture']
-            emissiveFactor = [0.0, 0.0, 0.0]
-            if 'emissiveFactor' in material:
-                emissiveFactor = material['emissiveFactor']
-            self.readColorInput(doc, emissiveTexture, emissiveFactor, 'image_emissive',
-                            MTLX_GLTF_COLOR_IMAGE, MULTI_OUTPUT_TYPE_STRING, 
-                            '', shaderNode, 'emissive', '', textures, images, samplers, MTLX_DEFAULT_COLORSPACE)       
-        
-            # Parse and remap alpha mode
-            # --------------------------
-            if 'alphaMode' in material:
-                alphaModeString = material['alphaMode']
-                alphaMode = 0 
-                if alphaModeString in alphaModeMap:
-                    alphaMode = alphaModeMap[alphaModeString]
-                if alphaMode != 0:
-                    alphaModeInput = shaderNode.addInputFromNodeDef('alpha_mode')
-                    alphaModeInput.setValue(alphaMode)
-
-            # Parse alpha cutoff 
-            # ------------------
-            if 'alphaCutoff' in material:
-                alphaCutOff = material['alphaCutoff']
-                if alphaCutOff != 0.5:
-                    alphaCutOffInput = shaderNode.addInputFromNodeDef('alpha_cutoff')
-                    alphaCutOffInput.setValue(float(alphaCutOff))
-
-            # Parse extensions
-            # --------------------------------
-            if 'extensions' in material:
-                extensions = material['extensions']
-
-                # Parse untextured ior extension
-                # ------------------------------
-                if 'KHR_materials_ior' in extensions:
-                    iorExtension = extensions['KHR_materials_ior']
-                    if  'ior' in iorExtension:
-                        ior = iorExtension['ior']
-                        iorInput = shaderNode.addInputFromNodeDef('ior')
-                        iorInput.setValue(float(ior))
-
-                # Parse specular and specular color extension
-                if 'KHR_materials_specular' in extensions:
-                    specularExtension = extensions['KHR_materials_specular']
-                    specularColorFactor = None
-                    if 'specularColorFactor' in specularExtension:
-                        specularColorFactor = specularExtension['specularColorFactor']
-                    specularColorTexture = None
-                    if 'specularColorTexture' in specularExtension:
-                        specularColorTexture = specularExtension['specularColorTexture']
-                    if specularColorFactor or specularColorTexture:
-                        self.readColorInput(doc, specularColorTexture, specularColorFactor, 'image_specularcolor',
+                occlusionTexture = None
+                if 'occlusionTexture' in material:
+                    occlusionTexture = material['occlusionTexture']
+                    self.readInput(doc, occlusionTexture, [], 'image_occlusion', MTLX_GLTF_IMAGE, MTLX_FLOAT_STRING, '',
+                            shaderNode, ['occlusion'], textures, images, samplers)
+
+                # Parse emissive inputs
+                # ----------------------
+                emissiveTexture = None
+                if 'emissiveTexture' in material:
+                    emissiveTexture = material['emissiveTexture']
+                emissiveFactor = [0.0, 0.0, 0.0]
+                if 'emissiveFactor' in material:
+                    emissiveFactor = material['emissiveFactor']
+                self.readColorInput(doc, emissiveTexture, emissiveFactor, 'image_emissive',
                                 MTLX_GLTF_COLOR_IMAGE, MULTI_OUTPUT_TYPE_STRING, 
-                                '', shaderNode, 'specular_color', '', textures, images, MTLX_DEFAULT_COLORSPACE)
-
-                    specularTexture = specularFactor = None
-                    if 'specularFactor' in specularExtension:
-                        specularFactor = specularExtension['specularFactor']
-                    if 'specularTexture' in specularExtension:
-                        specularTexture = specularExtension['specularTexture']
-                    if specularFactor or specularTexture:
-                        self.readInput(doc, specularTexture, [specularFactor], 'image_specular', MTLX_GLTF_IMAGE,
-                                MTLX_FLOAT_STRING, '', shaderNode, ['specular'], textures, images, samplers)
-
-                # Parse transmission extension        
-                if 'KHR_materials_transmission' in extensions:
-                    transmissionExtension = extensions['KHR_materials_transmission']
-                    if 'transmissionFactor' in transmissionExtension:
-                        transmissionFactor = transmissionExtension['transmissionFactor']
-                        transmissionInput = shaderNode.addInputFromNodeDef('transmission')
-                        transmissionInput.setValue(float(transmissionFactor)) 
-
-                # Parse iridescence extension - TODO
-                if 'KHR_materials_iridescence' in extensions:
-                    iridescenceExtension = extensions['KHR_materials_iridescence']
-                    if iridescenceExtension:
-
-                        # Parse unmapped or mapped iridescence
-                        iridescenceFactor = iridescenceTexture = None
-                        if 'iridescenceFactor' in iridescenceExtension:
-                            iridescenceFactor = iridescenceExtension['iridescenceFactor']
-                        if 'iridescenceTexture' in iridescenceExtension:
-                            iridescenceTexture = iridescenceExtension['iridescenceTexture']
-                        if iridescenceFactor or iridescenceTexture:
-                            self.readInput(doc, iridescenceTexture, [iridescenceFactor], 'image_iridescence', MTLX_GLTF_IMAGE,
-                                    MTLX_FLOAT_STRING, '', shaderNode, ['iridescence'], textures, images, samplers)
+                                '', shaderNode, 'emissive', '', textures, images, samplers, MTLX_DEFAULT_COLORSPACE)       
+        
+                # Parse and remap alpha mode
+                # --------------------------
+                if 'alphaMode' in material:
+                    alphaModeString = material['alphaMode']
+                    alphaMode = 0 
+                    if alphaModeString in alphaModeMap:
+                        alphaMode = alphaModeMap[alphaModeString]
+                    if alphaMode != 0:
+                        alphaModeInput = self._nodeDefCache.addInputFromNodeDef(shaderNode, 'alpha_mode')
+                        alphaModeInput.setValue(alphaMode)
+
+                # Parse alpha cutoff 
+                # ------------------
+                if 'alphaCutoff' in material:
+                    alphaCutOff = material['alphaCutoff']
+                    if alphaCutOff != 0.5:
+                        alphaCutOffInput = self._nodeDefCache.addInputFromNodeDef(shaderNode, 'alpha_cutoff')
+                        alphaCutOffInput.setValue(float(alphaCutOff))
+
+                # Parse extensions
+                # --------------------------------
+                if 'extensions' in material:
+                    extensions = material['extensions']
+
+                    # Parse untextured ior extension
+                    # ------------------------------
+                    if 'KHR_materials_ior' in extensions:
+                        iorExtension = extensions['KHR_materials_ior']
+                        if  'ior' in iorExtension:
+                            ior = iorExtension['ior']
+                            iorInput = self._nodeDefCache.addInputFromNodeDef(shaderNode, 'ior')
+                            iorInput.setValue(float(ior))
+
+                    # Parse specular and specular color extension
+                    if 'KHR_materials_specular' in extensions:
+                        specularExtension = extensions['KHR_materials_specular']
+                        specularColorFactor = None
+                        if 'specularColorFactor' in specularExtension:
+                            specularColorFactor = specularExtension['specularColorFactor']
+                        specularColorTexture = None
+                        if 'specularColorTexture' in specularExtension:
+                            specularColorTexture = specularExtension['specularColorTexture']
+                        if specularColorFactor or specularColorTexture:
+                            self.readColorInput(doc, specularColorTexture, specularColorFactor, 'image_specularcolor',
+                                    MTLX_GLTF_COLOR_IMAGE, MULTI_OUTPUT_TYPE_STRING, 
+                                    '', shaderNode, 'specular_color', '', textures, images, MTLX_DEFAULT_COLORSPACE)
+
+                        specularTexture = specularFactor = None
+                        if 'specularFactor' in specularExtension:
+                            specularFactor = specularExtension['specularFactor']
+                        if 'specularTexture' in specularExtension:
+                            specularTexture = specularExtension['specularTexture']
+                        if specularFactor or specularTexture:
+                            self.readInput(doc, specularTexture, [specularFactor], 'image_specular', MTLX_GLTF_IMAGE,
+                                    MTLX_FLOAT_STRING, '', shaderNode, ['specular'], textures, images, samplers)
+
+                    # Parse transmission extension        
+                    if 'KHR_materials_transmission' in extensions:
+                        transmissionExtension = extensions['KHR_materials_transmission']
+                        if 'transmissionFactor' in transmissionExtension:
+                            transmissionFactor = transmissionExtension['transmissionFactor']
+                            transmissionInput = self._nodeDefCache.addInputFromNodeDef(shaderNode, 'transmission')
+                            transmissionInput.setValue(float(transmissionFactor)) 
+
+                    # Parse iridescence extension - TODO
+                    if 'KHR_materials_iridescence' in extensions:
+                        iridescenceExtension = extensions['KHR_materials_iridescence']
+                        if iridescenceExtension:
+
+                            # Parse unmapped or mapped iridescence
+                            iridescenceFactor = iridescenceTexture = None
+                            if 'iridescenceFactor' in iridescenceExtension:
+                                iridescenceFactor = iridescenceExtension['iridescenceFactor']
+                            if 'iridescenceTexture' in iridescenceExtension:
+                                iridescenceTexture = iridescenceExtension['iridescenceTexture']
+                            if iridescenceFactor or iridescenceTexture:
+                                self.readInput(doc, iridescenceTexture, [iridescenceFactor], 'image_iridescence', MTLX_GLTF_IMAGE,
+                                        MTLX_FLOAT_STRING, '', shaderNode, ['iridescence'], textures, images, samplers)
                         
-                        # Parse mapped or unmapped iridescence IOR
-                        if 'iridescenceIor' in iridescenceExtension:
-                            iridescenceIor = iridescenceExtension['iridescenceIor']
-                            self.readInput(doc, None, [iridescenceIor], '', '',
-                                    MTLX_FLOAT_STRING, '', shaderNode, ['iridescence_ior'], textures, images, samplers)
+                            # Parse mapped or unmapped iridescence IOR
+                            if 'iridescenceIor' in iridescenceExtension:
+                                iridescenceIor = iridescenceExtension['iridescenceIor']
+                                self.readInput(doc, None, [iridescenceIor], '', '',
+                                        MTLX_FLOAT_STRING, '', shaderNode, ['iridescence_ior'], textures, images, samplers)
                         
-                        # Parse iridescence texture
-                        iridescenceThicknessMinimum = iridescenceExtension['iridescenceThicknessMinimum'] if 'iridescenceThicknessMinimum' in iridescenceExtension else None
-                        iridescenceThicknessMaximum = iridescenceExtension['iridescenceThicknessMaximum'] if 'iridescenceThicknessMaximum' in iridescenceExtension else None
-                        iridescenceThicknessTexture = iridescenceExtension['iridescenceThicknessTexture'] if 'iridescenceThicknessTexture' in iridescenceExtension else None
-                        if iridescenceThicknessMinimum or iridescenceThicknessMaximum or iridescenceThicknessTexture:
-                            floatInput = shaderNode.addInputFromNodeDef("iridescence_thickness")
-                            if floatInput:
-                                uri = ''
-                                if iridescenceThicknessTexture:
-                                    textureIndex = iridescenceThicknessTexture['index']
-                                    texture = textures[textureIndex] if textureIndex < len(textures) else None
-                                    uri = self.getGLTFTextureUri(texture, images)  
+                            # Parse iridescence texture
+                            iridescenceThicknessMinimum = iridescenceExtension['iridescenceThicknessMinimum'] if 'iridescenceThicknessMinimum' in iridescenceExtension else None
+                            iridescenceThicknessMaximum = iridescenceExtension['iridescenceThicknessMaximum'] if 'iridescenceThicknessMaximum' in iridescenceExtension else None
+                            iridescenceThicknessTexture = iridescenceExtension['iridescenceThicknessTexture'] if 'iridescenceThicknessTexture' in iridescenceExtension else None
+                            if iridescenceThicknessMinimum or iridescenceThicknessMaximum or iridescenceThicknessTexture:
+                                floatInput = self._nodeDefCache.addInputFromNodeDef(shaderNode, "iridescence_thickness")
+                                if floatInput:
+                                    uri = ''
+                                    if iridescenceThicknessTexture:
+                                        textureIndex = iridescenceThicknessTexture['index']
+                                        texture = textures[textureIndex] if textureIndex < len(textures) else None
+                                        uri = self.getGLTFTextureUri(texture, images)  
                                 
-                                    imageNodeName = doc.createValidChildName("image_iridescence_thickness")                            
-                                    newTexture = self.addMtlxImage(doc, imageNodeName, uri, 'gltf_iridescence_thickness', '', MTLX_FLOAT_STRING, '')
-                                    if newTexture:
-                                        floatInput.setAttribute(MTLX_NODE_NAME_ATTRIBUTE, newTexture.getName())
-                                        floatInput.removeAttribute(MTLX_VALUE_STRING)
-
-                                        if iridescenceThicknessMinimum:
-                                            minInput = newTexture.addInputFromNodeDef("thicknessMin")
-                                            if minInput:
-                                                minInput.setValue(float(iridescenceThicknessMinimum))
-                                        if iridescenceThicknessMaximum:
-                                            maxInput = newTexture.addInputFromNodeDef("thicknessMax")
-                                            if maxInput:
-                                                maxInput.setValue(float(iridescenceThicknessMaximum))
-
-                if 'KHR_materials_emissive_strength' in extensions:
-                    emissiveStrengthExtension = extensions['KHR_materials_emissive_strength']
-                    if 'emissiveStrength' in emissiveStrengthExtension:
-                        emissiveStrength = emissiveStrengthExtension['emissiveStrength']                                        
-                        self.readInput(doc, None, [emissiveStrength], '', '', '', '',
-                                shaderNode, ['emissive_strength'], textures, images, samplers)
-
-                # Parse volume Inputs:
-                if 'KHR_materials_volume' in extensions:
-                    volumeExtension = extensions['KHR_materials_volume']
-
-                    # Textured or untexture thickness
-                    thicknessFactor = thicknessTexture = None
-                    if 'thicknessFactor' in volumeExtension:
-                        thicknessFactor = volumeExtension['thicknessFactor']  
-                    if 'thicknessTexture' in volumeExtension:
-                        thicknessTexture = volumeExtension['thicknessTexture']
-                    if thicknessFactor or thicknessTexture:                    
-                        self.readInput(doc, thicknessTexture, [thicknessFactor], 'image_thickness', MTLX_GLTF_IMAGE, MTLX_FLOAT_STRING, '',
-                                shaderNode, ['thickness'], textures, images, samplers)
-
-                    # Untextured attenuation color
-                    if 'attenuationColor' in volumeExtension:
-                        attenuationColor = volumeExtension['attenuationColor']
-                        attenuationInput = shaderNode.addInputFromNodeDef('attenuation_color')
-                        attenuationInput.setValue(mx.Color3(attenuationColor[0], attenuationColor[1], attenuationColor[2]))
-
-                    # Untextured attenuation distance
-                    if 'attenuationDistance' in volumeExtension:
-                        attenuationDistance = volumeExtension['attenuationDistance']
-                        attenuationDistance = str(attenuationDistance)
-                        attenuationInput = shaderNode.addInputFromNodeDef('attenuation_distance')
-                        attenuationInput.setValueString(attenuationDistance)
-
-                # Parse clearcoat
-                if 'KHR_materials_clearcoat' in extensions:
-                    clearcoat = extensions['KHR_materials_clearcoat']
-
-                    clearcoatFactor = clearcoatTexture = None
-                    if 'clearcoatFactor' in clearcoat:
-                        clearcoatFactor = clearcoat['clearcoatFactor']
-                    if 'clearcoatTexture' in clearcoat:
-                        clearcoatTexture = clearcoat['clearcoatTexture']
-                    if clearcoatFactor or clearcoatTexture:
-                        self.readInput(doc, clearcoatTexture, [clearcoatFactor], 'image_clearcoat', 
-                                MTLX_GLTF_IMAGE, MTLX_FLOAT_STRING, '', shaderNode, ['clearcoat'], 
-                                textures, images, samplers)
+                                        imageNodeName = self._nameAllocator.createValidChildName(doc, "image_iridescence_thickness")                            
+                                        newTexture = self.addMtlxImage(doc, imageNodeName, uri, 'gltf_iridescence_thickness', '', MTLX_FLOAT_STRING, '')
+                                        if newTexture:
+                                            floatInput.setAttribute(MTLX_NODE_NAME_ATTRIBUTE, newTexture.getName())
+                                            floatInput.removeAttribute(MTLX_VALUE_STRING)
+
+                                            if iridescenceThicknessMinimum:
+                                                minInput = self._nodeDefCache.addInputFromNodeDef(newTexture, "thicknessMin")
+                                                if minInput:
+                                                    minInput.setValue(float(iridescenceThicknessMinimum))
+                                            if iridescenceThicknessMaximum:
+                                                maxInput = self._nodeDefCache.addInputFromNodeDef(newTexture, "thicknessMax")
+                                                if maxInput:
+                                                    maxInput.setValue(float(iridescenceThicknessMaximum))
+
+                    if 'KHR_materials_emissive_strength' in extensions:
+                        emissiveStrengthExtension = extensions['KHR_materials_emissive_strength']
+                        if 'emissiveStrength' in emissiveStrengthExtension:
+                            emissiveStrength = emissiveStrengthExtension['emissiveStrength']                                        
+                            self.readInput(doc, None, [emissiveStrength], '', '', '', '',
+                                    shaderNode, ['emissive_strength'], textures, images, samplers)
+
+                    # Parse volume Inputs:
+                    if 'KHR_materials_volume' in extensions:
+                        volumeExtension = extensions['KHR_materials_volume']
+
+                        # Textured or untexture thickness
+                        thicknessFactor = thicknessTexture = None
+                        if 'thicknessFactor' in volumeExtension:
+                            thicknessFactor = volumeExtension['thicknessFactor']  
+                        if 'thicknessTexture' in volumeExtension:
+                            thicknessTexture = volumeExtension['thicknessTexture']
+                        if thicknessFactor or thicknessTexture:                    
+                            self.readInput(doc, thicknessTexture, [thicknessFactor], 'image_thickness', MTLX_GLTF_IMAGE, MTLX_FLOAT_STRING, '',
+                                    shaderNode, ['thickness'], textures, images, samplers)
+
+                        # Untextured attenuation color
+                        if 'attenuationColor' in volumeExtension:
+                            attenuationColor = volumeExtension['attenuationColor']
+                            attenuationInput = self._nodeDefCache.addInputFromNodeDef(shaderNode, 'attenuation_color')
+                            attenuationInput.setValue(mx.Color3(attenuationColor[0], attenuationColor[1], attenuationColor[2]))
+
+                        # Untextured attenuation distance
+                        if 'attenuationDistance' in volumeExtension:
+                            attenuationDistance = volumeExtension['attenuationDistance']
+                            attenuationDistance = str(attenuationDistance)
+                            attenuationInput = self._nodeDefCache.addInputFromNodeDef(shaderNode, 'attenuation_distance')
+                            attenuationInput.setValueString(attenuationDistance)
+
+                    # Parse clearcoat
+                    if 'KHR_materials_clearcoat' in extensions:
+                        clearcoat = extensions['KHR_materials_clearcoat']
+
+                        clearcoatFactor = clearcoatTexture = None
+                        if 'clearcoatFactor' in clearcoat:
+                            clearcoatFactor = clearcoat['clearcoatFactor']
+                        if 'clearcoatTexture' in clearcoat:
+                            clearcoatTexture = clearcoat['clearcoatTexture']
+                        if clearcoatFactor or clearcoatTexture:
+                            self.readInput(doc, clearcoatTexture, [clearcoatFactor], 'image_clearcoat', 
+                                    MTLX_GLTF_IMAGE, MTLX_FLOAT_STRING, '', shaderNode, ['clearcoat'], 
+                                    textures, images, samplers)
                         
-                    clearcoatRoughnessFactor = clearcoatRoughnessTexture = None
-                    if 'clearcoatRoughnessFactor' in clearcoat:
-                        clearcoatRoughnessFactor = clearcoat['clearcoatRoughnessFactor']
-                    if 'clearcoatRoughnessTexture' in clearcoat:
-                        clearcoatRoughnessTexture = clearcoat['clearcoatRoughnessTexture']
-                    if clearcoatRoughnessFactor or clearcoatRoughnessTexture:
-                        self.readInput(doc, clearcoatRoughnessTexture, [clearcoatRoughnessFactor], 
-                                'image_clearcoat_roughness', 
-                                MTLX_GLTF_IMAGE, MTLX_FLOAT_STRING, '', shaderNode, ['clearcoat_roughness'], 
-                                textures, images, samplers)
+                        clearcoatRoughnessFactor = clearcoatRoughnessTexture = None
+                        if 'clearcoatRoughnessFactor' in clearcoat:
+                            clearcoatRoughnessFactor = clearcoat['clearcoatRoughnessFactor']
+                        if 'clearcoatRoughnessTexture' in clearcoat:
+                            clearcoatRoughnessTexture = clearcoat['clearcoatRoughnessTexture']
+                        if clearcoatRoughnessFactor or clearcoatRoughnessTexture:
+                            self.readInput(doc, clearcoatRoughnessTexture, [clearcoatRoughnessFactor], 
+                                    'image_clearcoat_roughness', 
+                                    MTLX_GLTF_IMAGE, MTLX_FLOAT_STRING, '', shaderNode, ['clearcoat_roughness'], 
+                                    textures, images, samplers)
                         
-                    if 'clearcoatNormalTexture' in clearcoat:
-                        clearcoatNormalTexture = clearcoat['clearcoatNormalTexture']
-                        self.readInput(doc, clearcoatNormalTexture, [None], 'image_clearcoat_normal', 
-                                MTLX_GLTF_NORMALMAP_IMAGE, MTLX_VEC3_STRING, '',
-                                shaderNode, ['clearcoat_normal'], textures, images, samplers)
+                        if 'clearcoatNormalTexture' in clearcoat:
+                            clearcoatNormalTexture = clearcoat['clearcoatNormalTexture']
+                            self.readInput(doc, clearcoatNormalTexture, [None], 'image_clearcoat_normal', 
+                                    MTLX_GLTF_NORMALMAP_IMAGE, MTLX_VEC3_STRING, '',
+                                    shaderNode, ['clearcoat_normal'], textures, images, samplers)
                         
-                # Parse sheen
-                if 'KHR_materials_sheen' in extensions:
-                    sheen = extensions['KHR_materials_sheen']
-
-                    sheenColorFactor = sheenColorTexture = None
-                    if 'sheenColorFactor' in sheen:
-                        sheenColorFactor = sheen['sheenColorFactor']
-                    if 'sheenColorTexture' in sheen:
-                        sheenColorTexture = sheen['sheenColorTexture']
-                    if sheenColorFactor or sheenColorTexture:
-                        self.readColorInput(doc, sheenColorTexture, sheenColorFactor, 'image_sheen',
-                                MTLX_GLTF_COLOR_IMAGE, MULTI_OUTPUT_TYPE_STRING, 
-                                '', shaderNode, 'sheen_color', '', textures, images, MTLX_DEFAULT_COLORSPACE)
+                    # Parse sheen
+                    if 'KHR_materials_sheen' in extensions:
+                        sheen = extensions['KHR_materials_sheen']
+
+                        sheenColorFactor = sheenColorTexture = None
+                        if 'sheenColorFactor' in sheen:
+                            sheenColorFactor = sheen['sheenColorFactor']
+                        if 'sheenColorTexture' in sheen:
+                            sheenColorTexture = sheen['sheenColorTexture']
+                        if sheenColorFactor or sheenColorTexture:
+                            self.readColorInput(doc, sheenColorTexture, sheenColorFactor, 'image_sheen',
+                                    MTLX_GLTF_COLOR_IMAGE, MULTI_OUTPUT_TYPE_STRING, 
+                                    '', shaderNode, 'sheen_color', '', textures, images, MTLX_DEFAULT_COLORSPACE)
                         
-                    sheenRoughnessFactor = sheenRoughnessTexture = None
-                    if 'sheenRoughnessFactor' in sheen:
-                        sheenRoughnessFactor = sheen['sheenRoughnessFactor']  
-                    if 'sheenRoughnessTexture' in sheen:
-                        sheenRoughnessTexture = sheen['sheenRoughnessTexture']
-                    if sheenRoughnessFactor or sheenRoughnessTexture:                    
-                        self.readInput(doc, sheenRoughnessTexture, [sheenRoughnessFactor], 'image_sheen_roughness', MTLX_GLTF_IMAGE, MTLX_FLOAT_STRING, '',
-                                shaderNode, ['sheen_roughness'], textures, images, samplers)
+                        sheenRoughnessFactor = sheenRoughnessTexture = None
+                        if 'sheenRoughnessFactor' in sheen:
+                            sheenRoughnessFactor = sheen['sheenRoughnessFactor']  
+                        if 'sheenRoughnessTexture' in sheen:
+                            sheenRoughnessTexture = sheen['sheenRoughnessTexture']
+                        if sheenRoughnessFactor or sheenRoughnessTexture:                    
+                            self.readInput(doc, sheenRoughnessTexture, [sheenRoughnessFactor], 'image_sheen_roughness', MTLX_GLTF_IMAGE, MTLX_FLOAT_STRING, '',
+                                    shaderNode, ['sheen_roughness'], textures, images, samplers)
+
+        if deduplicate:
+            self.log('- Deduplicated materials: %d unique of %d glTF materials. Ratio: %.2f' % 
+                     (self._uniqueMaterialCount, len([name for name in self._materialNames if name]), 
+                      self.getDeduplicationRatio()))
 
         return True
 
-    def computeMeshMaterials(self, materialMeshList, materialCPVList, cnode, path, nodeCount, meshCount, meshes, nodes, materials):
+    def computeMeshMaterials(self, materialMeshList, materialCPVList, sceneIndex, materials):
         '''
-        @brief Recursively computes mesh to material assignments.
+        @brief Computes mesh to material assignments.
         @param materialMeshList The dictionary of material to mesh assignments to update.
         @param materialCPVList The list of materials that require CPV.
-        @param cnode The current node to examine.
-        @param path The current string path to the node. If a node, mesh has no name then a default name is used. Primtives are named by index.
-        @param nodeCount The current node count.
-        @param meshCount The current mesh count.
-        @param meshes The set of meshes to examine.
-        @param nodes The set of nodes to examine.
-        @param materials The set of materials to examine.
+        @param sceneIndex The GLTFSceneIndex of the glTF document. Paths are taken from the index.
+        @param materials The list of MaterialX material names indexed by glTF material index.
         '''
-        
-        # Push node name on to path
-        prevPath = path
-        cnodeName = ''
-        if 'name' in cnode:
-            cnodeName = cnode['name']
-        else:    
-            cnodeName =  GLTF_DEFAULT_NODE_PREFIX + str(nodeCount)
-            nodeCount = nodeCount + 1
-        path = path + '/' + ( mx.createValidName(cnodeName) )
-
-        # Check if this node is associated with a mesh
-        if 'mesh' in cnode:
-            meshIndex = cnode['mesh']
-            cmesh = meshes[meshIndex]
-            if cmesh:
-
-                # Append mesh name on to path
-                meshName = ''
-                if 'name' in cmesh:
-                    meshName = cmesh['name']
-                else:
-                    meshName = self.GLTF_DEFAULT_MESH_PREFIX + str(meshCount)
-                    meshCount = meshCount + 1
-                path = path + '/' + mx.createValidName(meshName)
-
-                if 'primitives' in cmesh:
-                    primitives = cmesh['primitives']
-
-                    # Check for material CPV attribute
-                    requiresCPV = False
-                    primitiveIndex = 0
-                    for primitive in primitives:
-
-                        material = None
-                        if 'material' in primitive:
-                            materialIndex = primitive['material']   
-                            material = materials[materialIndex]
-
-                        # Add reference to mesh (by name) to material
-                        if material:
-                            materialName = material['name']
-
-                            if materialName not in materialMeshList:
-                                materialMeshList[materialName] = []
-                            if len(primitives) == 1:
-                                materialMeshList[materialName].append(path)
-                                #materialMeshList[materialName].append(path + '/' + GLTF_DEFAULT_PRIMITIVE_PREFIX + str(primitiveIndex))
-                            else:
-                                materialMeshList[materialName].append(path + '/' + GLTF_DEFAULT_PRIMITIVE_PREFIX + str(primitiveIndex))
-
-                            if 'attributes' in primitive:
-                                attributes = primitive['attributes']
-                                if 'COLOR' in attributes:
-                                    if self._options['debugOutput']:
-                                        print('CPV attribute found')
-                                    requiresCPV = True
-                                    break
-                            if requiresCPV:
-                                materialCPVList.append(materialName)
-                        
-                        primitiveIndex = primitiveIndex + 1
-
-        if 'children' in cnode:
-            children = cnode['children']
-            for childIndex in children:
-                child = nodes[childIndex]
-                self.computeMeshMaterials(materialMeshList, materialCPVList, child, path, nodeCount, meshCount, meshes, nodes, materials)
-
-        # Pop path name
-        path = prevPath
+        primitivePaths = sceneIndex.getPrimitivePaths()
+        for primitiveEntry, primitive in enumerate(sceneIndex.getPrimitives()):
+
+            materialName = None
+            if 'material' in primitive:
+                materialIndex = primitive['material']   
+                if materialIndex < len(materials):
+                    materialName = materials[materialIndex]
+
+            # Add reference to mesh (by name) to material
+            if materialName:
+                if materialName not in materialMeshList:
+                    materialMeshList[materialName] = []
+                materialMeshList[materialName].append(primitivePaths[primitiveEntry])
+
+                # Check for material CPV attribute
+                if 'attributes' in primitive:
+                    attributes = primitive['attributes']
+                    if 'COLOR' in attributes:
+                        if self._options['debugOutput']:
+                            print('CPV attribute found')
+                        if materialName not in materialCPVList:
+                            materialCPVList.append(materialName)
+
+    def compactGeomPaths(self, paths, sceneIndex) -> list:
+        '''
+        @brief Compact a list of primitive paths assigned to a material.
+        Paths are replaced by the shortest prefix for which every primitive path in the scene with that prefix
+        is in the list. As MaterialX geometry paths match by prefix, the compacted list matches the same
+        primitive paths as the original list.
+        @param paths The list of primitive paths.
+        @param sceneIndex The GLTFSceneIndex the paths were computed from.
+        @return The compacted list of paths, in the order of first use.
+        '''
+        sceneCounts = sceneIndex.getPrimitivePathCounts()
+        uniquePaths = list(dict.fromkeys(paths))
+
+        # Count the number of assigned paths below each prefix
+        assignedCounts = {}
+        for path in uniquePaths:
+            for prefix in sceneIndex.getPathPrefixes(path):
+                assignedCounts[prefix] = assignedCounts.get(prefix, 0) + 1
+
+        compactPaths = {}
+        for path in uniquePaths:
+            for prefix in sceneIndex.getPathPrefixes(path):
+                if assignedCounts[prefix] == sceneCounts.get(prefix, 0):
+                    compactPaths[prefix] = True
+                    break
+            else:
+                compactPaths[path] = True
+        return list(compactPaths)
 
-    def buildMaterialAssociations(self, gltfDoc) -> dict:
+    def buildMaterialAssociations(self, gltfDoc, sceneIndex=None) -> dict:
         '''
         @brief Build a dictionary of material assignments.
         @param gltfDoc The glTF document to read from.
-        @return A dictionary of material assignments if successful, otherwise None.
+        @param sceneIndex Optional GLTFSceneIndex of the glTF document. Built if not specified.
+        @return A dictionary of glTF material name to primitive paths.
         '''
         materials = gltfDoc['materials'] if 'materials' in gltfDoc else [] 
         meshes = gltfDoc['meshes'] if 'meshes' in gltfDoc else []
         
         if not materials or not meshes:
             return {}
-    
-        meshNameTemplate = "mesh"
-        meshCount = 0
+
+        if not sceneIndex:
+            sceneIndex = GLTFSceneIndex(gltfDoc)
+
         materialAssignments : dict = {}
-        for mesh in meshes:
-            if 'primitives' in mesh:
-                meshName = mesh['name'] if 'name' in mesh else meshNameTemplate + str(meshCount) 
-                primitives = mesh['primitives']
-                primitiveCount = 0
-                for primitive in primitives:
-                    if 'material' in primitive:
-                        materialIndex = primitive['material']
-                        if materialIndex < len(materials):
-                            material = materials[materialIndex]                        
-                            if 'name' in material:
-                                materialName = material['name']
-                                primitiveName = GLTF_DEFAULT_PRIMITIVE_PREFIX + str(primitiveCount)
-                                if materialName not in materialAssignments:
-                                    materialAssignments[materialName] = []
-                                if len(primitives) == 1:
-                                    materialAssignments[materialName].append(meshName)
-                                else:                            
-                                    materialAssignments[materialName].append(meshName + '/' + primitiveName)
-                    primitiveCount += 1
-            meshCount += 1        
+        primitivePaths = sceneIndex.getPrimitivePaths()
+        for primitiveEntry, primitive in enumerate(sceneIndex.getPrimitives()):
+            if 'material' in primitive:
+                materialIndex = primitive['material']
+                if materialIndex < len(materials):
+                    material = materials[materialIndex]                        
+                    if 'name' in material:
+                        materialName = material['name']
+                        if materialName not in materialAssignments:
+                            materialAssignments[materialName] = []
+                        materialAssignments[materialName].append(primitivePaths[primitiveEntry])
 
         return materialAssignments
 
@@ -1044,18 +3708,48 @@ class GLTF2MtlxReader:
             self.log('File not found:' + gltfFileName)
             return None
 
+        self.log('Read glTF file:' + gltfFileName)
         gltfJson = None
+        with self._profilePhase('parse'):
+            with open(gltfFileName, 'r') as gltfFile:
+                gltfJson = json.load(gltfFile)
+                gltfString = json.dumps(gltfJson, indent=2)
+                self.log('GLTF JSON' + gltfString)
 
-        self.log('Read glTF file:' + gltfFileName)
-        gltfFile = open(gltfFileName, 'r')
+        return self.convertJson(gltfJson)
+
+    def convertString(self, gltfData) -> mx.Document:
+        '''
+        @brief Convert glTF data held in memory to a MaterialX document.
+        @param gltfData The glTF JSON as a string or bytes, or the contents of a binary glTF (glb) file.
+        @return A MaterialX document if successful, otherwise None.
+        '''
         gltfJson = None
-        if gltfFile:
-            gltfJson = json.load(gltfFile)
-            gltfString = json.dumps(gltfJson, indent=2)
-            self.log('GLTF JSON' + gltfString)
+        try:
+            with self._profilePhase('parse'):
+                gltfJson = Util.readGLTFData(gltfData)
+        except ValueError as err:
+            self.log('Failed to parse glTF data: ' + str(err))
+            return None
+
+        return self.convertJson(gltfJson)
+
+    def convertJson(self, gltfJson) -> mx.Document:
+        '''
+        @brief Convert a glTF JSON dictionary to a MaterialX document.
+        The dictionary is not modified.
+        @param gltfJson The glTF JSON to convert.
+        @return A MaterialX document if successful, otherwise None.
+        '''
         if gltfJson:
-            doc, libFiles = Util.createMaterialXDoc()
-            self.glTF2MaterialX(doc, gltfJson)
+            with self._profilePhase('libraryLoad'):
+                doc, libFiles = Util.createMaterialXDoc()
+            with self._profilePhase('materials'):
+                self.glTF2MaterialX(doc, gltfJson)
+            if self.isCancelled():
+                return None
+
+            self._beginPhase('assignments')
 
             # Create a look and assign materials if found
             # TODO: Handle variants
@@ -1068,19 +3762,17 @@ class GLTF2MtlxReader:
             #        matassign.setGeom(','.join(assignments[assignMaterial]))
 
             assignments : dict = {}
-            materialCPVList : dict = {}
+            materialCPVList : list = []
+            sceneIndex = None
             meshes = gltfJson['meshes'] if 'meshes' in gltfJson else []
             nodes = gltfJson['nodes'] if 'nodes' in gltfJson else []
             scenes = gltfJson['scenes'] if 'scenes' in gltfJson else []
             if meshes and nodes and scenes:
-                for scene in gltfJson['scenes']:
+                for scene in scenes:
                     self.log('Scan scene for materials: ' + str(scene))
-                    nodeCount = 0
-                    meshCount = 0
-                    path = ''
-                    for nodeIndex in scene['nodes']:
-                        node = nodes[nodeIndex]
-                        self.computeMeshMaterials(assignments, materialCPVList, node, path, nodeCount, meshCount, meshes, nodes, gltfJson['materials'])
+                with self._profilePhase('sceneIndex'):
+                    sceneIndex = self.getSceneIndex(gltfJson)
+                self.computeMeshMaterials(assignments, materialCPVList, sceneIndex, self._materialNames)
 
             # Add a CPV node if any assigned geometry has a color stream.
             for materialName in materialCPVList:
@@ -1090,27 +3782,78 @@ class GLTF2MtlxReader:
                 baseColorInput = shaderNode.getInput('base_color') if shaderNode else None
                 baseColorNode = baseColorInput.getConnectedNode() if baseColorInput else None
                 if baseColorNode:
-                    geomcolorInput = baseColorNode.addInputFromNodeDef('geomcolor')
+                    geomcolorInput = self._nodeDefCache.addInputFromNodeDef(baseColorNode, 'geomcolor')
                     if geomcolorInput:
-                        geomcolor = doc.addNode('geomcolor', EMPTY_STRING, 'color4')
+                        geomcolor = doc.addNode('geomcolor', self._nameAllocator.createValidChildName(doc, 'node1'), 'color4')
                         geomcolorInput.setNodeName(geomcolor.getName())
 
             # Create a look and material assignments
             if self._options['createAssignments'] and len(assignments) > 0:
-                comment = doc.addChildOfCategory('comment')
+                comment = doc.addChildOfCategory('comment', self._nameAllocator.createValidChildName(doc, 'comment1'))
                 comment.setDocString(' Generated material assignments ')
+                collections = {}
+                if self._options['compactAssignments']:
+                    for assignMaterial in assignments:
+                        collectionName = self._nameAllocator.createValidChildName(doc, MTLX_COLLECTION_PREFIX + assignMaterial)
+                        collection = doc.addCollection(collectionName)
+                        collection.setIncludeGeom(','.join(self.compactGeomPaths(assignments[assignMaterial], sceneIndex)))
+                        collections[assignMaterial] = collection
                 look = doc.addLook('look')
                 for assignMaterial in assignments:
                     matassign = look.addMaterialAssign(assignMaterial)
                     matassign.setMaterial(assignMaterial)
-                    matassign.setGeom(','.join(assignments[assignMaterial]))
+                    if assignMaterial in collections:
+                        matassign.setCollection(collections[assignMaterial])
+                    else:
+                        matassign.setGeom(','.join(assignments[assignMaterial]))
+                self._count('materialAssignments', len(assignments))
 
+            self._endPhase('assignments')
             return doc
         
 ##########################################################################################################################
 # MaterialX to glTF conversion classes
 ##########################################################################################################################
 
+# Mapping of gltf_pbr inputs to glTF material properties, in the order in which they are written.
+# Each entry maps 'inputs' to the properties of a glTF 'extension', or of the material itself if
+# the extension name is empty. Inputs are given as (input name, input type, texture property, factor property),
+# where an empty texture property means that the input is not textured, and an empty factor property means that
+# only a texture is written. An optional fifth item maps MaterialX values to glTF values.
+# 'procedural' optionally gives an (input name, texture property) which is written using the KHR_procedurals
+# extension instead, if the input is connected to a node graph.
+GLTF_PBR_INPUT_MAPPINGS = [
+    { 'extension' : 'KHR_materials_transmission',
+      'inputs' : [ ('transmission', MTLX_FLOAT_STRING, 'transmissionTexture', 'transmissionFactor') ] },
+    { 'extension' : 'KHR_materials_specular',
+      'procedural' : ('specular_color', 'specularColorTexture'),
+      'inputs' : [ ('specular_color', 'color3', 'specularColorTexture', 'specularColorFactor'),
+                   ('specular', MTLX_FLOAT_STRING, 'specularTexture', 'specularFactor') ] },
+    { 'extension' : EMPTY_STRING,
+      'inputs' : [ ('emissive', 'color3', 'emissiveTexture', 'emissiveFactor') ] },
+    { 'extension' : 'KHR_materials_emissive_strength',
+      'inputs' : [ ('emissive_strength', MTLX_FLOAT_STRING, EMPTY_STRING, 'emissiveStrength') ] },
+    { 'extension' : 'KHR_materials_ior',
+      'inputs' : [ ('ior', MTLX_FLOAT_STRING, EMPTY_STRING, 'ior') ] },
+    { 'extension' : 'KHR_materials_sheen',
+      'inputs' : [ ('sheen_color', 'color3', 'sheenColorTexture', 'sheenColorFactor'),
+                   ('sheen_roughness', MTLX_FLOAT_STRING, 'sheenRoughnessTexture', 'sheenRoughnessFactor') ] },
+    { 'extension' : 'KHR_materials_clearcoat',
+      'inputs' : [ ('clearcoat', MTLX_FLOAT_STRING, 'clearcoatTexture', 'clearcoatFactor'),
+                   ('clearcoat_roughness', MTLX_FLOAT_STRING, 'clearcoatRoughnessTexture', 'clearcoatRoughnessFactor'),
+                   ('clearcoat_normal', 'vector3', 'clearcoatNormalTexture', EMPTY_STRING) ] },
+    { 'extension' : 'KHR_materials_volume',
+      'inputs' : [ ('thickness', MTLX_FLOAT_STRING, 'thicknessTexture', 'thicknessFactor'),
+                   ('attenuation_color', 'color3', EMPTY_STRING, 'attenuationColor'),
+                   ('attenuation_distance', MTLX_FLOAT_STRING, EMPTY_STRING, 'attenuationDistance') ] },
+    { 'extension' : EMPTY_STRING,
+      'inputs' : [ ('alpha_mode', 'integer', EMPTY_STRING, 'alphaMode', { 0 : 'OPAQUE', 1 : 'MASK', 2 : 'BLEND' }),
+                   ('alpha_cutoff', MTLX_FLOAT_STRING, EMPTY_STRING, 'alphaCutoff') ] },
+    { 'extension' : 'KHR_materials_iridescence',
+      'inputs' : [ ('iridescence', MTLX_FLOAT_STRING, 'iridescenceTexture', 'iridescenceFactor'),
+                   ('iridescence_ior', MTLX_FLOAT_STRING, EMPTY_STRING, 'iridescenceIor') ] },
+]
+
 class MTLX2GLTFOptions(dict):
     '''
     @brief Class to hold options for MaterialX to glTF conversion.
@@ -1119,11 +3862,23 @@ class MTLX2GLTFOptions(dict):
         - 'translateShaders' : Translate MaterialX shaders to glTF PBR shader. Default is False.   
         - 'bakeTextures' : Bake pattern graphs in MaterialX. Default is False.
         - 'bakeResolution' : Baked texture resolution if 'bakeTextures' is enabled. Default is 256.
+        - 'cpuBake' : Bake textures on the CPU using NumPy when all pattern nodes are supported,
+          falling back to the GPU baker otherwise. Default is False.
+        - 'foldConstants' : Replace shader input connections to pattern graphs which evaluate to a constant by the
+          constant value before translating shaders and baking. Requires NumPy. Default is False.
+        - 'bakeCache' : Folder used to cache baked materials. Materials whose content and baking settings are unchanged
+          are reused from the cache instead of being baked again. Default is '', which disables the cache.
+        - 'bakeCacheSize' : Maximum size of the bake cache in megabytes. Least recently used materials are removed
+          when it is exceeded. Default is 1024.
         - 'packageBinary' : Package binary data in glTF. Default is False.
         - 'geometryFile' : Path to geometry file to use for glTF. Default is ''.
+        - 'geometryPassthrough' : Copy the accessors, buffer views and buffers of the geometry file to the output as is,
+          without parsing and re-serializing them. Default is False.
         - 'primsPerMaterial' : Create a new primitive per material in the MaterialX file and assign the material. Default is False.
         - 'searchPath' : Search path for files. Default is empty.
         - 'writeDefaultInputs' : Emit inputs even if they have default values. Default is False.
+        - 'compactJson' : Write glTF JSON without indentation when serializing. Default is False.
+        - 'deduplicateMaterials' : Write materials with identical content only once. Default is False.
         - 'debugOutput' : Print debug output. Default is True.
     '''
     def __init__(self, *args, **kwargs):
@@ -1135,13 +3890,20 @@ class MTLX2GLTFOptions(dict):
         self['translateShaders'] = False
         self['bakeTextures'] = False
         self['bakeResolution'] = 256
+        self['cpuBake'] = False
+        self['foldConstants'] = False
+        self['bakeCache'] = ''
+        self['bakeCacheSize'] = 1024
         self['packageBinary'] = False
         self['geometryFile'] = ''  
+        self['geometryPassthrough'] = False
         self['primsPerMaterial'] = True     
         self['debugOutput'] = True
         self['createProceduralTextures'] = False
         self['searchPath'] = mx.FileSearchPath()
         self['writeDefaultInputs'] = False
+        self['compactJson'] = False
+        self['deduplicateMaterials'] = False
 
 class MTLX2GLTFWriter:
     '''
@@ -1152,6 +3914,17 @@ class MTLX2GLTFWriter:
     _log = ''
     # Options
     _options = MTLX2GLTFOptions()
+    # Optional event used to request cancellation between materials
+    _cancelEvent = None
+    # Optional profiler used to record conversions
+    _profiler = None
+    # Index of the document shader nodes used while writing materials
+    _shaderIndex = None
+    # Names of materials removed as duplicates, mapped to the name of the material kept
+    _materialAliases = None
+    # Geometry template loaded from the 'geometryFile' option, and the file it was loaded from
+    _geometryTemplate = None
+    _geometryTemplateKey = None
         
     def clearLog(self):
         '''
@@ -1185,6 +3958,54 @@ class MTLX2GLTFWriter:
         '''
         return self._options
 
+    def setCancelEvent(self, event):
+        '''
+        @brief Set an event which can be used to cancel a conversion in progress.
+        The event is checked between materials.
+        @param event A threading.Event or any object with an is_set() method. None disables cancellation.
+        '''
+        self._cancelEvent = event
+
+    def isCancelled(self) -> bool:
+        '''
+        @brief Check if cancellation of the current conversion has been requested.
+        @return True if cancelled, otherwise False.
+        '''
+        return self._cancelEvent is not None and self._cancelEvent.is_set()
+
+    def setProfiler(self, profiler):
+        '''
+        @brief Set a profiler to record phase timings and counters of conversions.
+        @param profiler A ConversionProfiler. None disables profiling.
+        '''
+        self._profiler = profiler
+
+    def getProfiler(self) -> ConversionProfiler:
+        '''
+        @brief Get the profiler used to record conversions.
+        @return The profiler, or None if profiling is disabled.
+        '''
+        return self._profiler
+
+    def _beginPhase(self, name, material=None):
+        if self._profiler:
+            self._profiler.beginPhase(name, material)
+
+    def _endPhase(self, name):
+        if self._profiler:
+            self._profiler.endPhase(name)
+
+    def _profilePhase(self, name, material=None):
+        return self._profiler.phase(name, material) if self._profiler else contextlib.nullcontext()
+
+    def _count(self, name, count=1):
+        if self._profiler:
+            self._profiler.increment(name, count)
+
+    def _getShaderIndex(self) -> MaterialXShaderIndex:
+        # Outside of materialX2glTF() an empty index is used so that no lookups are kept
+        return self._shaderIndex if self._shaderIndex else MaterialXShaderIndex()
+
     def initialize_gtlf_texture(self, texture, name, uri, images) -> None:
         '''
         @brief Initialize a new gltF image entry and texture entry which references
@@ -1204,33 +4025,35 @@ class MTLX2GLTFWriter:
         texture['name'] = name
         texture['source'] = len(images) - 1
 
-    def getShaderNodes(self, graphElement):
+    def getShaderNodes(self, graphElement, shaderIndex=None):
         '''
         @brief Find all surface shaders in a GraphElement.
         @param graphElement: The GraphElement to search for surface shaders.
+        @param shaderIndex: Optional MaterialXShaderIndex built for the GraphElement. If not specified one is built.
+        @return Dictionary of shader node path to shader node.
         '''
-        shaderNodes = set()
-        for material in graphElement.getMaterialNodes():
-            for shader in mx.getShaderNodes(material):
-                shaderNodes.add(shader.getNamePath())
+        if not shaderIndex:
+            shaderIndex = MaterialXShaderIndex(graphElement)
+        shaderNodes = dict(shaderIndex.getShaderNodes())
         for shader in graphElement.getNodes():
             if shader.getType() == 'surfaceshader':
-                shaderNodes.add(shader.getNamePath())
+                shaderNodes.setdefault(shader.getNamePath(), shader)
         return shaderNodes
 
 
-    def getRenderableGraphs(self, doc, graphElement):
+    def getRenderableGraphs(self, doc, graphElement, shaderIndex=None):
         '''
         @brief Find all renderable graphs in a GraphElement.
         @param doc: The MaterialX document.
         @param graphElement: The GraphElement to search for renderable graphs.
+        @param shaderIndex: Optional MaterialXShaderIndex built for the GraphElement. If not specified one is built.
         '''
         ngnamepaths = set()
         graphs = []
-        shaderNodes = self.getShaderNodes(graphElement)
-        for shaderPath in shaderNodes:
-            shader = doc.getDescendant(shaderPath)
-            for input in shader.getInputs():
+        if not shaderIndex:
+            shaderIndex = MaterialXShaderIndex(graphElement)
+        for shader in self.getShaderNodes(graphElement, shaderIndex).values():
+            for input in shaderIndex.getInputs(shader).values():
                 ngString = input.getNodeGraphString()
                 if ngString and ngString not in ngnamepaths:
                     graphs.append(graphElement.getNodeGraph(ngString))
@@ -1515,6 +4338,24 @@ class MTLX2GLTFWriter:
         
         return True, ''
 
+    def foldConstants(self, doc) -> int:
+        '''
+        @brief Replace shader input connections to pattern graphs which evaluate to a constant by the constant value.
+        Performed before translateShaders() and bakeTextures(), constant inputs are then written as factors
+        instead of being baked to textures or written as procedurals.
+        @param doc: The MaterialX document to modify.
+        @return The number of inputs replaced by values.
+        '''
+        if not CPUTextureBaker.isAvailable():
+            self.log('- NumPy is not available. Constant inputs are not folded.')
+            return 0
+        # A small grid suffices to tell if results vary with texture coordinates
+        baker = CPUTextureBaker(2, 2, searchPath=self._options['searchPath'])
+        with self._profilePhase('foldConstants'):
+            count = baker.foldConstants(doc)
+        self._count('foldedInputs', count)
+        return count
+
     def bakeTextures(self, doc, hdr, width, height, useGlslBackend, average, writeDocumentPerMaterial, outputFilename) -> bool:
         '''
         @brief Bake all textures in a MaterialX document.
@@ -1526,7 +4367,24 @@ class MTLX2GLTFWriter:
         @param average: Whether to average the baked textures.
         @param writeDocumentPerMaterial: Whether to write a separate MaterialX document per material.
         @param outputFilename: The output filename to write the baked document to.
+        @return True if textures were baked, otherwise False.
+        '''
+        if self._options['bakeCache']:
+            return self._bakeTexturesCached(doc, hdr, width, height, useGlslBackend, average, writeDocumentPerMaterial, outputFilename)
+        return self._bakeDocument(doc, hdr, width, height, useGlslBackend, average, writeDocumentPerMaterial, outputFilename)
+
+    def _bakeDocument(self, doc, hdr, width, height, useGlslBackend, average, writeDocumentPerMaterial, outputFilename) -> bool:
+        '''
+        @brief Bake all textures in a MaterialX document using the CPU or GPU baker. See bakeTextures() for parameters.
         '''
+        if self._options['cpuBake']:
+            cpuBaker = CPUTextureBaker(width, height, hdr, average, self._options['searchPath'])
+            with self._profilePhase('bake'):
+                baked = cpuBaker.bakeAllMaterials(doc, outputFilename, writeDocumentPerMaterial)
+            if baked:
+                return True
+            self.log('- CPU baker cannot bake: ' + cpuBaker.getError() + '. Using GPU baker.')
+
         baseType = mx_render.BaseType.FLOAT if hdr else mx_render.BaseType.UINT8    
         
         if platform == 'darwin' and not useGlslBackend:
@@ -1540,75 +4398,139 @@ class MTLX2GLTFWriter:
         if average:
             baker.setAverageImages(True)
         baker.writeDocumentPerMaterial(writeDocumentPerMaterial)
-        baker.bakeAllMaterials(doc, self._options['searchPath'], outputFilename)  
+        with self._profilePhase('bake'):
+            baker.bakeAllMaterials(doc, self._options['searchPath'], outputFilename)  
         
         return True      
-   
-    def buildPrimPaths(self, primPaths, cnode, path, nodeCount, meshCount, meshes, nodes):
+
+    def _bakeTexturesCached(self, doc, hdr, width, height, useGlslBackend, average, writeDocumentPerMaterial, outputFilename) -> bool:
         '''
-        @brief Recurse through a node hierarcht to build a dictionary of paths to primitives.
-        @param primPaths: The dictionary of primitive paths to build.
-        @param cnode: The current node to examine.
-        @param path: The parent path to the node.
-        @param nodeCount: The current node count.
-        @param meshCount: The current mesh count.
-        @param meshes: The list of meshes to examine.
-        @param nodes: The list of nodes to examine.
+        @brief Bake all textures in a MaterialX document, reusing materials found in the cache folder
+        given by the 'bakeCache' option. Only materials which are not in the cache are baked, and are then
+        added to the cache. See bakeTextures() for parameters.
         '''
-        
-        # Push node name on to path
-        prevPath = path
-        cnodeName = ''
-        if 'name' in cnode:
-            cnodeName = cnode['name']
-        else:    
-            cnodeName =  self.GLTF_DEFAULT_NODE_PREFIX + str(nodeCount)
-            nodeCount = nodeCount + 1
-        path = path + '/' + ( mx.createValidName(cnodeName) )
-
-        # Check if this node is associated with a mesh
-        if 'mesh' in cnode:
-            meshIndex = cnode['mesh']
-            cmesh = meshes[meshIndex]
-            if cmesh:
-
-                # Append mesh name on to path
-                meshName = ''
-                if 'name' in cmesh:
-                    meshName = cmesh['name']
-                else:
-                    meshName = self.GLTF_DEFAULT_MESH_PREFIX + str(meshCount)
-                    meshCount = meshCount + 1
-                path = path + '/' + mx.createValidName(meshName)
-
-                if 'primitives' in cmesh:
-                    primitives = cmesh['primitives']
-
-                    # Check for material CPV attribute
-                    primitiveIndex = 0
-                    for primitive in primitives:
+        searchPath = self._options['searchPath']
+        cache = TextureBakeCache(self._options['bakeCache'], self._options['bakeCacheSize'] * 1024 * 1024)
+        settings = [ width, height, hdr, average, useGlslBackend, self._options['cpuBake'] ]
+        keys = {}
+        with self._profilePhase('bakeCacheKeys'):
+            for material in doc.getMaterialNodes():
+                keys[material.getName()] = cache.computeKey(material, settings, searchPath)
+
+        missing = [ name for name, key in keys.items() if not cache.hasEntry(key) ]
+        self._count('bakeCacheHits', len(keys) - len(missing))
+        self._count('bakeCacheMisses', len(missing))
+        if missing:
+            # Bake a copy of the document without the cached materials, writing a document per material
+            bakeDoc = mx.createDocument()
+            bakeDoc.copyContentFrom(doc)
+            bakeDoc.setSourceUri(doc.getSourceUri())
+            for name in keys:
+                if name not in missing:
+                    bakeDoc.removeNode(name)
+            bakeFolder = tempfile.mkdtemp()
+            try:
+                if not self._bakeDocument(bakeDoc, hdr, width, height, useGlslBackend, average, True,
+                                          os.path.join(bakeFolder, 'baked.mtlx')):
+                    return False
+                for fileName in os.listdir(bakeFolder):
+                    if os.path.splitext(fileName)[1] != '.mtlx':
+                        continue
+                    bakedFileName = os.path.join(bakeFolder, fileName)
+                    bakedDoc = mx.createDocument()
+                    mx.readFromXmlFile(bakedDoc, bakedFileName)
+                    for material in bakedDoc.getMaterialNodes():
+                        if material.getName() in keys:
+                            cache.addEntry(keys[material.getName()], bakedFileName)
+            finally:
+                shutil.rmtree(bakeFolder, ignore_errors=True)
+        else:
+            self.log('- All %d materials found in bake cache: %s' % (len(keys), cache.getFolder()))
+
+        outputFolder = os.path.dirname(os.path.abspath(outputFilename))
+        stem, extension = os.path.splitext(outputFilename)
+        outputDoc = mx.createDocument()
+        for name, key in keys.items():
+            bakedDoc = cache.getEntry(key, outputFolder)
+            if not bakedDoc:
+                continue
+            if writeDocumentPerMaterial:
+                mx.writeToXmlFile(bakedDoc, stem + '_' + name + extension)
+            else:
+                self.mergeBakedDocument(outputDoc, bakedDoc)
+        if not writeDocumentPerMaterial:
+            mx.writeToXmlFile(outputDoc, outputFilename)
 
-                        primpath = path
-                        if len(primitives) > 1:
-                            primpath = + '/' + self.GLTF_DEFAULT_PRIMITIVE_PREFIX + str(primitiveIndex)
-                        primPaths[primpath] = primitive
-                        
-                        primitiveIndex = primitiveIndex + 1
+        removed = cache.evict(keys.values())
+        if removed:
+            self.log('- Evicted %d materials from bake cache' % len(removed))
+        return True
 
-        if 'children' in cnode:
-            children = cnode['children']
-            for childIndex in children:
-                child = nodes[childIndex]
-                self.buildPrimPaths(primPaths, child, path, nodeCount, meshCount, meshes, nodes)
+    @staticmethod
+    def mergeBakedDocument(doc, bakedDoc):
+        '''
+        @brief Add the elements of a baked document to another document.
+        Top level elements, such as the "NG_baked" node graph, are renamed if the name is already used.
+        @param doc The document to add to.
+        @param bakedDoc The baked document to add. Elements may be renamed.
+        '''
+        if not doc.getColorSpace():
+            doc.setColorSpace(bakedDoc.getColorSpace())
+        for child in bakedDoc.getChildren():
+            name = child.getName()
+            if doc.getChild(name):
+                newName = doc.createValidChildName(name)
+                while bakedDoc.getChild(newName):
+                    newName = doc.createValidChildName(newName + '1')
+                child.setName(newName)
+                # Update references from top level nodes
+                for elem in bakedDoc.traverseTree():
+                    if not elem.isA(mx.Input):
+                        continue
+                    if elem.getAttribute(MTLX_NODEGRAPH_NAME_ATTRIBUTE) == name:
+                        elem.setAttribute(MTLX_NODEGRAPH_NAME_ATTRIBUTE, newName)
+                    elif elem.getAttribute(MTLX_NODE_NAME_ATTRIBUTE) == name and elem.getParent().getParent().isA(mx.Document):
+                        elem.setAttribute(MTLX_NODE_NAME_ATTRIBUTE, newName)
+        for child in bakedDoc.getChildren():
+            newChild = doc.addChildOfCategory(child.getCategory(), child.getName())
+            newChild.copyContentFrom(child)
+   
+    def buildPrimPaths(self, primPaths, sceneIndex):
+        '''
+        @brief Build a dictionary of paths to primitives.
+        @param primPaths: The dictionary of primitive paths to build.
+        @param sceneIndex: The GLTFSceneIndex of the glTF document to examine.
+        '''
+        for primitivePath, primitive in zip(sceneIndex.getPrimitivePaths(), sceneIndex.getPrimitives()):
+            primPaths[primitivePath] = primitive
 
-        # Pop path name
-        path = prevPath    
+    @staticmethod
+    def computeGridLayout(materialCount, rowCount=10, spacing=2.5) -> list:
+        '''
+        @brief Compute the translations of the nodes created for each material by createPrimsForMaterials().
+        Material 0 uses the existing nodes. Material 1 is placed one spacing along X, and a new row
+        is started after each material whose index plus one is a multiple of rowCount.
+        @param materialCount: The number of materials.
+        @param rowCount: The number of materials per row.
+        @param spacing: The distance between rows and columns.
+        @return List of [x, y, 0] translations indexed by material. The entry for material 0 is None.
+        '''
+        translations = [ None ]
+        for materialId in range(1, materialCount):
+            # Number of rows started before this material
+            row = materialId // rowCount if rowCount > 1 else materialId - 1
+            column = materialId - row * rowCount if rowCount > 1 else (1 if materialId == 1 else 0)
+            translations.append([spacing * column, spacing * row, 0])
+        return translations
 
-    def createPrimsForMaterials(self, gltfJson, rowCount=10) -> None:
+    def createPrimsForMaterials(self, gltfJson, rowCount=10, spacing=2.5) -> None:
         '''
         @brief Create new meshes and nodes for each material in a glTF document.
+        New meshes share the attributes, indices and other properties of the original
+        mesh primitives by reference. Only the primitive material and mesh name differ.
         @param gltfJson: The glTF document to create new meshes and nodes for.
         @param rowCount: The number of meshes per row to create.
+        @param spacing: The distance between rows and columns of meshes.
         @return None
         '''
         if not 'materials' in gltfJson:
@@ -1632,36 +4554,33 @@ class MTLX2GLTFWriter:
             meshes = gltfJson['meshes']
 
         MESH_POSTFIX = '_material_'
-        translationX = 2.5
-        translationY = 0.0
+        translations = self.computeGridLayout(materialCount, rowCount, spacing)
+        sourceMeshes = [ mesh for mesh in meshes if 'primitives' in mesh ]
 
         meshCopies = []
         meshIndex = len(meshes) - 1 
         nodeCopies = []
         for materialId in range(1, materialCount):
-            for mesh in meshes:
-                if 'primitives' in mesh:
-                    meshCopy = copy.deepcopy(mesh)
-                    primitivesCopy = meshCopy['primitives']
-                    for primitiveCopy in primitivesCopy:
-                        # Overwrite the material for each prim
-                        primitiveCopy['material'] = materialId
-                    
-                    meshCopy['name'] = mesh['name'] + MESH_POSTFIX + str(materialId)
-                    meshCopies.append(meshCopy)
-                    meshIndex = meshIndex + 1
-
-                    newNode = {}
-                    newNode['name'] = meshCopy['name']
-                    newNode['mesh'] = meshIndex
-                    newNode['translation'] = [translationX, translationY, 0]
-                    nodeCopies.append(newNode)
-
-            materialId = materialId + 1
-            translationX = translationX + 2.5
-            if materialId % rowCount == 0:
-                translationX = 0.0
-                translationY = translationY + 2.5
+            translation = translations[materialId]
+            for mesh in sourceMeshes:
+                # Copy only the mesh and primitive dictionaries and overwrite the material for each prim
+                meshCopy = dict(mesh)
+                primitivesCopy = []
+                for primitive in mesh['primitives']:
+                    primitiveCopy = dict(primitive)
+                    primitiveCopy['material'] = materialId
+                    primitivesCopy.append(primitiveCopy)
+                meshCopy['primitives'] = primitivesCopy
+                
+                meshCopy['name'] = mesh['name'] + MESH_POSTFIX + str(materialId)
+                meshCopies.append(meshCopy)
+                meshIndex = meshIndex + 1
+
+                newNode = {}
+                newNode['name'] = meshCopy['name']
+                newNode['mesh'] = meshIndex
+                newNode['translation'] = list(translation)
+                nodeCopies.append(newNode)
 
         meshes.extend(meshCopies)
         nodeCount = len(nodes)
@@ -1670,10 +4589,54 @@ class MTLX2GLTFWriter:
         for i in range(nodeCount, len(nodes)):
             scenenodes.append(i)                
 
+    @staticmethod
+    def prependGeomPrefix(prefix, geomString) -> str:
+        '''
+        @brief Prepend a geometry prefix to each path of a geometry string.
+        @param prefix: The prefix to prepend.
+        @param geomString: The comma separated geometry string.
+        @return The prefixed geometry string.
+        '''
+        if not prefix or not geomString:
+            return geomString
+        return ','.join(prefix + geomPath for geomPath in geomString.split(','))
+
+    def matchCollection(self, collection, sceneIndex, collectionEntries=None) -> set:
+        '''
+        @brief Find the primitive entries matched by a MaterialX collection.
+        A primitive is matched if it is matched by the included geometry or by an included collection,
+        and is not matched by the excluded geometry.
+        @param collection: The MaterialX collection to match.
+        @param sceneIndex: The GLTFSceneIndex of the glTF document to match against.
+        @param collectionEntries: Optional dictionary of collection path to matched entries used to cache matches.
+        @return Set of primitive entries.
+        '''
+        collectionPath = collection.getNamePath()
+        if collectionEntries is not None and collectionPath in collectionEntries:
+            return collectionEntries[collectionPath]
+
+        entries = set()
+        if collection.hasIncludeCycle():
+            self.log('Collection has an include cycle: ' + collectionPath)
+        else:
+            prefix = collection.getActiveGeomPrefix()
+            entries = sceneIndex.matchGeomString(self.prependGeomPrefix(prefix, collection.getIncludeGeom()))
+            for includeCollection in collection.getIncludeCollections():
+                entries |= self.matchCollection(includeCollection, sceneIndex, collectionEntries)
+            if collection.hasExcludeGeom():
+                entries -= sceneIndex.matchGeomString(self.prependGeomPrefix(prefix, collection.getExcludeGeom()))
+
+        if collectionEntries is not None:
+            collectionEntries[collectionPath] = entries
+        return entries
+
     def assignMaterial(self, doc, gltfJson) -> None:
         '''
         @brief Assign materials to meshes based on MaterialX looks (material assginments).
-        The assignment is performed based on matching the MaterialX geometry paths to the glTF mesh primitive paths.
+        The assignment is performed by matching the geometry and collection of each material assignment
+        against the glTF mesh primitive paths. A path matches all primitives at or below it. The
+        universal path and wildcards within path components are supported. Assignments are applied
+        in look order, so later assignments take precedence.
         @param doc: The MaterialX document containing looks.
         @param gltfJson: The glTF document to assign materials to.
         '''
@@ -1696,15 +4659,9 @@ class MTLX2GLTFWriter:
             self.log('No scenes in gltfJson')
             return
 
-        primPaths : dict = {}
-        for scene in gltfJson['scenes']:
-            nodeCount = 0
-            meshCount = 0
-            path = ''
-            for nodeIndex in scene['nodes']:
-                node = nodes[nodeIndex]
-                self.buildPrimPaths(primPaths, node, path, nodeCount, meshCount, meshes, nodes)
-        if not primPaths:
+        sceneIndex = GLTFSceneIndex(gltfJson)
+        primitives = sceneIndex.getPrimitives()
+        if not primitives:
             return
         
         # Build a dictionary of material name to material array index
@@ -1714,28 +4671,32 @@ class MTLX2GLTFWriter:
             if 'name' in gltfmaterial:
                 matName = MTLX_MATERIAL_PREFIX + gltfmaterial['name']
                 materialIndexes[matName] = index
-
-        # Scan through assignments in looks in order
-        # if the materialname matches a meshhes' material name, then assign the material index to the mesh
+        # Materials removed as duplicates are assigned the material kept
+        for alias, name in self.getMaterialAliases().items():
+            if MTLX_MATERIAL_PREFIX + name in materialIndexes:
+                materialIndexes[MTLX_MATERIAL_PREFIX + alias] = materialIndexes[MTLX_MATERIAL_PREFIX + name]
+
+        # Scan through assignments in looks in order and assign the material index to
+        # all mesh primitives matched by the assignment geometry or collection
+        collectionEntries = {}
         for look in doc.getLooks():
             materialAssigns = look.getMaterialAssigns()        
             for materialAssign in materialAssigns:
                 materialName = materialAssign.getMaterial()
                 if materialName in materialIndexes:
                     materialIndex = materialIndexes[materialName]
-                    geomString = materialAssign.getGeom()
-                    geomlist = geomString.split(',')
-
-                    # Scan geometry list with primitive paths
-                    for geomlistitem in geomlist:
-                        if geomlistitem in primPaths:
-                            prim = primPaths[geomlistitem]
-                            if prim: 
-                                self.log('assign material: ' + materialName + ' to mesh path: ' + geomlistitem)
-                                prim['material'] = materialIndex
-                                break
+                    geomString = self.prependGeomPrefix(materialAssign.getActiveGeomPrefix(), materialAssign.getGeom())
+                    entries = sceneIndex.matchGeomString(geomString)
+                    collection = materialAssign.getCollection()
+                    if collection:
+                        entries |= self.matchCollection(collection, sceneIndex, collectionEntries)
+
+                    for entry in entries:
+                        primitives[entry]['material'] = materialIndex
+                    if entries:
+                        self.log('assign material: ' + materialName + ' to %d mesh primitives' % len(entries))
                 else:
-                    self.log('Cannot find material: ' + materialName + 'in scene materials' + materialIndexes)
+                    self.log('Cannot find material: ' + materialName + ' in scene materials')
 
 
     def writeImageProperties(self, texture, samplers, imageNode) -> None:
@@ -1851,7 +4812,7 @@ class MTLX2GLTFWriter:
         @brief Write a float input from a MaterialX pbr node to a glTF material entry.
         @param pbrNode: The MaterialX pbr node to examine.
         @param inputName: The name of the input on the pbr node
-        @param gltfTextureName: The name of the texture entry to write to.
+        @param gltfTextureName: The name of the texture entry to write to. If empty, only a value is written.
         @param gltfValueName: The name of the value entry to write
         @param material: The glTF material entry to write to.
         @param textures: The list of textures to append new textures to.
@@ -1861,12 +4822,10 @@ class MTLX2GLTFWriter:
         '''
         filename = EMPTY_STRING
 
-        imageNode = pbrNode.getConnectedNode(inputName)
+        shaderIndex = self._getShaderIndex()
+        imageNode = shaderIndex.getConnectedNode(pbrNode, inputName) if gltfTextureName else None
         if imageNode:
-            fileInput = imageNode.getInput(mx.Implementation.FILE_ATTRIBUTE)
-            filename = ''
-            if fileInput and fileInput.getAttribute(mx.TypedElement.TYPE_ATTRIBUTE) == mx.FILENAME_TYPE_STRING:
-                filename = fileInput.getResolvedValueString()
+            filename = shaderIndex.getFileName(imageNode)
             if len(filename) == 0:
                 imageNode = None
 
@@ -1881,12 +4840,12 @@ class MTLX2GLTFWriter:
             self.writeImageProperties(texture, samplers, imageNode)
 
         else:
-            value = pbrNode.getInputValue(inputName)
+            value = shaderIndex.getInputValue(pbrNode, inputName)
             if value != None:
-                nodedef = pbrNode.getNodeDef()
+                nodedef = shaderIndex.getNodeDef(pbrNode)
                 # Don't write default values, unless specified
                 writeDefaultInputs= self._options['writeDefaultInputs']
-                if nodedef and (writeDefaultInputs or nodedef.getInputValue(inputName) != value):
+                if nodedef and (writeDefaultInputs or shaderIndex.getInputDefault(pbrNode, inputName) != value):
                     if remapper:
                         if value in remapper:
                             material[gltfValueName] = remapper[value]
@@ -1902,7 +4861,7 @@ class MTLX2GLTFWriter:
         @brief Write a color3 input from a MaterialX pbr node to a glTF material entry.
         @param pbrNode: The MaterialX pbr node to examine.
         @param inputName: The name of the input on the pbr node
-        @param gltfTextureName: The name of the texture entry to write to.
+        @param gltfTextureName: The name of the texture entry to write to. If empty, only a value is written.
         @param gltfValueName: The name of the value entry to write
         @param material: The glTF material entry to write to.
         @param textures: The list of textures to append new textures to.
@@ -1912,12 +4871,10 @@ class MTLX2GLTFWriter:
 
         filename = EMPTY_STRING
 
-        imageNode = pbrNode.getConnectedNode(inputName)
+        shaderIndex = self._getShaderIndex()
+        imageNode = shaderIndex.getConnectedNode(pbrNode, inputName) if gltfTextureName else None
         if imageNode:
-            fileInput = imageNode.getInput(mx.Implementation.FILE_ATTRIBUTE)
-            filename = ''
-            if fileInput and fileInput.getAttribute(mx.TypedElement.TYPE_ATTRIBUTE) == mx.FILENAME_TYPE_STRING:
-                filename = fileInput.getResolvedValueString()
+            filename = shaderIndex.getFileName(imageNode)
             if len(filename) == 0:
                 imageNode = None
 
@@ -1933,14 +4890,291 @@ class MTLX2GLTFWriter:
 
             self.writeImageProperties(texture, samplers, imageNode)
         else:
-            value = pbrNode.getInputValue(inputName)
+            value = shaderIndex.getInputValue(pbrNode, inputName)
             if value:
-                nodedef = pbrNode.getNodeDef()
+                nodedef = shaderIndex.getNodeDef(pbrNode)
                 # Don't write default values
                 writeDefaultInputs= self._options['writeDefaultInputs']
-                if nodedef and (writeDefaultInputs or nodedef.getInputValue(inputName) != value):
+                if nodedef and (writeDefaultInputs or shaderIndex.getInputDefault(pbrNode, inputName) != value):
                     material[gltfValueName] = [ value[0], value[1], value[2] ]
 
+    def writeNormalInput(self, pbrNode, inputName, gltfTextureName, gltfValueName, material, textures, images, samplers):
+        '''
+        @brief Write a normal input from a MaterialX pbr node to a glTF material entry.
+        Only a texture is written, read past any normalmap node connected to the input.
+        @param pbrNode: The MaterialX pbr node to examine.
+        @param inputName: The name of the input on the pbr node
+        @param gltfTextureName: The name of the texture entry to write to.
+        @param gltfValueName: Unused, as normals have no value entry.
+        @param material: The glTF material entry to write to.
+        @param textures: The list of textures to append new textures to.
+        @param images: The list of images to append new images to.
+        @param samplers: The list of samplers to append new samplers to.
+        '''
+        filename = EMPTY_STRING
+
+        shaderIndex = self._getShaderIndex()
+        imageNode = shaderIndex.getConnectedNode(pbrNode, inputName)
+        if imageNode:
+            # Read past normalmap node
+            if imageNode.getCategory() == 'normalmap':
+                imageNode = shaderIndex.getConnectedNode(imageNode, IN_STRING)
+            if imageNode:
+                filename = shaderIndex.getFileName(imageNode)
+                if len(filename) == 0:
+                    imageNode = None
+
+        if imageNode:
+            texture = {}
+            self.initialize_gtlf_texture(texture, imageNode.getNamePath(), filename, images)
+            textures.append(texture)
+
+            material[gltfTextureName]  = {}
+            material[gltfTextureName]['index'] = len(textures) - 1
+
+            self.writeImageProperties(texture, samplers, imageNode)
+
+    def compileInputMappings(self, nodedef) -> list:
+        '''
+        @brief Compile GLTF_PBR_INPUT_MAPPINGS for a shader definition.
+        The type of each input is taken from the definition, or from the mapping if the definition does not
+        have the input, and selects the method used to write the input. Inputs which are not of type
+        float, integer, color3 or vector3 are skipped.
+        @param nodedef: The definition of the shader nodes to write. May be None.
+        @return List of (extension name, procedural input, inputs) where each input is given as
+        (write method, input name, texture property, factor property, value remapping).
+        '''
+        writeMethods = { MTLX_FLOAT_STRING : self.writeFloatInput, 'integer' : self.writeFloatInput,
+                         'color3' : self.writeColor3Input, 'vector3' : self.writeNormalInput }
+        plan = []
+        for mapping in GLTF_PBR_INPUT_MAPPINGS:
+            inputs = []
+            for inputMapping in mapping['inputs']:
+                inputName, inputType, textureProperty, factorProperty = inputMapping[:4]
+                remapper = inputMapping[4] if len(inputMapping) > 4 else None
+                nodedefInput = nodedef.getActiveInput(inputName) if nodedef else None
+                if nodedefInput:
+                    inputType = nodedefInput.getType()
+                writeMethod = writeMethods.get(inputType)
+                if writeMethod:
+                    inputs.append((writeMethod, inputName, textureProperty, factorProperty, remapper))
+            if inputs:
+                plan.append((mapping['extension'], mapping.get('procedural'), inputs))
+        return plan
+
+    def writeInputMappings(self, pbrNode, plan, gltfJson, material, extensions, materials, textures, images, samplers):
+        '''
+        @brief Write the inputs of a MaterialX pbr node using compiled input mappings.
+        @param pbrNode: The MaterialX pbr node to examine.
+        @param plan: The mappings compiled for the node definition using compileInputMappings().
+        @param gltfJson: The glTF document to write to.
+        @param material: The glTF material entry to write to.
+        @param extensions: The extensions entry to write extensions to.
+        @param materials: The list of glTF materials.
+        @param textures: The list of textures to append new textures to.
+        @param images: The list of images to append new images to.
+        @param samplers: The list of samplers to append new samplers to.
+        '''
+        extensionsUsed = gltfJson['extensionsUsed']
+        for extensionName, procedural, inputs in plan:
+            if procedural and self.writeProceduralInput(pbrNode, procedural[0], procedural[1], gltfJson, extensions, materials, textures, images, samplers):
+                continue
+
+            outputExtension = {} if extensionName else material
+            for writeMethod, inputName, textureProperty, factorProperty, remapper in inputs:
+                if remapper:
+                    writeMethod(pbrNode, inputName, textureProperty, factorProperty, outputExtension, textures, images, samplers, remapper)
+                else:
+                    writeMethod(pbrNode, inputName, textureProperty, factorProperty, outputExtension, textures, images, samplers)
+            if extensionName and len(outputExtension) > 0:
+                if extensionName not in extensionsUsed:
+                    extensionsUsed.append(extensionName)
+                extensions[extensionName] = outputExtension
+
+    def writeProceduralInput(self, pbrNode, inputName, textureProperty, gltfJson, extensions, materials, textures, images, samplers) -> bool:
+        '''
+        @brief Write an input connected to a node graph using the KHR_procedurals extension. WIP
+        @param pbrNode: The MaterialX pbr node to examine.
+        @param inputName: The name of the input on the pbr node.
+        @param textureProperty: The name of the property to write the procedural index to.
+        @param gltfJson: The glTF document to write to.
+        @param extensions: The extensions entry to write the extension to.
+        @param materials: The list of glTF materials.
+        @param textures: The list of textures to append new textures to.
+        @param images: The list of images to append new images to.
+        @param samplers: The list of samplers to append new samplers to.
+        @return True if the input is connected to a node graph, otherwise False.
+        '''
+        shaderIndex = self._getShaderIndex()
+        imageNode = shaderIndex.getConnectedNode(pbrNode, inputName)
+        imageGraph = None
+        if imageNode:
+            if imageNode.getParent().isA(mx.NodeGraph):
+                imageGraph = imageNode.getParent()
+        if not imageGraph:
+            return False
+
+        extensionsUsed = gltfJson['extensionsUsed']
+        extensionName = 'KHR_procedurals'
+        if  extensionName not in extensionsUsed:
+            extensionsUsed.append(extensionName)   
+        if extensionName not in extensions:                          
+            extensions[extensionName] = {}
+        outputExtension = extensions[extensionName]                
+
+        with self._profilePhase('graphToJson'):
+            graphOutputs, procDict = self.graphToJson(imageGraph, gltfJson, materials, textures, images, samplers)
+        outputs = imageGraph.getOutputs()
+        if len(outputs) > 0:
+            connectionName = outputs[0].getNamePath()
+            graphInput = shaderIndex.getInput(pbrNode, inputName)
+            outputSpecifier = graphInput.getAttribute('output')
+            if len(outputSpecifier) > 0:            
+                connectionName = imageGraph.getNamePath() + '/' + outputSpecifier
+            outputExtension[textureProperty] = procDict[connectionName]
+        return True
+
+    def _getTextureReferences(self, value, references, isTextureInfo=False):
+        # Texture info entries are the values of '...Texture' properties. Procedurals reference textures using 'texture'.
+        if isinstance(value, dict):
+            for key, item in value.items():
+                if isinstance(item, int) and ((isTextureInfo and key == 'index') or key == 'texture'):
+                    references.append((value, key))
+                else:
+                    self._getTextureReferences(item, references, key.endswith('Texture'))
+        elif isinstance(value, list):
+            for item in value:
+                self._getTextureReferences(item, references)
+        return references
+
+    def getMaterialKey(self, material, gltfJson) -> str:
+        '''
+        @brief Get a hash of the content of a glTF material.
+        The name of the material is ignored and each texture reference is replaced by the texture, image
+        and sampler referenced, without their names. Materials which only differ by name, or which reference
+        different texture entries for the same image and sampler, have the same key.
+        @param material: The glTF material to hash.
+        @param gltfJson: The glTF document containing the material.
+        @return The hash as a hexadecimal string.
+        '''
+        textures = gltfJson.get('textures', [])
+        images = gltfJson.get('images', [])
+        samplers = gltfJson.get('samplers', [])
+
+        content = copy.deepcopy(material)
+        content.pop('name', None)
+        for parent, key in self._getTextureReferences(content, []):
+            index = parent[key]
+            if index < len(textures):
+                texture = { k : v for k, v in textures[index].items() if k != 'name' }
+                if 'source' in texture and texture['source'] < len(images):
+                    texture['source'] = { k : v for k, v in images[texture['source']].items() if k != 'name' }
+                if 'sampler' in texture and texture['sampler'] < len(samplers):
+                    texture['sampler'] = samplers[texture['sampler']]
+                parent[key] = texture
+        return hashlib.sha1(json.dumps(content, sort_keys=True).encode('utf-8')).hexdigest()
+
+    def deduplicateMaterials(self, gltfJson) -> int:
+        '''
+        @brief Remove materials with the same content as a previous material.
+        Material indices of mesh primitives are remapped to the material kept, and textures, images and samplers
+        which were only referenced by removed materials are removed. The names of removed materials are
+        kept as aliases of the material kept, which are used by assignMaterial().
+        @param gltfJson: The glTF document to update.
+        @return The number of materials removed.
+        '''
+        self._materialAliases = {}
+        materials = gltfJson.get('materials', [])
+        materialIndexes = []
+        keptMaterials = []
+        removedMaterials = []
+        keyIndexes = {}
+        for material in materials:
+            key = self.getMaterialKey(material, gltfJson)
+            if key in keyIndexes:
+                keptMaterial = keptMaterials[keyIndexes[key]]
+                if 'name' in material and 'name' in keptMaterial:
+                    self._materialAliases[material['name']] = keptMaterial['name']
+                removedMaterials.append(material)
+            else:
+                keyIndexes[key] = len(keptMaterials)
+                keptMaterials.append(material)
+            materialIndexes.append(keyIndexes[key])
+
+        removedCount = len(removedMaterials)
+        if removedCount == 0:
+            return 0
+        gltfJson['materials'] = keptMaterials
+        self._count('duplicateMaterials', removedCount)
+
+        for mesh in gltfJson.get('meshes', []):
+            for primitive in mesh.get('primitives', []):
+                index = primitive.get('material')
+                if isinstance(index, int) and index < len(materialIndexes):
+                    primitive['material'] = materialIndexes[index]
+
+        # Remove textures which are now unreferenced, and then images and samplers which are now unreferenced
+        textures = gltfJson.get('textures', [])
+        references = self._getTextureReferences(keptMaterials, [])
+        references = self._getTextureReferences(gltfJson.get('extensions', {}), references)
+        usedTextures = set(parent[key] for parent, key in references)
+        removedTextures = set(parent[key] for parent, key in self._getTextureReferences(removedMaterials, []))
+        removedTextures -= usedTextures
+        if removedTextures:
+            textureIndexes = {}
+            keptTextures = []
+            for index, texture in enumerate(textures):
+                if index not in removedTextures:
+                    textureIndexes[index] = len(keptTextures)
+                    keptTextures.append(texture)
+            for parent, key in references:
+                if parent[key] in textureIndexes:
+                    parent[key] = textureIndexes[parent[key]]
+            gltfJson['textures'] = keptTextures
+
+            images = gltfJson.get('images', [])
+            usedImages = set(texture['source'] for texture in keptTextures if 'source' in texture)
+            removedImages = set(textures[index]['source'] for index in removedTextures if 'source' in textures[index])
+            removedImages -= usedImages
+            if removedImages:
+                imageIndexes = {}
+                keptImages = []
+                for index, image in enumerate(images):
+                    if index not in removedImages:
+                        imageIndexes[index] = len(keptImages)
+                        keptImages.append(image)
+                for texture in keptTextures:
+                    if 'source' in texture and texture['source'] in imageIndexes:
+                        texture['source'] = imageIndexes[texture['source']]
+                gltfJson['images'] = keptImages
+
+            samplers = gltfJson.get('samplers', [])
+            usedSamplers = set(texture['sampler'] for texture in keptTextures if 'sampler' in texture)
+            removedSamplers = set(textures[index]['sampler'] for index in removedTextures if 'sampler' in textures[index])
+            removedSamplers -= usedSamplers
+            if removedSamplers:
+                samplerIndexes = {}
+                keptSamplers = []
+                for index, sampler in enumerate(samplers):
+                    if index not in removedSamplers:
+                        samplerIndexes[index] = len(keptSamplers)
+                        keptSamplers.append(sampler)
+                for texture in keptTextures:
+                    if 'sampler' in texture and texture['sampler'] in samplerIndexes:
+                        texture['sampler'] = samplerIndexes[texture['sampler']]
+                if keptSamplers:
+                    gltfJson['samplers'] = keptSamplers
+                else:
+                    del gltfJson['samplers']
+
+        return removedCount
+
+    def getMaterialAliases(self) -> dict:
+        '''
+        @brief Get the names of the materials removed as duplicates by the last conversion.
+        @return Dictionary of removed material name to the name of the material kept.
+        '''
+        return self._materialAliases if self._materialAliases is not None else {}
 
     def writeCopyright(self, doc, gltfJson):
         '''
@@ -1960,40 +5194,38 @@ class MTLX2GLTFWriter:
     def materialX2glTF(self, doc, gltfJson, resetMaterials):
         '''
         @brief Convert a MaterialX document to glTF.
+        The document is indexed once and shader inputs, upstream nodes and file names are
+        read from the index while writing materials.
         @param doc: The MaterialX document to convert.
         @param gltfJson: The glTF document to write to.
         @param resetMaterials: Whether to clear any existing glTF materials.
-        '''        
-        pbrNodes = {}
-        unlitNodes = {}
-
-        addInputsFromNodeDef = self._options['writeDefaultInputs']
-
-        for material in doc.getMaterialNodes():
-            shaderNodes = mx.getShaderNodes(material)
-            for shaderNode in shaderNodes:
-                category = shaderNode.getCategory()
-                path = shaderNode.getNamePath()
-                if category == MTLX_GLTF_PBR_CATEGORY and path not in pbrNodes:
-                    if addInputsFromNodeDef:
-                        hasNormal = shaderNode.getInput('normal')
-                        hasTangent = shaderNode.getInput('tangent')
-                        shaderNode.addInputsFromNodeDef()
-                        if not hasNormal:
-                            shaderNode.removeChild('tangent')
-                        if not hasTangent:
-                            shaderNode.removeChild('normal')
-                    pbrNodes[path] = shaderNode
-                elif category == MTLX_UNLIT_CATEGORY_STRING and path not in unlitNodes:
-                    if addInputsFromNodeDef:
-                        hasNormal = shaderNode.getInput('normal')
-                        hasTangent = shaderNode.getInput('tangent')
-                        shaderNode.addInputsFromNodeDef()
-                        if not hasNormal:
-                            shaderNode.removeChild('tangent')
-                        if not hasTangent:
-                            shaderNode.removeChild('normal')                        
-                    unlitNodes[path] = shaderNode
+        '''
+        self._materialAliases = {}
+        self._shaderIndex = MaterialXShaderIndex(doc)
+        try:
+            self._writeMaterials(doc, gltfJson, resetMaterials)
+        finally:
+            self._shaderIndex = None
+
+        if self._options['deduplicateMaterials'] and not self.isCancelled():
+            with self._profilePhase('deduplicateMaterials'):
+                self.deduplicateMaterials(gltfJson)
+
+    def _writeMaterials(self, doc, gltfJson, resetMaterials):
+        shaderIndex = self._shaderIndex
+        pbrNodes = shaderIndex.getShaderNodes(MTLX_GLTF_PBR_CATEGORY)
+        unlitNodes = shaderIndex.getShaderNodes(MTLX_UNLIT_CATEGORY_STRING)
+
+        # Inputs are added before the index caches any lookups
+        if self._options['writeDefaultInputs']:
+            for shaderNode in list(pbrNodes.values()) + list(unlitNodes.values()):
+                hasNormal = shaderNode.getInput('normal')
+                hasTangent = shaderNode.getInput('tangent')
+                shaderNode.addInputsFromNodeDef()
+                if not hasNormal:
+                    shaderNode.removeChild('tangent')
+                if not hasTangent:
+                    shaderNode.removeChild('normal')
 
         materials_count = len(pbrNodes) + len(unlitNodes)
         if materials_count == 0:
@@ -2033,145 +5265,34 @@ class MTLX2GLTFWriter:
         # Write materials
         #
         COLOR_SEMANTIC = 'color'
+        # Input mappings compiled per shader definition
+        mappingPlans = {}
         
         for name in unlitNodes:
-            material = {}
-
-            unlitExtension = 'KHR_materials_unlit'
-            if not unlitExtension in extensionsUsed:
-                extensionsUsed.append(unlitExtension)
-            mat_extensions = material['extensions'] = {}
-            mat_extensions[unlitExtension] = {}
-            
-            unlitNode = unlitNodes[name]
-            material['name'] = name
-            roughness = material['pbrMetallicRoughness'] = {}
-
-            base_color_set = False
-            base_color = [ 1.0, 1.0, 1.0, 1.0 ]
-
-            imageNode = unlitNode.getConnectedNode('emission_color')
-            filename = ''
-            if imageNode:                         
-                fileInput = imageNode.getInput(mx.Implementation.FILE_ATTRIBUTE)
-                if fileInput and fileInput.getAttribute(mx.TypedElement.TYPE_ATTRIBUTE) == mx.FILENAME_TYPE_STRING:
-                    filename = fileInput.getResolvedValueString() 
-                                        
-            if len(filename) == 0:
-                imageNode = None
-
-            if imageNode:
-                texture = {}
-                self.initialize_gtlf_texture(texture, imageNode.getNamePath(), filename, images)
-                textures.append(texture)
-
-                roughness['baseColorTexture'] = {}
-                roughness['baseColorTexture']['index'] = len(textures) - 1
-
-                self.writeImageProperties(texture, samplers, imageNode)
-
-                # Pull off color from gltf_colorImage node
-                color = unlitNode.getInputValue('emission_color')
-                if color:
-                    base_color[0] = color[0]
-                    base_color[1] = color[1]
-                    base_color[2] = color[2]
-                    base_color_set = True
-            
-            else:
-                color = unlitNode.getInputValue('emission_color')
-                if color:
-                    base_color[0] = color[0]
-                    base_color[1] = color[1]
-                    base_color[2] = color[2]
-                    base_color_set = True
-
-                value = unlitNode.getInputValue('opacity')
-                if value:
-                    base_color[3] = value
-                    base_color_set = True
-
-            if base_color_set:
-                roughness['baseColorFactor'] = base_color        
-
-            if base_color_set:
-                roughness['baseColorFactor'] = base_color
-
-            materials.append(material)
-
-        for name in pbrNodes:
-            material = {}
+            if self.isCancelled():
+                self.log('Conversion cancelled')
+                return
+            with self._profilePhase('material', name):
+                self._count('materials')
+                material = {}
+
+                unlitExtension = 'KHR_materials_unlit'
+                if not unlitExtension in extensionsUsed:
+                    extensionsUsed.append(unlitExtension)
+                mat_extensions = material['extensions'] = {}
+                mat_extensions[unlitExtension] = {}
             
-            # Setup extensions list
-            extensions = None
-            if not 'extensions' in material:
-                material['extensions'] = {}
-            extensions = material['extensions']
-                
-            pbrNode = pbrNodes[name]
-            if self._options['debugOutput']:
-                print('- Convert MaterialX node to glTF:', pbrNode.getNamePath())
-
-            # Set material name
-            material['name'] = name
-
-            # Handle PBR metallic roughness
-            # -----------------------------
-            roughness = material['pbrMetallicRoughness'] = {}
+                unlitNode = unlitNodes[name]
+                material['name'] = name
+                roughness = material['pbrMetallicRoughness'] = {}
 
-            #  Handle base color
-            base_color = [ 1.0, 1.0, 1.0, 1.0 ]
-            base_color_set = False
+                base_color_set = False
+                base_color = [ 1.0, 1.0, 1.0, 1.0 ]
 
-            filename = ''
-            imageNode = pbrNode.getConnectedNode('base_color')
-            imageGraph = None
-            if self._options['createProceduralTextures']:
-                if imageNode:
-                    if imageNode.getParent().isA(mx.NodeGraph):
-                        imageGraph = imageNode.getParent()
-
-            if imageGraph:
-                if self._options['debugOutput']:
-                    print('- Generate KHR procedurals for graph: ' + imageGraph.getName())
-                self.log('- Generate KHR procedurals for graph: ' + imageGraph.getName())
-                #dest = mx.createDocument()
-                #removeInternals = False
-                #copyGraphInterfaces(dest, imageGraph, removeInternals)
-
-                extensionName = 'KHR_procedurals'
-                if  extensionName not in extensionsUsed:
-                    extensionsUsed.append(extensionName)             
-                #if extensionName not in extensions:                          
-                #    extensions[extensionName] = {}
-                #outputExtension = extensions[extensionName]                
-
-                #jsonGraph = documentToJSON(imageGraph)
-                graphOutputs, procDict = self.graphToJson(imageGraph, gltfJson, materials, textures, images, samplers)
-                outputs = imageGraph.getOutputs()
-                if len(outputs) > 0:
-                    connectionName = outputs[0].getNamePath()
-                    inputBaseColor = pbrNode.getInput('base_color')
-                    outputSpecifier = inputBaseColor.getAttribute('output')
-                    if len(outputSpecifier) > 0:            
-                        connectionName = imageGraph.getNamePath() + '/' + outputSpecifier
-
-                    # Add extension to texture entry
-                    baseColorEntry = roughness['baseColorTexture'] = {}
-                    baseColorEntry['index'] = 0 # Q: What should this be ?
-                    if 'extensions' not in baseColorEntry:
-                        baseColorEntry['extensions'] = {}
-                    extensions = baseColorEntry['extensions']
-                    if extensionName not in extensions:                          
-                        extensions[extensionName] = {}
-                    procExtensions = extensions[extensionName]                
-                    procExtensions['index'] = procDict[connectionName]
-
-            else:            
+                imageNode = shaderIndex.getConnectedNode(unlitNode, 'emission_color')
+                filename = ''
                 if imageNode:                         
-                    fileInput = imageNode.getInput(mx.Implementation.FILE_ATTRIBUTE)
-                    if fileInput and fileInput.getAttribute(mx.TypedElement.TYPE_ATTRIBUTE) == mx.FILENAME_TYPE_STRING:
-                        filename = fileInput.getResolvedValueString() 
+                    filename = shaderIndex.getFileName(imageNode)
                                         
                 if len(filename) == 0:
                     imageNode = None
@@ -2187,439 +5308,369 @@ class MTLX2GLTFWriter:
                     self.writeImageProperties(texture, samplers, imageNode)
 
                     # Pull off color from gltf_colorImage node
-                    color = pbrNode.getInputValue('base_color')
+                    color = shaderIndex.getInputValue(unlitNode, 'emission_color')
                     if color:
                         base_color[0] = color[0]
                         base_color[1] = color[1]
                         base_color[2] = color[2]
                         base_color_set = True
-                
+            
                 else:
-                    color = pbrNode.getInputValue('base_color')
+                    color = shaderIndex.getInputValue(unlitNode, 'emission_color')
                     if color:
                         base_color[0] = color[0]
                         base_color[1] = color[1]
                         base_color[2] = color[2]
                         base_color_set = True
 
-                    value = pbrNode.getInputValue('alpha')
+                    value = shaderIndex.getInputValue(unlitNode, 'opacity')
                     if value:
                         base_color[3] = value
                         base_color_set = True
 
                 if base_color_set:
-                    roughness['baseColorFactor'] = base_color 
-            
-            # Handle metallic, roughness, occlusion
-            # Handle partially mapped or when different channels map to different images
-            # by merging into a single ORM image. Note that we save as BGR 24-bit fixed images
-            # thus we scan by that order which results in an MRO image being written to disk.
-            #roughness['metallicRoughnessTexture'] = {}
-            metallicFactor = pbrNode.getInputValue('metallic')
-            #if metallicFactor:
-            #    roughness['metallicFactor'] = metallicFactor
-            #    print('------------------------ set metallic', roughness['metallicFactor'],
-            #          ' node:', pbrNode.getNamePath())
-            #roughnessFactor = pbrNode.getInputValue('roughness')
-            #if roughnessFactor:        
-            #    roughness['roughnessFactor'] = roughnessFactor
-            extractInputs = [ 'metallic', 'roughness', 'occlusion' ]
-            filenames = [ EMPTY_STRING, EMPTY_STRING, EMPTY_STRING ]
-            imageNamePaths = [ EMPTY_STRING, EMPTY_STRING, EMPTY_STRING ]
-            roughnessInputs = [ 'metallicFactor', 'roughnessFactor', '' ]
-
-            IN_STRING = MTLX_IN_STRING
-            ormNode= None
-            imageNode = None
-            extractCategory = 'extract'
-            for e in range(0, 3):
-                inputName = extractInputs[e]
-                pbrInput = pbrNode.getInput(inputName)
-                if pbrInput:
-                    # Read past any extract node
-                    connectedNode = pbrNode.getConnectedNode(inputName)
-                    if connectedNode:
-                        if connectedNode.getCategory() == extractCategory:
-                            imageNode = connectedNode.getConnectedNode(IN_STRING)
-                        else:
-                            imageNode = connectedNode
-
-                    if imageNode:
-                        fileInput = imageNode.getInput(mx.Implementation.FILE_ATTRIBUTE)                    
-                        filename = EMPTY_STRING
-                        if fileInput and fileInput.getAttribute(mx.TypedElement.TYPE_ATTRIBUTE) == mx.FILENAME_TYPE_STRING:
-                            filename = fileInput.getResolvedValueString()  
-                        filenames[e] = filename
-                        imageNamePaths[e] = imageNode.getNamePath()
-
-                    # Write out constant factors. If there is an image node
-                    # then ignore any value stored as the image takes precedence.
-                    if len(roughnessInputs[e]):
-                        value = pbrInput.getValue()
-                        if value != None:
-                            roughness[roughnessInputs[e]] = value
-                        #else:
-                        #    roughness[roughnessInputs[e]] = 1.0
-
-                # Set to default 1.0
-                #else:
-                #    if len(roughnessInputs[e]):
-                #        roughnessInputs[e] = 1.0
-
-            # Determine how many images to export and if merging is required
-            metallicFilename = mx.FilePath(filenames[0])
-            roughnessFilename = mx.FilePath(filenames[1])
-            occlusionFilename = mx.FilePath(filenames[2])
-            metallicFilename = self._options['searchPath'].find(metallicFilename)
-            roughnessFilename = self._options['searchPath'].find(roughnessFilename)
-            occlusionFilename = self._options['searchPath'].find(occlusionFilename)            
-
-            # if metallic and roughness match but occlusion differs, Then export 2 textures if found
-            if metallicFilename == roughnessFilename:
-                if roughnessFilename == occlusionFilename:
-                    # All 3 are the same:
-                    if not roughnessFilename.isEmpty():
-                        print('- Append single ORM texture', roughnessFilename.asString())
-                        texture = {}
-                        self.initialize_gtlf_texture(texture, imageNamePaths[0], roughnessFilename.asString(mx.FormatPosix), images)
-                        self.writeImageProperties(texture, samplers, imageNode)
-                        textures.append(texture)
-
-                        roughness['metallicRoughnessTexture']  = {}
-                        roughness['metallicRoughnessTexture']['index'] = len(textures) - 1
-                else:
-                    # Metallic and roughness are the same
-                    if not metallicFilename.isEmpty():
-                        print('- Append single metallic-roughness texture', metallicFilename.asString())
-                        texture = {}
-                        self.initialize_gtlf_texture(texture, imageNamePaths[0], metallicFilename.asString(mx.FormatPosix), images)
-                        self.writeImageProperties(texture, samplers, imageNode)
-                        textures.append(texture)
-
-                        roughness['metallicRoughnessTexture']  = {}
-                        roughness['metallicRoughnessTexture']['index'] = len(textures) - 1                    
+                    roughness['baseColorFactor'] = base_color        
 
-                    # Append separate occlusion texture
-                    if not occlusionFilename.isEmpty():
-                        print('- Append single occlusion texture', metallicFilename.asString())
-                        texture = {}
-                        self.initialize_gtlf_texture(texture, imageNamePaths[2], occlusionFilename.asString(mx.FormatPosix), images)
-                        self.writeImageProperties(texture, samplers, imageNode)
-                        textures.append(texture)
+                if base_color_set:
+                    roughness['baseColorFactor'] = base_color
 
-                        material['occlusionTexture']  = {}
-                        material['occlusionTexture']['index'] = len(textures) - 1                    
-
-            # Metallic and roughness do no match and one or both are images. Merge as necessary
-            elif not metallicFilename.isEmpty() or not (roughnessFilename).isEmpty():
-                loader = mx_render.StbImageLoader.create()
-                handler = mx_render.ImageHandler.create(loader)
-                handler.setSearchPath(self._options['searchPath'])
-                if handler:
-                    ormFilename = roughnessFilename if metallicFilename.isEmpty() else metallicFilename
-
-                imageWidth = 0
-                imageHeight = 0
-
-                roughnessImage = handler.acquireImage(roughnessFilename) if not roughnessFilename.isEmpty() else None
-                if roughnessImage:
-                    imageWidth = max(roughnessImage.getWidth(), imageWidth)
-                    imageHeight = max(roughnessImage.getHeight(), imageHeight)
-
-                metallicImage = handler.acquireImage(metallicFilename) if not metallicFilename.isEmpty() else None
-                if metallicImage:
-                    imageWidth = max(metallicImage.getWidth(), imageWidth)
-                    imageHeight = max(metallicImage.getHeight(), imageHeight)
-
-                outputImage = None
-                if (imageWidth * imageHeight) != 0:
-                    color = mx.Color4(0.0)
-                    outputImage = mx_render.createUniformImage(imageWidth, imageHeight, 
-                                                               3, mx_render.BaseType.UINT8, color)
-
-                    uniformRoughnessColor = 1.0
-                    if 'roughnessFactor' in roughness:
-                        uniformRoughnessColor = roughness['roughnessFactor']
-                    if roughnessImage:
-                        roughness['roughnessFactor'] = 1.0
+                materials.append(material)
 
-                    uniformMetallicColor = 1.0
-                    if 'metallicFactor' in roughness:
-                        uniformMetallicColor = roughness['metallicFactor']
-                    if metallicImage:
-                        roughness['metallicFactor'] = 1.0
-
-                    for y in range(0, imageHeight):
-                        for x in range(0, imageWidth):
-                            finalColor = outputImage.getTexelColor(x, y)
-                            finalColor[1] = roughnessImage.getTexelColor(x, y)[0] if roughnessImage else uniformRoughnessColor
-                            finalColor[2] = metallicImage.getTexelColor(x, y)[0] if metallicImage else uniformMetallicColor
-                            outputImage.setTexelColor(x, y, finalColor)
-
-                    ormFilename.removeExtension()
-                    ormfilePath = ormFilename.asString(mx.FormatPosix) + '_combined.png'
-                    flipImage = False
-                    saved = loader.saveImage(ormfilePath, outputImage, flipImage)
-
-                    uri = mx.FilePath(ormfilePath).getBaseName()
-                    print('- Merged metallic-roughness to single texture:', uri, 'Saved: ', saved)
-                    texture = {}
-                    self.initialize_gtlf_texture(texture,  imageNode.getNamePath(), uri, images)
-                    self.writeImageProperties(texture, samplers, imageNode)
-                    textures.append(texture)
+        for name in pbrNodes:
+            if self.isCancelled():
+                self.log('Conversion cancelled')
+                return
+            with self._profilePhase('material', name):
+                self._count('materials')
+                material = {}
+            
+                # Setup extensions list
+                extensions = None
+                if not 'extensions' in material:
+                    material['extensions'] = {}
+                extensions = material['extensions']
+                
+                pbrNode = pbrNodes[name]
+                if self._options['debugOutput']:
+                    print('- Convert MaterialX node to glTF:', pbrNode.getNamePath())
 
-                    roughness['metallicRoughnessTexture']  = {}
-                    roughness['metallicRoughnessTexture']['index'] = len(textures) - 1         
+                # Set material name
+                material['name'] = name
 
-            # Handle normal
-            filename = EMPTY_STRING
-            imageNode = pbrNode.getConnectedNode('normal')
-            if imageNode:
-                # Read past normalmap node
-                if imageNode.getCategory() == 'normalmap':
-                    imageNode = imageNode.getConnectedNode(IN_STRING)
-                if imageNode:
-                    fileInput = imageNode.getInput(mx.Implementation.FILE_ATTRIBUTE)
-                    filename = EMPTY_STRING
-                    if fileInput and fileInput.getAttribute(mx.TypedElement.TYPE_ATTRIBUTE) == mx.FILENAME_TYPE_STRING:
-                        filename = fileInput.getResolvedValueString()
-                    if len(filename) == 0:
-                        imageNode = None
-            if imageNode:
-                texture = {}
-                self.initialize_gtlf_texture(texture, imageNode.getNamePath(), filename, images)
-                textures.append(texture)
+                # Handle PBR metallic roughness
+                # -----------------------------
+                roughness = material['pbrMetallicRoughness'] = {}
 
-                material['normalTexture']  = {}
-                material['normalTexture']['index'] = len(textures) - 1       
-                    
-                self.writeImageProperties(texture, samplers, imageNode)
-
-            # Handle transmission extension
-            outputExtension = {}
-            self.writeFloatInput(pbrNode, 'transmission',
-                            'transmissionTexture', 'transmissionFactor', outputExtension, textures, images, samplers)
-            if len(outputExtension) > 0:
-                extensionName = 'KHR_materials_transmission'
-                extensions[extensionName] = outputExtension
-                if  extensionName not in extensionsUsed:
-                    extensionsUsed.append(extensionName)            
+                #  Handle base color
+                base_color = [ 1.0, 1.0, 1.0, 1.0 ]
+                base_color_set = False
 
-            # Handle specular color and specular extension
-            imageNode = pbrNode.getConnectedNode('specular_color')
-            imageGraph = None
-            if imageNode:
-                if imageNode.getParent().isA(mx.NodeGraph):
-                    imageGraph = imageNode.getParent()
-
-            # Procedural extension. WIP
-            if imageGraph:
-                extensionName = 'KHR_procedurals'
-                if  extensionName not in extensionsUsed:
-                    extensionsUsed.append(extensionName)   
-                if extensionName not in extensions:                          
-                    extensions[extensionName] = {}
-                outputExtension = extensions[extensionName]                
-
-                graphOutputs, procDict = self.graphToJson(imageGraph, gltfJson, materials, textures, images, samplers)
-                outputs = imageGraph.getOutputs()
-                if len(outputs) > 0:
-                    connectionName = outputs[0].getNamePath()
-                    inputBaseColor = pbrNode.getInput('specular_color')
-                    outputSpecifier = inputBaseColor.getAttribute('output')
-                    if len(outputSpecifier) > 0:            
-                        connectionName = imageGraph.getNamePath() + '/' + outputSpecifier
-                    outputExtension['specularColorTexture'] = procDict[connectionName]
-
-            else: 
-                outputExtension = {}
-                self.writeColor3Input(pbrNode, 'specular_color', 
-                                'specularColorTexture', 'specularColorFactor', outputExtension, textures, images, samplers)
-                self.writeFloatInput(pbrNode, 'specular', 
-                                'specularTexture', 'specularFactor', outputExtension, textures, images, samplers)
-                if len(outputExtension) > 0: 
-                    extensionName = 'KHR_materials_specular'
+                filename = ''
+                imageNode = shaderIndex.getConnectedNode(pbrNode, 'base_color')
+                imageGraph = None
+                if self._options['createProceduralTextures']:
+                    if imageNode:
+                        if imageNode.getParent().isA(mx.NodeGraph):
+                            imageGraph = imageNode.getParent()
+
+                if imageGraph:
+                    if self._options['debugOutput']:
+                        print('- Generate KHR procedurals for graph: ' + imageGraph.getName())
+                    self.log('- Generate KHR procedurals for graph: ' + imageGraph.getName())
+                    #dest = mx.createDocument()
+                    #removeInternals = False
+                    #copyGraphInterfaces(dest, imageGraph, removeInternals)
+
+                    extensionName = 'KHR_procedurals'
                     if  extensionName not in extensionsUsed:
                         extensionsUsed.append(extensionName)             
-                    extensions[extensionName] = outputExtension
-
-            # Handle emission
-            self.writeColor3Input(pbrNode, 'emissive', 
-                            'emissiveTexture', 'emissiveFactor', material, textures, images, samplers)
-
-            # Handle emissive strength extension
-            outputExtension = {}
-            self.writeFloatInput(pbrNode, 'emissive_strength', 
-                            '', 'emissiveStrength', outputExtension, textures, images, samplers) 
-            if len(outputExtension) > 0: 
-                extensionName = 'KHR_materials_emissive_strength'
-                if  extensionName not in extensionsUsed:
-                    extensionsUsed.append(extensionName)             
-                extensions[extensionName] = outputExtension
-
-            # Handle ior extension
-            outputExtension = {}
-            self.writeFloatInput(pbrNode, 'ior', 
-                            '', 'ior', outputExtension, textures, images, samplers) 
-            if len(outputExtension) > 0: 
-                extensionName = 'KHR_materials_ior'        
-                if  extensionName not in extensionsUsed:
-                    extensionsUsed.append(extensionName)             
-                extensions[extensionName] = outputExtension
-
-            # Handle sheen color
-            outputExtension = {}
-            self.writeColor3Input(pbrNode, 'sheen_color', 
-                            'sheenColorTexture', 'sheenColorFactor', outputExtension, textures, images, samplers)
-            self.writeFloatInput(pbrNode, 'sheen_roughness', 
-                            'sheenRoughnessTexture', 'sheenRoughnessFactor', outputExtension, textures, images, samplers) 
-            if len(outputExtension) > 0: 
-                extensionName = 'KHR_materials_sheen'        
-                if  extensionName not in extensionsUsed:
-                    extensionsUsed.append(extensionName)             
-                extensions[extensionName] = outputExtension
-
-            # Handle clearcloat
-            outputExtension = {}
-            self.writeFloatInput(pbrNode, 'clearcoat', 
-                            'clearcoatTexture', 'clearcoatFactor', outputExtension, textures, images, samplers) 
-            self.writeFloatInput(pbrNode, 'clearcoat_roughness', 
-                            'clearcoatRoughnessTexture', 'clearcoatRoughnessFactor', outputExtension, textures, images, samplers) 
-            if len(outputExtension) > 0: 
-                extensionName = 'KHR_materials_clearcoat'        
-                if  extensionName not in extensionsUsed:
-                    extensionsUsed.append(extensionName)             
-                extensions[extensionName] = outputExtension
-
-            # Handle KHR_materials_volume extension
-            # - Parse thickness
-            outputExtension = {}           
-            thicknessInput = pbrNode.getInput('thickness')
-            if thicknessInput:
-
-                thicknessNode = thicknessInput.getConnectedNode()
-                thicknessFileName = EMPTY_STRING
-                if thicknessNode:
-                    fileInput = thicknessNode.getInput(mx.Implementation.FILE_ATTRIBUTE)
-                    if fileInput and fileInput.getAttribute(mx.TypedElement.TYPE_ATTRIBUTE) == mx.FILENAME_TYPE_STRING:
-                        thicknessFileName = fileInput.getResolvedValueString()
+                    #if extensionName not in extensions:                          
+                    #    extensions[extensionName] = {}
+                    #outputExtension = extensions[extensionName]                
+
+                    #jsonGraph = documentToJSON(imageGraph)
+                    with self._profilePhase('graphToJson'):
+                        graphOutputs, procDict = self.graphToJson(imageGraph, gltfJson, materials, textures, images, samplers)
+                    outputs = imageGraph.getOutputs()
+                    if len(outputs) > 0:
+                        connectionName = outputs[0].getNamePath()
+                        inputBaseColor = shaderIndex.getInput(pbrNode, 'base_color')
+                        outputSpecifier = inputBaseColor.getAttribute('output')
+                        if len(outputSpecifier) > 0:            
+                            connectionName = imageGraph.getNamePath() + '/' + outputSpecifier
+
+                        # Add extension to texture entry
+                        baseColorEntry = roughness['baseColorTexture'] = {}
+                        baseColorEntry['index'] = 0 # Q: What should this be ?
+                        if 'extensions' not in baseColorEntry:
+                            baseColorEntry['extensions'] = {}
+                        extensions = baseColorEntry['extensions']
+                        if extensionName not in extensions:                          
+                            extensions[extensionName] = {}
+                        procExtensions = extensions[extensionName]                
+                        procExtensions['index'] = procDict[connectionName]
+
+                else:            
+                    if imageNode:                         
+                        filename = shaderIndex.getFileName(imageNode)
+                                        
+                    if len(filename) == 0:
+                        imageNode = None
 
-                if len(thicknessFileName) > 0:
-                    texture = {}
-                    self.initialize_gtlf_texture(texture, thicknessNode.getNamePath(), thicknessFileName, images)
-                    textures.append(texture)
+                    if imageNode:
+                        texture = {}
+                        self.initialize_gtlf_texture(texture, imageNode.getNamePath(), filename, images)
+                        textures.append(texture)
 
-                    outputExtension['thicknessTexture']  = {}
-                    outputExtension['thicknessTexture']['index'] = len(textures) - 1     
-                else:
-                    thicknessValue = thicknessInput.getValue() 
-                    if thicknessValue:
-                        outputExtension['thicknessFactor'] = thicknessValue
-
-            # Parse attenuation and attenuation distance
-            attenuationInput = pbrNode.getInput('attenuation_color')
-            if attenuationInput:
-                attenuationValue = attenuationInput.getValue() 
-                if attenuationValue:
-                    inputType = attenuationInput.getAttribute(mx.TypedElement.TYPE_ATTRIBUTE)
-                    outputExtension['attenuationColor'] = self.stringToScalar(attenuationInput.getValueString(), inputType)
-            attenuationInput = pbrNode.getInput('attenuation_distance')
-            if attenuationInput:
-                attenuationValue = attenuationInput.getValue() 
-                if attenuationValue:
-                    outputExtension['attenuationDistance'] = attenuationValue
-
-            if len(outputExtension) > 0: 
-                extensionName = 'KHR_materials_volume'        
-                if  extensionName not in extensionsUsed:
-                    extensionsUsed.append(extensionName)             
-                extensions[extensionName] = outputExtension
+                        roughness['baseColorTexture'] = {}
+                        roughness['baseColorTexture']['index'] = len(textures) - 1
 
-            # Handle clearcoat normal
-            filename = EMPTY_STRING
-            imageNode = pbrNode.getConnectedNode('clearcoat_normal')
-            if imageNode:
-                # Read past normalmap node
-                if imageNode.getCategory() == 'normalmap':
-                    imageNode = imageNode.getConnectedNode(IN_STRING)
-                if imageNode:
-                    fileInput = imageNode.getInput(mx.Implementation.FILE_ATTRIBUTE)
-                    filename = EMPTY_STRING
-                    if fileInput and fileInput.getAttribute(mx.TypedElement.TYPE_ATTRIBUTE) == mx.FILENAME_TYPE_STRING:
-                        filename = fileInput.getResolvedValueString() 
-                    if filename == EMPTY_STRING:
-                        imageNode = None
-                if imageNode:
-                    texture = {}
-                    self.initialize_gtlf_texture(texture, imageNode.getNamePath(), filename, images)
-                    self.writeImageProperties(texture, samplers, imageNode)
-                    textures.append(texture)
+                        self.writeImageProperties(texture, samplers, imageNode)
 
-                    outputExtension['clearcoatNormalTexture']  = {}
-                    outputExtension['clearcoatNormalTexture']['index'] = len(textures) - 1       
-                
-            # Handle alphA mode, cutoff
-            alphModeInput = pbrNode.getInput('alpha_mode')
-            if alphModeInput:
-                value = alphModeInput.getValue()
-
-                alphaModeMap = {}
-                alphaModeMap[0] = 'OPAQUE'
-                alphaModeMap[1] = 'MASK'
-                alphaModeMap[2] = 'BLEND'
-                self.writeFloatInput(pbrNode, 'alpha_mode', '', 'alphaMode', material, textures, images, samplers, alphaModeMap)
-                if value == 'MASK':
-                    self.writeFloatInput(pbrNode, 'alpha_cutoff', '', 'alphaCutoff', material, textures, images, samplers)
-
-
-            # Handle iridescence
-            outputExtension = {}
-            self.writeFloatInput(pbrNode, 'iridescence',
-                            'iridescenceTexture', 'iridescenceFactor', outputExtension, textures, images, samplers)
-            self.writeFloatInput(pbrNode, 'iridescence_ior',
-                            'iridescenceTexture', 'iridescenceIor', outputExtension, textures, images, samplers)
-            if len(outputExtension) > 0: 
-                extensionName = 'KHR_materials_iridescence'
-                if  extensionName not in extensionsUsed:
-                    extensionsUsed.append(extensionName)             
-                extensions[extensionName] = outputExtension
+                        # Pull off color from gltf_colorImage node
+                        color = shaderIndex.getInputValue(pbrNode, 'base_color')
+                        if color:
+                            base_color[0] = color[0]
+                            base_color[1] = color[1]
+                            base_color[2] = color[2]
+                            base_color_set = True
                 
-            # Scan for upstream <gltf_iridescence_thickness> node.
-            # Note: This is the agreed upon upstream node to create to map
-            # to gltf_pbr as part of the core implementation. It basically
-            # represents this structure: 
-            # https://github.com/KhronosGroup/glTF/blob/main/extensions/2.0/Khronos/KHR_materials_iridescence/README.md
-            thicknessInput = pbrNode.getInput('iridescence_thickness')
-            if thicknessInput:
-
-                thicknessNode = thicknessInput.getConnectedNode()
-                thicknessFileName = mx.FilePath()
-                if thicknessNode:
-                    fileInput = thicknessNode.getInput(mx.Implementation.FILE_ATTRIBUTE)
-                    thicknessFileName = EMPTY_STRING
-                    if fileInput and fileInput.getAttribute(mx.TypedElement.TYPE_ATTRIBUTE) == mx.FILENAME_TYPE_STRING:
-                        thicknessFileName = fileInput.getResolvedValueString()
+                    else:
+                        color = shaderIndex.getInputValue(pbrNode, 'base_color')
+                        if color:
+                            base_color[0] = color[0]
+                            base_color[1] = color[1]
+                            base_color[2] = color[2]
+                            base_color_set = True
+
+                        value = shaderIndex.getInputValue(pbrNode, 'alpha')
+                        if value:
+                            base_color[3] = value
+                            base_color_set = True
+
+                    if base_color_set:
+                        roughness['baseColorFactor'] = base_color 
+            
+                # Handle metallic, roughness, occlusion
+                # Handle partially mapped or when different channels map to different images
+                # by merging into a single ORM image. Note that we save as BGR 24-bit fixed images
+                # thus we scan by that order which results in an MRO image being written to disk.
+                #roughness['metallicRoughnessTexture'] = {}
+                metallicFactor = shaderIndex.getInputValue(pbrNode, 'metallic')
+                #if metallicFactor:
+                #    roughness['metallicFactor'] = metallicFactor
+                #    print('------------------------ set metallic', roughness['metallicFactor'],
+                #          ' node:', pbrNode.getNamePath())
+                #roughnessFactor = pbrNode.getInputValue('roughness')
+                #if roughnessFactor:        
+                #    roughness['roughnessFactor'] = roughnessFactor
+                extractInputs = [ 'metallic', 'roughness', 'occlusion' ]
+                filenames = [ EMPTY_STRING, EMPTY_STRING, EMPTY_STRING ]
+                imageNamePaths = [ EMPTY_STRING, EMPTY_STRING, EMPTY_STRING ]
+                roughnessInputs = [ 'metallicFactor', 'roughnessFactor', '' ]
+
+                IN_STRING = MTLX_IN_STRING
+                ormNode= None
+                imageNode = None
+                extractCategory = 'extract'
+                for e in range(0, 3):
+                    inputName = extractInputs[e]
+                    pbrInput = shaderIndex.getInput(pbrNode, inputName)
+                    if pbrInput:
+                        # Read past any extract node
+                        connectedNode = shaderIndex.getConnectedNode(pbrNode, inputName)
+                        if connectedNode:
+                            if connectedNode.getCategory() == extractCategory:
+                                imageNode = shaderIndex.getConnectedNode(connectedNode, IN_STRING)
+                            else:
+                                imageNode = connectedNode
+
+                        if imageNode:
+                            filenames[e] = shaderIndex.getFileName(imageNode)
+                            imageNamePaths[e] = imageNode.getNamePath()
+
+                        # Write out constant factors. If there is an image node
+                        # then ignore any value stored as the image takes precedence.
+                        if len(roughnessInputs[e]):
+                            value = pbrInput.getValue()
+                            if value != None:
+                                roughness[roughnessInputs[e]] = value
+                            #else:
+                            #    roughness[roughnessInputs[e]] = 1.0
+
+                    # Set to default 1.0
+                    #else:
+                    #    if len(roughnessInputs[e]):
+                    #        roughnessInputs[e] = 1.0
+
+                # Determine how many images to export and if merging is required
+                metallicFilename = mx.FilePath(filenames[0])
+                roughnessFilename = mx.FilePath(filenames[1])
+                occlusionFilename = mx.FilePath(filenames[2])
+                metallicFilename = self._options['searchPath'].find(metallicFilename)
+                roughnessFilename = self._options['searchPath'].find(roughnessFilename)
+                occlusionFilename = self._options['searchPath'].find(occlusionFilename)            
+
+                # if metallic and roughness match but occlusion differs, Then export 2 textures if found
+                if metallicFilename == roughnessFilename:
+                    if roughnessFilename == occlusionFilename:
+                        # All 3 are the same:
+                        if not roughnessFilename.isEmpty():
+                            print('- Append single ORM texture', roughnessFilename.asString())
+                            texture = {}
+                            self.initialize_gtlf_texture(texture, imageNamePaths[0], roughnessFilename.asString(mx.FormatPosix), images)
+                            self.writeImageProperties(texture, samplers, imageNode)
+                            textures.append(texture)
+
+                            roughness['metallicRoughnessTexture']  = {}
+                            roughness['metallicRoughnessTexture']['index'] = len(textures) - 1
+                    else:
+                        # Metallic and roughness are the same
+                        if not metallicFilename.isEmpty():
+                            print('- Append single metallic-roughness texture', metallicFilename.asString())
+                            texture = {}
+                            self.initialize_gtlf_texture(texture, imageNamePaths[0], metallicFilename.asString(mx.FormatPosix), images)
+                            self.writeImageProperties(texture, samplers, imageNode)
+                            textures.append(texture)
+
+                            roughness['metallicRoughnessTexture']  = {}
+                            roughness['metallicRoughnessTexture']['index'] = len(textures) - 1                    
+
+                        # Append separate occlusion texture
+                        if not occlusionFilename.isEmpty():
+                            print('- Append single occlusion texture', metallicFilename.asString())
+                            texture = {}
+                            self.initialize_gtlf_texture(texture, imageNamePaths[2], occlusionFilename.asString(mx.FormatPosix), images)
+                            self.writeImageProperties(texture, samplers, imageNode)
+                            textures.append(texture)
+
+                            material['occlusionTexture']  = {}
+                            material['occlusionTexture']['index'] = len(textures) - 1                    
+
+                # Metallic and roughness do no match and one or both are images. Merge as necessary
+                elif not metallicFilename.isEmpty() or not (roughnessFilename).isEmpty():
+                    self._beginPhase('ormMerge')
+                    loader = mx_render.StbImageLoader.create()
+                    handler = mx_render.ImageHandler.create(loader)
+                    handler.setSearchPath(self._options['searchPath'])
+                    if handler:
+                        ormFilename = roughnessFilename if metallicFilename.isEmpty() else metallicFilename
+
+                    imageWidth = 0
+                    imageHeight = 0
+
+                    roughnessImage = handler.acquireImage(roughnessFilename) if not roughnessFilename.isEmpty() else None
+                    if roughnessImage:
+                        imageWidth = max(roughnessImage.getWidth(), imageWidth)
+                        imageHeight = max(roughnessImage.getHeight(), imageHeight)
 
+                    metallicImage = handler.acquireImage(metallicFilename) if not metallicFilename.isEmpty() else None
+                    if metallicImage:
+                        imageWidth = max(metallicImage.getWidth(), imageWidth)
+                        imageHeight = max(metallicImage.getHeight(), imageHeight)
+
+                    outputImage = None
+                    if (imageWidth * imageHeight) != 0:
+                        color = mx.Color4(0.0)
+                        outputImage = mx_render.createUniformImage(imageWidth, imageHeight, 
+                                                                   3, mx_render.BaseType.UINT8, color)
+
+                        uniformRoughnessColor = 1.0
+                        if 'roughnessFactor' in roughness:
+                            uniformRoughnessColor = roughness['roughnessFactor']
+                        if roughnessImage:
+                            roughness['roughnessFactor'] = 1.0
+
+                        uniformMetallicColor = 1.0
+                        if 'metallicFactor' in roughness:
+                            uniformMetallicColor = roughness['metallicFactor']
+                        if metallicImage:
+                            roughness['metallicFactor'] = 1.0
+
+                        for y in range(0, imageHeight):
+                            for x in range(0, imageWidth):
+                                finalColor = outputImage.getTexelColor(x, y)
+                                finalColor[1] = roughnessImage.getTexelColor(x, y)[0] if roughnessImage else uniformRoughnessColor
+                                finalColor[2] = metallicImage.getTexelColor(x, y)[0] if metallicImage else uniformMetallicColor
+                                outputImage.setTexelColor(x, y, finalColor)
+
+                        ormFilename.removeExtension()
+                        ormfilePath = ormFilename.asString(mx.FormatPosix) + '_combined.png'
+                        flipImage = False
+                        saved = loader.saveImage(ormfilePath, outputImage, flipImage)
+
+                        uri = mx.FilePath(ormfilePath).getBaseName()
+                        print('- Merged metallic-roughness to single texture:', uri, 'Saved: ', saved)
                         texture = {}
-                        self.initialize_gtlf_texture(texture, thicknessNode.getNamePath(), thicknessFileName, images)
+                        self.initialize_gtlf_texture(texture,  imageNode.getNamePath(), uri, images)
+                        self.writeImageProperties(texture, samplers, imageNode)
                         textures.append(texture)
 
-                        outputExtension['iridescenceThicknessTexture']  = {}
-                        outputExtension['iridescenceThicknessTexture']['index'] = len(textures) - 1     
+                        roughness['metallicRoughnessTexture']  = {}
+                        roughness['metallicRoughnessTexture']['index'] = len(textures) - 1         
+                        self._count('ormMergedTexels', imageWidth * imageHeight)
+                    self._endPhase('ormMerge')
+
+                # Handle normal
+                self.writeNormalInput(pbrNode, 'normal', 'normalTexture', EMPTY_STRING, material, textures, images, samplers)
+
+                # Handle inputs mapped using GLTF_PBR_INPUT_MAPPINGS
+                nodedef = shaderIndex.getNodeDef(pbrNode)
+                nodedefName = nodedef.getName() if nodedef else EMPTY_STRING
+                if nodedefName not in mappingPlans:
+                    mappingPlans[nodedefName] = self.compileInputMappings(nodedef)
+                self.writeInputMappings(pbrNode, mappingPlans[nodedefName], gltfJson, material, extensions, materials, textures, images, samplers)
+
+                # The alpha cutoff only applies to masked materials
+                if material.get('alphaMode') != 'MASK':
+                    material.pop('alphaCutoff', None)
+
+                # Scan for upstream <gltf_iridescence_thickness> node.
+                # Note: This is the agreed upon upstream node to create to map
+                # to gltf_pbr as part of the core implementation. It basically
+                # represents this structure: 
+                # https://github.com/KhronosGroup/glTF/blob/main/extensions/2.0/Khronos/KHR_materials_iridescence/README.md
+                outputExtension = extensions.get('KHR_materials_iridescence', {})
+                thicknessInput = shaderIndex.getInput(pbrNode, 'iridescence_thickness')
+                if thicknessInput:
+
+                    thicknessNode = shaderIndex.getConnectedNode(pbrNode, 'iridescence_thickness')
+                    thicknessFileName = mx.FilePath()
+                    if thicknessNode:
+                        thicknessFileName = EMPTY_STRING
+                        if shaderIndex.getFileInput(thicknessNode):
+                            thicknessFileName = shaderIndex.getFileName(thicknessNode)
+
+                            texture = {}
+                            self.initialize_gtlf_texture(texture, thicknessNode.getNamePath(), thicknessFileName, images)
+                            textures.append(texture)
+
+                            outputExtension['iridescenceThicknessTexture']  = {}
+                            outputExtension['iridescenceThicknessTexture']['index'] = len(textures) - 1     
+
+                            thickessInput = thicknessNode.getInput('thicknessMin')
+                            thicknessValue = thickessInput.getValue() if thickessInput else None
+                            if thicknessValue:
+                                outputExtension['iridescenceThicknessMinimum'] = thicknessValue
+                            thickessInput = thicknessNode.getInput('thicknessMax')
+                            thicknessValue = thickessInput.getValue() if thickessInput else None
+                            if thicknessValue:
+                                outputExtension['iridescenceThicknessMaximum'] = thicknessValue
+
+                if len(outputExtension) > 0:
+                    extensionName = 'KHR_materials_iridescence'
+                    if extensionName not in extensionsUsed:
+                        extensionsUsed.append(extensionName)
+                    extensions[extensionName] = outputExtension
 
-                        thickessInput = thicknessNode.getInput('thicknessMin')
-                        thicknessValue = thickessInput.getValue() if thickessInput else None
-                        if thicknessValue:
-                            outputExtension['iridescenceThicknessMinimum'] = thicknessValue
-                        thickessInput = thicknessNode.getInput('thicknessMax')
-                        thicknessValue = thickessInput.getValue() if thickessInput else None
-                        if thicknessValue:
-                            outputExtension['iridescenceThicknessMaximum'] = thicknessValue
+                if len(material['extensions']) == 0:
+                    del material['extensions']
 
-            if len(material['extensions']) == 0:
-                del material['extensions']
+                materials.append(material)
 
-            materials.append(material)
+        self._count('textures', len(textures))
+        self._count('images', len(images))
+        self._count('samplers', len(samplers))
 
         # Remove any empty items to avoid validation errors
         if len(gltfJson['extensionsUsed']) == 0:
@@ -2631,50 +5682,89 @@ class MTLX2GLTFWriter:
         if len(gltfJson['textures']) == 0:
             del gltfJson['textures']
 
-    def packageGLTF(self, inputFile, outputFile):
+    def resolvePackageUris(self, gltf) -> tuple[list, list]:
         '''
-        @brief Package gltf file into a glb file
-        @param inputFile gltf file to package
-        @param outputFile Packaged glb file
-        @return status, image list, buffer list.
+        @brief Remap image and buffer URIs of a loaded glTF to files found on the search path.
+        @param gltf The pygltflib glTF object to update.
+        @return image list, buffer list.
         '''
         images = []
         buffers = []
+        searchPath = self._options['searchPath']
+        self._beginPhase('resolvePackageUris')
 
-        # Load the gltf file
-        gltfb = GLTF2() 
-        gltf = gltfb.load(inputFile)
-        if not gltf:
-            return False, images 
-
-        # Embed images
-        if len(gltf.images):
-            for im in gltf.images:
-                searchPath = self._options['searchPath']
-                path = searchPath.find(im.uri)
+        for im in gltf.images:
+            if im.uri and not im.uri.startswith('data:'):
                 path = searchPath.find(im.uri)
                 if path:
                     im.uri = path.asString(mx.FormatPosix)                    
                     self.log('- Remapped buffer URI to: ' + im.uri) 
-                images.append(im.uri)
-            gltf.convert_images(ImageFormat.DATAURI)
+            images.append(im.uri)
 
-        # Embed buffer references.
         # If the input file is not in the same folder as the current working directory,
         # then modify the buffer uri to be an absolute path.
-        if len(gltf.buffers):
-            absinputFile = os.path.abspath(inputFile)
-            parentFolder = os.path.dirname(absinputFile)
-            for buf in gltf.buffers:
-                searchPath = self._options['searchPath']
-                path = searchPath.find(buf.uri)
-                if path:
-                    buf.uri = path.asString(mx.FormatPosix)                    
-                    self.log('- Remapped buffer URI to: ' + buf.uri) 
-                buffers.append(buf.uri)
-        gltfb.convert_buffers(BufferFormat.BINARYBLOB)            
+        for buf in gltf.buffers:
+            path = searchPath.find(buf.uri)
+            if path:
+                buf.uri = path.asString(mx.FormatPosix)                    
+                self.log('- Remapped buffer URI to: ' + buf.uri) 
+            buffers.append(buf.uri)
 
-        saved = gltf.save(outputFile)
+        self._endPhase('resolvePackageUris')
+        return images, buffers
+
+    def writeGLTFPackage(self, gltf, outputFile, imageData=None) -> bool:
+        '''
+        @brief Embed images into a loaded glTF and save it as a glb file.
+        @param gltf The pygltflib glTF object to package. URIs should already be resolved using resolvePackageUris().
+        @param outputFile Packaged glb file
+        @param imageData Optional dictionary of image URI to image file contents. Images found in the
+        dictionary are embedded directly instead of being read from disk.
+        @return True if the file was saved, otherwise False.
+        '''
+        with self._profilePhase('package'):
+            if len(gltf.images):
+                # Images of unknown type are left as external references, as a data URI requires a mime type
+                images = gltf.images
+                embeddedImages = []
+                for im in images:
+                    mime = None
+                    if im.uri and not im.uri.startswith('data:'):
+                        mime, _ = mimetypes.guess_type(im.uri)
+                        if not mime:
+                            self.log('- Cannot embed image of unknown type: ' + im.uri)
+                            continue
+                    embeddedImages.append(im)
+                    if mime and imageData and im.uri in imageData:
+                        encoded = base64.b64encode(imageData[im.uri]).decode('utf-8')
+                        if not im.name:
+                            im.name = im.uri
+                        im.uri = 'data:%s;base64,%s' % (mime, encoded)
+                gltf.images = embeddedImages
+                try:
+                    gltf.convert_images(ImageFormat.DATAURI)
+                finally:
+                    gltf.images = images
+            self._count('packagedImages', len(gltf.images))
+            self._count('packagedBuffers', len(gltf.buffers))
+
+            return gltf.save(outputFile)
+
+    def packageGLTF(self, inputFile, outputFile):
+        '''
+        @brief Package gltf file into a glb file
+        @param inputFile gltf file to package
+        @param outputFile Packaged glb file
+        @return status, image list, buffer list.
+        '''
+        # Load the gltf file
+        with self._profilePhase('packageLoad'):
+            gltf = GLTF2.load(inputFile)
+        if not gltf:
+            return False, [], []
+
+        images, buffers = self.resolvePackageUris(gltf)
+        saved = self.writeGLTFPackage(gltf, outputFile)
         return saved, images, buffers
 
     def translateShaders(self, doc):
@@ -2687,57 +5777,93 @@ class MTLX2GLTFWriter:
         if not doc:
             return shadersTranslated
 
-        materialNodes = doc.getMaterialNodes()
-        for material in materialNodes:
-            shaderNodes = mx.getShaderNodes(material)
-            for shaderNode in shaderNodes:
-                category = shaderNode.getCategory()
-                path = shaderNode.getNamePath()
-                if category != MTLX_GLTF_PBR_CATEGORY and category != MTLX_UNLIT_CATEGORY_STRING:
-                    status, error = self.translateShader(shaderNode, MTLX_GLTF_PBR_CATEGORY)
-                    if not status:
-                        self.log('Failed to translate shader:' + shaderNode.getNamePath() + 
-                            ' of type ' + shaderNode.getCategory())
-                        # + '\nError: ' + error.error)
-                    else:
-                        shadersTranslated = shadersTranslated + 1
+        self._beginPhase('translateShaders')
+        shaderIndex = MaterialXShaderIndex(doc)
+        for category in shaderIndex.getCategories():
+            if category == MTLX_GLTF_PBR_CATEGORY or category == MTLX_UNLIT_CATEGORY_STRING:
+                continue
+            for shaderNode in shaderIndex.getShaderNodes(category).values():
+                if self.isCancelled():
+                    break
+                status, error = self.translateShader(shaderNode, MTLX_GLTF_PBR_CATEGORY)
+                if not status:
+                    self.log('Failed to translate shader:' + shaderNode.getNamePath() + 
+                        ' of type ' + category)
+                    # + '\nError: ' + error.error)
+                else:
+                    shadersTranslated = shadersTranslated + 1
         
+        self._count('translatedShaders', shadersTranslated)
+        self._endPhase('translateShaders')
         return shadersTranslated
 
-    def convert(self, doc):
+    def getGeometryTemplate(self, fileName):
         '''
-        @brief Convert MaterialX document to glTF
+        @brief Get the geometry template for a glTF file. The template is cached by the writer and
+        reloaded only if a different file is requested or the file has changed.
+        The template is loaded for passthrough if the 'geometryPassthrough' option is set.
+        @param fileName Name of the glTF file.
+        @return The template if the file could be read, otherwise None. The reason is logged if the file cannot be parsed.
+        '''
+        try:
+            fileStat = os.stat(fileName)
+        except OSError as err:
+            self.log('- Failed to read glTF geometry file: %s. %s' % (fileName, err))
+            return None
+        passthrough = self._options['geometryPassthrough']
+        key = (os.path.abspath(fileName), fileStat.st_mtime_ns, fileStat.st_size, passthrough)
+        if self._geometryTemplateKey != key:
+            errors = []
+            self._geometryTemplate = GLTFGeometryTemplate.load(fileName, passthrough, errors)
+            self._geometryTemplateKey = key
+            if errors:
+                self.log('- Failed to read glTF geometry file: %s. %s' % (fileName, errors[0]))
+        return self._geometryTemplate
+
+    def convertToJson(self, doc, geometryJson=None) -> dict:
+        '''
+        @brief Convert MaterialX document to a glTF JSON dictionary
         @param doc MaterialX document to convert
-        @return glTF JSON string
+        @param geometryJson Optional glTF JSON dictionary or GLTFGeometryTemplate to use as geometry instead
+        of the 'geometryFile' option. The dictionary or template is not modified.
+        @return glTF JSON dictionary. None is returned if the conversion was cancelled.
         '''
-        # Resulting glTF JSON string        
+        # Resulting glTF JSON
         gltfJson = {}
 
         # Check for glTF geometry file inclusion
         gltfGeometryFile = self._options['geometryFile']
-        if len(gltfGeometryFile):
+        self._beginPhase('geometryLoad')
+        if isinstance(geometryJson, GLTFGeometryTemplate):
+            gltfJson = geometryJson.instantiate()
+            self.log('- Embedding glTF geometry')
+        elif geometryJson:
+            # The template adds default materials to the copy
+            gltfJson = GLTFGeometryTemplate(copy.deepcopy(geometryJson)).getJson()
+            self.log('- Embedding glTF geometry')
+        elif len(gltfGeometryFile):
             print('- glTF geometry file:' + gltfGeometryFile)
             if os.path.exists(gltfGeometryFile):
-                gltfFile = open(gltfGeometryFile, 'r')
-                if gltfFile:
-                    gltfJson = json.load(gltfFile)
-                if self._options['debugOutput']:
-                    print('- Embedding glTF geometry file:' + gltfGeometryFile)
-                self.log('- Embedding glTF geometry file:' + gltfGeometryFile)
-
-                # If no materials, add a default material
-                for mesh in gltfJson['meshes']:
-                    for primitive in mesh['primitives']:
-                        if 'material' not in primitive:
-                            primitive['material'] = 0
+                template = self.getGeometryTemplate(gltfGeometryFile)
+                if template:
+                    gltfJson = template.instantiate()
+                    if self._options['debugOutput']:
+                        print('- Embedding glTF geometry file:' + gltfGeometryFile)
+                    self.log('- Embedding glTF geometry file:' + gltfGeometryFile)
+                elif self._options['debugOutput']:
+                    print('- Failed to read glTF geometry file:' + gltfGeometryFile)
             else:
                 if self._options['debugOutput']:
                     print('- glTF geometry file not found:' + gltfGeometryFile)
                 self.log('- glTF geometry file not found:' + gltfGeometryFile)
+        self._endPhase('geometryLoad')
 
         # Clear and convert materials
         resetMaterials = True
-        self.materialX2glTF(doc, gltfJson, resetMaterials)
+        with self._profilePhase('materials'):
+            self.materialX2glTF(doc, gltfJson, resetMaterials)
+        if self.isCancelled():
+            return None
         
         # If geometry specified, create new primitives for each material
         materialCount = len(gltfJson['materials']) if 'materials' in gltfJson else 0
@@ -2746,11 +5872,83 @@ class MTLX2GLTFWriter:
                 print('- Generating a new primitive for each of %d materials' % materialCount)
             # Compute sqrt of materialCount
             rowCount = int(math.sqrt(materialCount))
-            self.createPrimsForMaterials(gltfJson, rowCount)
+            with self._profilePhase('primsPerMaterial'):
+                self.createPrimsForMaterials(gltfJson, rowCount)
+
+        return gltfJson
+
+    def convert(self, doc, geometryJson=None) -> str:
+        '''
+        @brief Convert MaterialX document to glTF
+        @param doc MaterialX document to convert
+        @param geometryJson Optional glTF JSON dictionary to use as geometry instead of the 'geometryFile' option.
+        The dictionary is not modified.
+        @return glTF JSON string
+        '''
+        gltfJson = self.convertToJson(doc, geometryJson)
+        if gltfJson is None:
+            return ''
 
         # Get resulting glTF JSON string
-        gltfString = json.dumps(gltfJson, indent=2)
+        gltfString = Util.gltfJsonToString(gltfJson, self._options['compactJson'])
         self.log('- Output glTF with new MaterialX materials' + str(gltfString))
 
         return gltfString
-    
+
+##########################################################################################################################
+# In-memory conversion utilities
+##########################################################################################################################
+
+def gltfToMaterialX(gltfData, options=None) -> mx.Document:
+    '''
+    @brief Convert glTF held in memory to a MaterialX document. No files are read or written.
+    @param gltfData glTF JSON dictionary, JSON string or bytes, or glb file contents. A dictionary is not modified.
+    @param options Optional GLTF2MtlxOptions.
+    @return A MaterialX document if successful, otherwise None.
+    '''
+    reader = GLTF2MtlxReader()
+    if options:
+        reader.setOptions(options)
+    if isinstance(gltfData, dict):
+        return reader.convertJson(gltfData)
+    return reader.convertString(gltfData)
+
+def gltfToMaterialXString(gltfData, options=None) -> str:
+    '''
+    @brief Convert glTF held in memory to a MaterialX XML string. No files are read or written.
+    @param gltfData glTF JSON dictionary, JSON string or bytes, or glb file contents. A dictionary is not modified.
+    @param options Optional GLTF2MtlxOptions.
+    @return The MaterialX XML string if successful, otherwise an empty string.
+    '''
+    doc = gltfToMaterialX(gltfData, options)
+    return Util.writeMaterialXDocString(doc) if doc else EMPTY_STRING
+
+def materialXToGLTF(mtlxData, options=None, geometryJson=None) -> dict:
+    '''
+    @brief Convert MaterialX held in memory to a glTF JSON dictionary. 
+    Files are only accessed to resolve textures.
+    @param mtlxData MaterialX XML string or document.
+    @param options Optional MTLX2GLTFOptions. The 'searchPath' option is used to resolve textures.
+    @param geometryJson Optional glTF JSON dictionary or GLTFGeometryTemplate to use as geometry. The dictionary is not modified.
+    @return The glTF JSON dictionary if successful, otherwise None.
+    '''
+    writer = MTLX2GLTFWriter()
+    if options:
+        writer.setOptions(options)
+    doc = mtlxData
+    if isinstance(mtlxData, str):
+        doc = Util.readMaterialXDocString(mtlxData, writer.getOptions()['searchPath'])
+    return writer.convertToJson(doc, geometryJson)
+
+def materialXToGLTFBytes(mtlxData, options=None, geometryJson=None, compact=False) -> bytes:
+    '''
+    @brief Convert MaterialX held in memory to glTF JSON encoded as UTF-8 bytes.
+    Files are only accessed to resolve textures.
+    @param mtlxData MaterialX XML string or document.
+    @param options Optional MTLX2GLTFOptions. The 'searchPath' option is used to resolve textures.
+    @param geometryJson Optional glTF JSON dictionary or GLTFGeometryTemplate to use as geometry. The dictionary is not modified.
+    @param compact Encode without indentation or extra whitespace. Default is False.
+    @return The glTF bytes if successful, otherwise empty bytes.
+    '''
+    gltfJson = materialXToGLTF(mtlxData, options, geometryJson)
+    return Util.gltfJsonToString(gltfJson, compact).encode('utf-8') if gltfJson is not None else b''
@@ -11,11 +11,16 @@ MTLX_DEFAULT_MATERIAL_NAME = 'MAT_0'
 MTLX_MATERIAL_PREFIX = 'MAT_'
 MTLX_DEFAULT_SHADER_NAME = 'SHD_0'
 MTLX_SHADER_PREFIX = 'SHD_'
+MTLX_COLLECTION_PREFIX = 'COL_'
 # Default GLTF names for conversion to/from MaterialX
 GLTF_DEFAULT_NODE_PREFIX = 'NODE_'
 GLTF_DEFAULT_MESH_PREFIX = 'MESH_'
 # As primitives have not named, use the index as the name if more than one primitives child
 GLTF_DEFAULT_PRIMITIVE_PREFIX = 'PRIMITIVE_'
+# Placeholder string serialized in place of glTF values which are passed through as text
+GLTF_RAW_VALUE_PLACEHOLDER = '__gltf_raw_value__'
+# Default name of the manifest listing buffers shared by a batch of glTF files
+GLTF_SHARED_BUFFERS_MANIFEST = 'shared_buffers.json'
 
 # MaterialX strings
 #SURFACE_SHADER_TYPE_STRING = 'surfaceshader'
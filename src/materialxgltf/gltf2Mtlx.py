@@ -4,37 +4,54 @@ Utility and command line interface to convert from a glTF file to a MaterialX fi
 '''
 import os
 import argparse
+import contextlib
 
 #import MaterialX as mx
 #from materialxgltf.core import *
 from core import *
 
-def gltf2Mtlx(gltfFileName, mtlxFileName, options=GLTF2MtlxOptions()):
+def gltf2Mtlx(gltfFileName, mtlxFileName, options=GLTF2MtlxOptions(), profiler=None):
     '''
     @brief Utility to convert a glTF file to MaterialX file
 
     @param gltfFileName Path to glTF file to convert
     @param mtlxFileName Path to MaterialX file to write
     @param options Options for conversion
+    @param profiler Optional ConversionProfiler to record the conversion with
     '''
     status = True
     err = ''
 
     gltf2MtlxReader = GLTF2MtlxReader()
     gltf2MtlxReader.setOptions(options)
+    gltf2MtlxReader.setProfiler(profiler)
     doc = gltf2MtlxReader.convert(gltfFileName)
     if not doc:
         status = False
         err = 'Error converting glTF file to MaterialX file'
     else:
-        status, err = doc.validate()
+        if options['deduplicateMaterials']:
+            print('- Deduplicated materials. Ratio of glTF to MaterialX materials: %.2f' % gltf2MtlxReader.getDeduplicationRatio())
+        with profiler.phase('validate') if profiler else contextlib.nullcontext():
+            status, err = doc.validate()
         if not status:
             print('Validation error: ', err)
         #print(mx.writeToXmlString(doc))
-        Util.writeMaterialXDoc(doc, mtlxFileName)
+        with profiler.phase('serialize') if profiler else contextlib.nullcontext():
+            Util.writeMaterialXDoc(doc, mtlxFileName)
 
     return status, err
 
+def parseSelection(selection):
+    '''
+    @brief Parse a comma separated list of names or indices.
+    @param selection The string to parse.
+    @return List of names and integer indices.
+    '''
+    if not selection:
+        return []
+    return [int(item) if item.isdigit() else item for item in selection.split(',')]
+
 def main():
     '''
     @brief Command line interface to convert from a glTF file to a MaterialX file
@@ -44,6 +61,15 @@ def main():
     parser.add_argument('--mtlxFileName', dest='mtlxFileName', default='', help='Name of MaterialX output file. If not specified the glTF name with "_converted.mtlx" suffix will be used')
     parser.add_argument('--createAssignments', dest='createAssignments', type=mx.stringToBoolean, default=True, help='Create material assignments. Default is True')
     parser.add_argument('--addAllInputs', dest='addAllInputs', type=mx.stringToBoolean, default=False, help='Add all definition inputs to MaterialX shader nodes. Default is False')
+    parser.add_argument('--compactAssignments', dest='compactAssignments', type=mx.stringToBoolean, default=False, help='Assign materials using collections with compacted geometry paths. Default is False')
+    parser.add_argument('--selectMaterials', dest='selectMaterials', default='', help='Comma separated list of glTF material names or indices to convert. Default is to convert all materials')
+    parser.add_argument('--selectMaterialPattern', dest='selectMaterialPattern', default='', help='Convert glTF materials with a name matching this regular expression. Default is to convert all materials')
+    parser.add_argument('--selectScenes', dest='selectScenes', default='', help='Comma separated list of glTF scene indices. Convert materials used in these scenes. Default is to convert all materials')
+    parser.add_argument('--selectNodes', dest='selectNodes', default='', help='Comma separated list of glTF node names or indices. Convert materials used at or below these nodes. Default is to convert all materials')
+    parser.add_argument('--deduplicateMaterials', dest='deduplicateMaterials', type=mx.stringToBoolean, default=False, help='Create a single MaterialX material for glTF materials which differ only by name. Default is False')
+    parser.add_argument('--profile', dest='profile', default='', help='Write a JSON report of conversion phase timings and counters to this file. Default is no report')
+    parser.add_argument('--profileTrace', dest='profileTrace', default='', help='Write conversion phases per material to this file in Chrome trace event format. Default is no trace')
+    parser.add_argument('--profileMemory', dest='profileMemory', type=mx.stringToBoolean, default=False, help='Include peak Python memory of each phase in the profile. Default is False')
 
     opts = parser.parse_args()
 
@@ -62,10 +88,22 @@ def main():
     options = GLTF2MtlxOptions()
     options['createAssignments'] = opts.createAssignments    
     options['addAllInputs'] = opts.addAllInputs
-    converted, err = gltf2Mtlx(gltfFileName, mtlxFilePath, options)
+    options['deduplicateMaterials'] = opts.deduplicateMaterials
+    options['compactAssignments'] = opts.compactAssignments
+    options['selectMaterials'] = parseSelection(opts.selectMaterials)
+    options['selectMaterialPattern'] = opts.selectMaterialPattern
+    options['selectScenes'] = [index for index in parseSelection(opts.selectScenes) if isinstance(index, int)]
+    options['selectNodes'] = parseSelection(opts.selectNodes)
+    profiler = None
+    if opts.profile or opts.profileTrace:
+        profiler = ConversionProfiler(opts.profileMemory)
+    converted, err = gltf2Mtlx(gltfFileName, mtlxFilePath, options, profiler)
     print('Converted glTF file %s to MaterialX file: %s. Status: %s.' % (gltfFileName, mtlxFilePath, converted))
     if not converted:
         print('- Error: ', err)
+    if profiler:
+        for description, fileName in profiler.write(opts.profile, opts.profileTrace):
+            print('- Wrote %s to: %s' % (description, fileName))
 
 if __name__ == "__main__":
     main()
@@ -4,26 +4,40 @@ Utility and command line interface to convert from a MaterialX file to a glTF fi
 '''
 import os
 import argparse
+import contextlib
 
 from core import *
 
-def mtlx2gltf(materialXFileName, gltfOutputFileName, options=MTLX2GLTFOptions()):
+def mtlx2gltf(materialXFileName, gltfOutputFileName, options=MTLX2GLTFOptions(), profiler=None, geometryTemplate=None,
+              sharedBuffers=None):
     '''
     Utility to convert a MaterialX file to glTF file
     @param materialXFileName Path to MaterialX file to convert
     @param gltfOutputFileName Path to glTF file to write
     @param options Options for conversion
+    @param profiler Optional ConversionProfiler to record the conversion with
+    @param geometryTemplate Optional GLTFGeometryTemplate to use instead of loading the 'geometryFile' option
+    @param sharedBuffers Optional GLTFSharedBuffers to write buffers to. The glTF file refers to the shared
+    buffers and is not packaged into a GLB file.
     '''                        
     mtlx2glTFWriter = MTLX2GLTFWriter()
-    doc, libFiles = Util.createMaterialXDoc()
+    mtlx2glTFWriter.setProfiler(profiler)
+    with profiler.phase('libraryLoad') if profiler else contextlib.nullcontext():
+        doc, libFiles = Util.createMaterialXDoc()
     if libFiles:
         print('- Loaded %d library files.' % len(libFiles))
     else:
         print('- No library files loaded.')
-    mx.readFromXmlFile(doc, materialXFileName, options['searchPath'])    
+    with profiler.phase('parse') if profiler else contextlib.nullcontext():
+        mx.readFromXmlFile(doc, materialXFileName, options['searchPath'])    
     
     mtlx2glTFWriter.setOptions(options)
 
+    # Replace pattern graphs which evaluate to constants before translation and baking
+    if options['foldConstants']:
+        foldedCount = mtlx2glTFWriter.foldConstants(doc)
+        print('- Folded %d constant inputs.' % foldedCount)
+
     # Perform shader translation and baking if necessary
     if options['translateShaders']:
         translatedCount = mtlx2glTFWriter.translateShaders(doc)
@@ -45,16 +59,22 @@ def mtlx2gltf(materialXFileName, gltfOutputFileName, options=MTLX2GLTFOptions())
                 Util.writeMaterialXDoc(doc, materialXFileName)
             print('- Baking end.')
 
-    gltfString = mtlx2glTFWriter.convert(doc)
-    if len(gltfString) > 0:
+    gltfJson = mtlx2glTFWriter.convertToJson(doc, geometryTemplate)
+    if gltfJson is not None:
+        if sharedBuffers:
+            with profiler.phase('shareBuffers') if profiler else contextlib.nullcontext():
+                sharedFileNames = sharedBuffers.shareBuffers(gltfJson, gltfOutputFileName, options['searchPath'])
+            for fileName in sharedFileNames:
+                print('- Shared buffer: %s' % fileName)
         print('> Write glTF to: ', gltfOutputFileName)
-        f = open(gltfOutputFileName, 'w')
-        f.write(gltfString)
-        f.close()
+        with profiler.phase('serialize') if profiler else contextlib.nullcontext():
+            Util.writeGLTFFile(gltfJson, gltfOutputFileName, options['compactJson'])
     else:
         return False, mtlx2glTFWriter.getLog()
     
-    if options['packageBinary']:
+    if options['packageBinary'] and sharedBuffers:
+        print('- Shared buffers are not packaged into a GLB file.')
+    elif options['packageBinary']:
         binaryFileName = str(gltfOutputFileName)
         binaryFileName = binaryFileName.replace('.gltf', '.glb')
         print('- Packaging GLB file...')
@@ -75,12 +95,23 @@ def main():
     parser.add_argument(dest='mtlxFileName', help='Path containing MaterialX file to convert.')
     parser.add_argument('--gltfFileName', dest='gltfFileName', default='', help='Name of MaterialX output file. If not specified the glTF name with "_tomtlx.mtlx" suffix will be used')
     parser.add_argument('--gltfGeomFileName', dest='gltfGeomFileName', default='', help='Name of MaterialX output file. If not specified the glTF name with "_tomtlx.mtlx" suffix will be used')
+    parser.add_argument('--geometryPassthrough', dest='geometryPassthrough', type=mx.stringToBoolean, default=False, help='Copy geometry accessors, buffer views and buffers to the output without parsing them. Default is False')
     parser.add_argument('--primsPerMaterial', dest='primsPerMaterial', type=mx.stringToBoolean, default=False, help='Create a new primitive per material and assign the material. Default is False')
     parser.add_argument('--packageBinary', dest='packageBinary', type=mx.stringToBoolean, default=False, help='Create a biary packaged GLB file. Default is False')
+    parser.add_argument('--shareBuffers', dest='shareBuffers', type=mx.stringToBoolean, default=False, help='Write each geometry buffer once to the output folder and refer to it from every glTF file, with a manifest of shared buffers, instead of packaging GLB files. Default is False')
     parser.add_argument('--translateShaders', dest='translateShaders', type=mx.stringToBoolean, default=False, help='Translate shaders to glTF. Default is False')
     parser.add_argument('--bakeTextures', dest='bakeTextures', type=mx.stringToBoolean, default=False, help='Bake pattern graphs as textures. Default is False')
     parser.add_argument('--bakeResolution', dest='bakeResolution', type=int, default=256, help='Bake image resolution. Default is 256')
+    parser.add_argument('--cpuBake', dest='cpuBake', type=mx.stringToBoolean, default=False, help='Bake supported pattern graphs on the CPU using NumPy, falling back to the GPU baker otherwise. Default is False')
+    parser.add_argument('--foldConstants', dest='foldConstants', type=mx.stringToBoolean, default=False, help='Replace pattern graphs which evaluate to constants by values before translating shaders and baking. Default is False')
+    parser.add_argument('--bakeCache', dest='bakeCache', default='', help='Folder used to cache baked materials. Unchanged materials are reused instead of being baked again. Default is no cache')
+    parser.add_argument('--bakeCacheSize', dest='bakeCacheSize', type=int, default=1024, help='Maximum size of the bake cache in megabytes. Least recently used materials are removed when it is exceeded. Default is 1024')
     parser.add_argument('--writeDefaultInputs', dest='writeDefaultInputs', type=mx.stringToBoolean, default=False, help='Write default inputs on shader nodes. Default is False')
+    parser.add_argument('--compactJson', dest='compactJson', type=mx.stringToBoolean, default=False, help='Write glTF JSON without indentation. Default is False')
+    parser.add_argument('--deduplicateMaterials', dest='deduplicateMaterials', type=mx.stringToBoolean, default=False, help='Write materials with identical content only once. Default is False')
+    parser.add_argument('--profile', dest='profile', default='', help='Write a JSON report of conversion phase timings and counters to this file. Default is no report')
+    parser.add_argument('--profileTrace', dest='profileTrace', default='', help='Write conversion phases per material to this file in Chrome trace event format. Default is no trace')
+    parser.add_argument('--profileMemory', dest='profileMemory', type=mx.stringToBoolean, default=False, help='Include peak Python memory of each phase in the profile. Default is False')
 
     opts = parser.parse_args()
 
@@ -104,6 +135,31 @@ def main():
     else:
         mtlxFiles.append(mtlxFileName)
 
+    # A single profile covers all files converted
+    profiler = None
+    if opts.profile or opts.profileTrace:
+        profiler = ConversionProfiler(opts.profileMemory)
+
+    # Geometry is loaded once and shared by all files converted
+    geometryTemplate = None
+    if len(mtlxFiles) > 1 and len(opts.gltfGeomFileName) > 0:
+        errors = []
+        with profiler.phase('geometryLoad') if profiler else contextlib.nullcontext():
+            geometryTemplate = GLTFGeometryTemplate.load(opts.gltfGeomFileName, opts.geometryPassthrough, errors)
+        if geometryTemplate:
+            print('- Loaded glTF geometry file:', opts.gltfGeomFileName)
+        elif errors:
+            print('- Failed to read glTF geometry file: %s. %s' % (opts.gltfGeomFileName, errors[0]))
+
+    # Buffers are written once to the output folder and shared by all files converted
+    sharedBuffers = None
+    if opts.shareBuffers:
+        if ignoreGltfFileName:
+            outputFolder = mtlxFileName
+        else:
+            outputFolder = os.path.dirname(os.path.abspath(opts.gltfFileName or mtlxFileName + '.gltf'))
+        sharedBuffers = GLTFSharedBuffers(outputFolder)
+
     for mtlxFileName in mtlxFiles:
         if len(mtlxFiles) > 1:
             print('*** Converting MaterialX file:', mtlxFileName)
@@ -122,10 +178,17 @@ def main():
             if not mx.FilePath(gltfGeomFileName).isAbsolute():
                 gltfGeomFileName = os.path.abspath(gltfGeomFileName)        
         options['geometryFile'] = opts.gltfGeomFileName
+        options['geometryPassthrough'] = opts.geometryPassthrough
         options['translateShaders'] = opts.translateShaders
         options['bakeTextures'] = opts.bakeTextures
         options['bakeResolution'] = opts.bakeResolution
+        options['cpuBake'] = opts.cpuBake
+        options['foldConstants'] = opts.foldConstants
+        options['bakeCache'] = opts.bakeCache
+        options['bakeCacheSize'] = opts.bakeCacheSize
         options['writeDefaultInputs'] = opts.writeDefaultInputs
+        options['compactJson'] = opts.compactJson
+        options['deduplicateMaterials'] = opts.deduplicateMaterials
 
         # Set search path to default library path as well as folder containing MaterialX file
         # and current path
@@ -138,10 +201,17 @@ def main():
         options['searchPath'] = searchPath
 
         print("- Search path set to:", searchPath.asString())         
-        converted, err = mtlx2gltf(mtlxFileName, gltfFileName, options)
+        converted, err = mtlx2gltf(mtlxFileName, gltfFileName, options, profiler, geometryTemplate, sharedBuffers)
         print('Converted MaterialX file %s to gltf file: %s. Status: %s.' % (mtlxFileName, gltfFileName, converted))
         if not converted:
             print('- Error: ', err)
 
+    if sharedBuffers:
+        print('- Wrote shared buffer manifest to:', sharedBuffers.writeManifest())
+
+    if profiler:
+        for description, fileName in profiler.write(opts.profile, opts.profileTrace):
+            print('- Wrote %s to: %s' % (description, fileName))
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
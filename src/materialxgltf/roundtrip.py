@@ -0,0 +1,365 @@
+#!/usr/bin/env python
+# roundtrip.py
+
+'''
+@file
+Round trip harness for glTF to MaterialX to glTF conversion.
+
+Each glTF or glb sample found is converted to MaterialX and back to glTF. The time of each stage
+is recorded, and the material parameters and texture bindings of the resulting glTF materials are
+compared numerically against the input materials. A summary table is printed, and a full JSON
+report can be written, which provides a baseline of both speed and correctness for the converter.
+'''
+import argparse, contextlib, hashlib, json, os, sys
+
+import MaterialX as mx # type: ignore
+
+from materialxgltf.core import *
+
+# Round trip stages in the order they are run
+ROUNDTRIP_STAGES = ['load', 'gltf2mtlx', 'mtlx2gltf', 'compare']
+
+# Material properties which are not compared
+ROUNDTRIP_SKIPPED_PROPERTIES = ['name', 'extras']
+
+# Values used by glTF for material properties which are not specified
+GLTF_MATERIAL_DEFAULTS = {
+    'alphaMode': 'OPAQUE',
+    'alphaCutoff': 0.5,
+    'doubleSided': False,
+    'emissiveFactor': [0.0, 0.0, 0.0],
+    'pbrMetallicRoughness/baseColorFactor': [1.0, 1.0, 1.0, 1.0],
+    'pbrMetallicRoughness/metallicFactor': 1.0,
+    'pbrMetallicRoughness/roughnessFactor': 1.0,
+    'normalTexture/scale': 1.0,
+    'occlusionTexture/strength': 1.0,
+    'extensions/KHR_materials_emissive_strength/emissiveStrength': 1.0,
+    'extensions/KHR_materials_ior/ior': 1.5,
+    'extensions/KHR_materials_transmission/transmissionFactor': 0.0,
+    'extensions/KHR_materials_clearcoat/clearcoatFactor': 0.0,
+    'extensions/KHR_materials_clearcoat/clearcoatRoughnessFactor': 0.0,
+    'extensions/KHR_materials_sheen/sheenColorFactor': [0.0, 0.0, 0.0],
+    'extensions/KHR_materials_sheen/sheenRoughnessFactor': 0.0,
+    'extensions/KHR_materials_specular/specularFactor': 1.0,
+    'extensions/KHR_materials_specular/specularColorFactor': [1.0, 1.0, 1.0],
+    'extensions/KHR_materials_volume/thicknessFactor': 0.0,
+    'extensions/KHR_materials_volume/attenuationColor': [1.0, 1.0, 1.0],
+    'extensions/KHR_materials_iridescence/iridescenceFactor': 0.0,
+    'extensions/KHR_materials_iridescence/iridescenceIor': 1.3,
+    'extensions/KHR_materials_iridescence/iridescenceThicknessMinimum': 100.0,
+    'extensions/KHR_materials_iridescence/iridescenceThicknessMaximum': 400.0,
+    'extensions/KHR_materials_anisotropy/anisotropyStrength': 0.0,
+    'extensions/KHR_materials_anisotropy/anisotropyRotation': 0.0,
+    'extensions/KHR_materials_dispersion/dispersion': 0.0
+}
+
+def findSamples(paths) -> list:
+    '''
+    @brief Find glTF and glb files.
+    @param paths List of files or folders. Folders are searched recursively.
+    @return Sorted list of sample file paths.
+    '''
+    samples = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                for file in files:
+                    if file.endswith('.gltf') or file.endswith('.glb'):
+                        samples.append(os.path.join(root, file))
+        elif path.endswith('.gltf') or path.endswith('.glb'):
+            samples.append(path)
+    return sorted(samples)
+
+def getGLTFImageKey(textureInfo, gltfJson) -> str:
+    '''
+    @brief Get a key identifying the image bound by a glTF texture info entry.
+    @param textureInfo The texture info entry, e.g. a material's 'baseColorTexture'.
+    @param gltfJson The glTF document containing the texture.
+    @return The base name of the image uri. Images embedded as data URIs return a hash of the data,
+    and images stored in buffer views return the buffer view index. An empty string is returned if
+    the texture cannot be resolved.
+    '''
+    textures = gltfJson.get('textures', [])
+    images = gltfJson.get('images', [])
+    textureIndex = textureInfo.get('index', -1)
+    if textureIndex < 0 or textureIndex >= len(textures):
+        return ''
+    source = textures[textureIndex].get('source', -1)
+    if source < 0 or source >= len(images):
+        return ''
+    image = images[source]
+    uri = image.get('uri', '')
+    if uri.startswith('data:'):
+        return 'data:' + hashlib.sha1(uri.encode('utf-8')).hexdigest()
+    if uri:
+        return mx.FilePath(uri).getBaseName()
+    return 'bufferView:' + str(image.get('bufferView', ''))
+
+def flattenMaterial(material, gltfJson, path, parameters, bindings):
+    '''
+    @brief Flatten a glTF material into parameter values and texture bindings keyed by property path.
+    @param material The glTF material or a dictionary within it.
+    @param gltfJson The glTF document containing the material.
+    @param path The property path of the dictionary.
+    @param parameters Dictionary of property path to value to update.
+    @param bindings Dictionary of property path to image key to update.
+    '''
+    for key, value in material.items():
+        if key in ROUNDTRIP_SKIPPED_PROPERTIES:
+            continue
+        keyPath = path + '/' + key if path else key
+        if isinstance(value, dict):
+            if key.endswith('Texture') and 'index' in value:
+                bindings[keyPath] = getGLTFImageKey(value, gltfJson)
+                value = dict((k, v) for k, v in value.items() if k != 'index')
+            flattenMaterial(value, gltfJson, keyPath, parameters, bindings)
+        else:
+            parameters[keyPath] = value
+
+def getDefaultValue(path):
+    '''
+    @brief Get the glTF default value of a material property.
+    @param path The property path.
+    @return The default value, or None if the property has no default.
+    '''
+    if path in GLTF_MATERIAL_DEFAULTS:
+        return GLTF_MATERIAL_DEFAULTS[path]
+    if path.endswith('/texCoord'):
+        return 0
+    return None
+
+def valuesMatch(value1, value2, tolerance) -> bool:
+    '''
+    @brief Compare two glTF property values. Numbers are compared with a tolerance.
+    @param value1 The first value.
+    @param value2 The second value.
+    @param tolerance The maximum absolute difference between numbers.
+    @return True if the values match.
+    '''
+    if isinstance(value1, bool) or isinstance(value2, bool):
+        return value1 == value2
+    if isinstance(value1, (int, float)) and isinstance(value2, (int, float)):
+        return abs(value1 - value2) <= tolerance
+    if isinstance(value1, list) and isinstance(value2, list):
+        return len(value1) == len(value2) and all(valuesMatch(v1, v2, tolerance) for v1, v2 in zip(value1, value2))
+    return value1 == value2
+
+def compareMaterials(inputMaterial, inputJson, outputMaterial, outputJson, tolerance=1e-4) -> dict:
+    '''
+    @brief Compare the parameters and texture bindings of two glTF materials.
+    Properties which are missing from one material are compared against the glTF default value.
+    @param inputMaterial The original glTF material.
+    @param inputJson The glTF document containing the original material.
+    @param outputMaterial The round tripped glTF material. If None all properties are reported as missing.
+    @param outputJson The glTF document containing the round tripped material.
+    @param tolerance The maximum absolute difference between numbers.
+    @return Dictionary with counts of parameters and bindings compared, and a list of mismatches.
+    Each mismatch has the property 'path', 'input' and 'output' values.
+    '''
+    inputParameters, inputBindings = {}, {}
+    flattenMaterial(inputMaterial, inputJson, '', inputParameters, inputBindings)
+    outputParameters, outputBindings = {}, {}
+    if outputMaterial:
+        flattenMaterial(outputMaterial, outputJson, '', outputParameters, outputBindings)
+
+    parameterMismatches = []
+    for path in sorted(set(inputParameters) | set(outputParameters)):
+        inputValue = inputParameters.get(path, getDefaultValue(path))
+        outputValue = outputParameters.get(path, getDefaultValue(path))
+        if not valuesMatch(inputValue, outputValue, tolerance):
+            parameterMismatches.append({ 'path': path, 'input': inputValue, 'output': outputValue })
+
+    bindingMismatches = []
+    for path in sorted(set(inputBindings) | set(outputBindings)):
+        inputImage = inputBindings.get(path)
+        outputImage = outputBindings.get(path)
+        if inputImage != outputImage:
+            bindingMismatches.append({ 'path': path, 'input': inputImage, 'output': outputImage })
+
+    return {
+        'parameters': len(set(inputParameters) | set(outputParameters)),
+        'parameterMismatches': parameterMismatches,
+        'bindings': len(set(inputBindings) | set(outputBindings)),
+        'bindingMismatches': bindingMismatches
+    }
+
+def getShaderName(doc, materialName) -> str:
+    '''
+    @brief Get the name of the shader node connected to a MaterialX material node.
+    @param doc The MaterialX document.
+    @param materialName The material node name.
+    @return The shader node name, or an empty string if not found.
+    '''
+    materialNode = doc.getNode(materialName) if materialName else None
+    if not materialNode:
+        return ''
+    shaderNodes = mx.getShaderNodes(materialNode)
+    return shaderNodes[0].getName() if shaderNodes else ''
+
+def runRoundTrip(sampleFileName, outputFolder='', tolerance=1e-4) -> dict:
+    '''
+    @brief Convert a glTF sample to MaterialX and back to glTF, and compare the materials.
+    @param sampleFileName The glTF or glb file to convert.
+    @param outputFolder Optional folder to write the MaterialX and glTF results to.
+    @param tolerance The maximum absolute difference between compared numbers.
+    @return Dictionary result for the sample.
+    '''
+    result = { 'sample': sampleFileName, 'status': False, 'error': '', 'stages': {},
+               'materials': { 'input': 0, 'output': 0, 'missing': [] },
+               'parameters': 0, 'parameterMismatches': 0, 'bindings': 0, 'bindingMismatches': 0,
+               'mismatches': {} }
+
+    profiler = ConversionProfiler()
+    sampleFolder = mx.FilePath(os.path.abspath(sampleFileName)).getParentPath()
+
+    with profiler.phase('load'):
+        with open(sampleFileName, 'rb') as sampleFile:
+            gltfData = sampleFile.read()
+        try:
+            inputJson = Util.readGLTFData(gltfData)
+        except ValueError as err:
+            inputJson = None
+            result['error'] = 'Failed to parse glTF data: ' + str(err)
+
+    inputMaterials = inputJson.get('materials', []) if inputJson else []
+    result['materials']['input'] = len(inputMaterials)
+    if not inputMaterials:
+        if inputJson:
+            result['error'] = 'No materials found'
+        result['stages'] = dict((stage, phase['seconds']) for stage, phase in profiler.getPhases().items())
+        return result
+
+    readerOptions = GLTF2MtlxOptions()
+    readerOptions['debugOutput'] = False
+    reader = GLTF2MtlxReader()
+    reader.setOptions(readerOptions)
+    reader.setProfiler(profiler)
+    with profiler.phase('gltf2mtlx'):
+        doc = reader.convertJson(inputJson)
+    if not doc:
+        result['error'] = 'Failed to convert glTF to MaterialX'
+        result['stages'] = dict((stage, phase['seconds']) for stage, phase in profiler.getPhases().items())
+        return result
+
+    writerOptions = MTLX2GLTFOptions()
+    writerOptions['debugOutput'] = False
+    writerOptions['primsPerMaterial'] = False
+    writerOptions['searchPath'] = mx.FileSearchPath(sampleFolder.asString())
+    writer = MTLX2GLTFWriter()
+    writer.setOptions(writerOptions)
+    writer.setProfiler(profiler)
+    with profiler.phase('mtlx2gltf'):
+        # The writer reports progress which is not wanted in the summary
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            outputJson = writer.convertToJson(doc)
+    if outputJson is None:
+        result['error'] = 'Failed to convert MaterialX to glTF'
+        result['stages'] = dict((stage, phase['seconds']) for stage, phase in profiler.getPhases().items())
+        return result
+
+    with profiler.phase('compare'):
+        outputMaterials = dict((material.get('name', ''), material) for material in outputJson.get('materials', []))
+        result['materials']['output'] = len(outputMaterials)
+        for materialIndex, inputMaterial in enumerate(inputMaterials):
+            materialNames = reader.getMaterialNames()
+            materialName = materialNames[materialIndex] if materialIndex < len(materialNames) else None
+            outputMaterial = outputMaterials.get(getShaderName(doc, materialName))
+            if not outputMaterial:
+                result['materials']['missing'].append(inputMaterial.get('name', str(materialIndex)))
+            comparison = compareMaterials(inputMaterial, inputJson, outputMaterial, outputJson, tolerance)
+            result['parameters'] += comparison['parameters']
+            result['parameterMismatches'] += len(comparison['parameterMismatches'])
+            result['bindings'] += comparison['bindings']
+            result['bindingMismatches'] += len(comparison['bindingMismatches'])
+            if comparison['parameterMismatches'] or comparison['bindingMismatches']:
+                result['mismatches'][materialName if materialName else str(materialIndex)] = \
+                    comparison['parameterMismatches'] + comparison['bindingMismatches']
+
+    if outputFolder:
+        baseName = mx.FilePath(sampleFileName).getBaseName()
+        Util.writeMaterialXDoc(doc, os.path.join(outputFolder, baseName + '_roundtrip.mtlx'))
+        Util.writeGLTFFile(outputJson, os.path.join(outputFolder, baseName + '_roundtrip.gltf'))
+
+    phases = profiler.getPhases()
+    result['stages'] = dict((stage, phases[stage]['seconds']) for stage in ROUNDTRIP_STAGES if stage in phases)
+    result['status'] = True
+    return result
+
+def runRoundTrips(samples, outputFolder='', tolerance=1e-4) -> dict:
+    '''
+    @brief Run round trips over a list of samples.
+    @param samples List of glTF or glb files.
+    @param outputFolder Optional folder to write the MaterialX and glTF results to.
+    @param tolerance The maximum absolute difference between compared numbers.
+    @return Dictionary report with the environment, the tolerance, and a result per sample.
+    '''
+    results = []
+    for sample in samples:
+        results.append(runRoundTrip(sample, outputFolder, tolerance))
+
+    return {
+        'environment': { 'python': '%d.%d.%d' % sys.version_info[:3], 'materialx': mx.__version__ },
+        'tolerance': tolerance,
+        'results': results
+    }
+
+def formatSummaryTable(report, basePath='') -> str:
+    '''
+    @brief Format a round trip report as a Markdown table.
+    @param report The report returned by runRoundTrips().
+    @param basePath Optional path which sample names are made relative to.
+    @return The table string.
+    '''
+    columns = ['Sample', 'Materials'] + ['%s (ms)' % stage for stage in ROUNDTRIP_STAGES] + \
+              ['Parameters', 'Parameter mismatches', 'Bindings', 'Binding mismatches', 'Status']
+    lines = ['| ' + ' | '.join(columns) + ' |', '|' + '---|' * len(columns)]
+    for result in report['results']:
+        sample = os.path.relpath(result['sample'], basePath) if basePath else result['sample']
+        materials = '%d/%d' % (result['materials']['output'], result['materials']['input'])
+        stages = ['%.1f' % (result['stages'][stage] * 1000.0) if stage in result['stages'] else '-' for stage in ROUNDTRIP_STAGES]
+        status = 'OK' if result['status'] else result['error']
+        if result['status'] and (result['parameterMismatches'] or result['bindingMismatches'] or result['materials']['missing']):
+            status = 'Mismatch'
+        row = [sample, materials] + stages + [str(result['parameters']), str(result['parameterMismatches']),
+                                              str(result['bindings']), str(result['bindingMismatches']), status]
+        lines.append('| ' + ' | '.join(row) + ' |')
+    return '\n'.join(lines)
+
+def main():
+    '''
+    @brief Command line interface to run round trips over sample data.
+    '''
+    dataFolder = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+    parser = argparse.ArgumentParser(description='Convert glTF samples to MaterialX and back to glTF, timing each stage and comparing materials')
+    parser.add_argument(dest='paths', nargs='*', help='glTF or glb files, or folders to search for them. Default is the package data folder')
+    parser.add_argument('--outputFolder', dest='outputFolder', default='', help='Folder to write round tripped MaterialX and glTF files to. Default is to not write files')
+    parser.add_argument('--tolerance', dest='tolerance', type=float, default=1e-4, help='Maximum absolute difference between compared numbers. Default is 1e-4')
+    parser.add_argument('--output', dest='output', default='', help='File to write the JSON report to')
+    parser.add_argument('--table', dest='table', default='', help='File to write the Markdown summary table to. Default is to print the table')
+    opts = parser.parse_args()
+
+    samples = findSamples(opts.paths if opts.paths else [dataFolder])
+    if not samples:
+        print('No glTF samples found')
+        return 1
+    if opts.outputFolder and not os.path.exists(opts.outputFolder):
+        os.makedirs(opts.outputFolder)
+
+    report = runRoundTrips(samples, opts.outputFolder, opts.tolerance)
+
+    table = formatSummaryTable(report, os.path.commonpath([os.path.abspath(sample) for sample in samples]) if len(samples) > 1 else '')
+    if opts.table:
+        with open(opts.table, 'w') as tableFile:
+            tableFile.write(table + '\n')
+        print('Wrote summary table to: ' + opts.table)
+    else:
+        print(table)
+
+    if opts.output:
+        with open(opts.output, 'w') as outputFile:
+            json.dump(report, outputFile, indent=2)
+        print('Wrote round trip report to: ' + opts.output)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
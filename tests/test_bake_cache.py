@@ -0,0 +1,107 @@
+'''
+Tests for caching baked materials with TextureBakeCache.
+'''
+import os
+
+import pytest
+import MaterialX as mx
+
+from materialxgltf.core import TextureBakeCache, ConversionProfiler, MTLX2GLTFWriter, MTLX2GLTFOptions, CPUTextureBaker, Util
+
+SETTINGS = [ 4, 4, False, False, True, True ]
+
+def createDocument(roughness='0.5'):
+    '''
+    @brief Create a document with one gltf_pbr material whose roughness is connected to a constant node.
+    '''
+    doc, libFiles = Util.createMaterialXDoc()
+    constant = doc.addNode('constant', 'roughness_value', 'float')
+    constant.setInputValue('value', roughness, 'float')
+    shader = doc.addNode('gltf_pbr', 'test_shader', 'surfaceshader')
+    shader.addInput('roughness', 'float').setConnectedNode(constant)
+    material = doc.addMaterialNode('test_material')
+    material.setConnectedNode('surfaceshader', shader)
+    return doc, material
+
+def addEntry(cache, key, folder, size):
+    '''
+    @brief Add an entry holding a document which references one image of a given size.
+    '''
+    os.makedirs(folder, exist_ok=True)
+    with open(os.path.join(folder, key + '.png'), 'wb') as imageFile:
+        imageFile.write(b'\0' * size)
+    bakedDoc = mx.createDocument()
+    image = bakedDoc.addNode('image', 'baked_image', 'float')
+    image.setInputValue('file', key + '.png', 'filename')
+    bakedFileName = os.path.join(folder, key + '.mtlx')
+    mx.writeToXmlFile(bakedDoc, bakedFileName)
+    assert cache.addEntry(key, bakedFileName)
+
+def test_keys_depend_on_content_and_settings(tmp_path):
+    cache = TextureBakeCache(str(tmp_path / 'cache'))
+    doc, material = createDocument()
+    key = cache.computeKey(material, SETTINGS)
+    sameDoc, sameMaterial = createDocument()
+    assert key == cache.computeKey(sameMaterial, SETTINGS)
+    changedDoc, changedMaterial = createDocument('0.25')
+    assert key != cache.computeKey(changedMaterial, SETTINGS)
+    assert key != cache.computeKey(material, [ 8, 8 ] + SETTINGS[2:])
+
+def test_miss_and_hit(tmp_path):
+    cache = TextureBakeCache(str(tmp_path / 'cache'))
+    assert not cache.hasEntry('a')
+    assert cache.getEntry('a', str(tmp_path / 'output')) is None
+
+    addEntry(cache, 'a', str(tmp_path / 'baked'), 16)
+    assert cache.hasEntry('a')
+    bakedDoc = cache.getEntry('a', str(tmp_path / 'output'))
+    assert bakedDoc
+    fileName = bakedDoc.getNode('baked_image').getInputValue('file')
+    assert os.path.normpath(fileName) == os.path.normpath(str(tmp_path / 'output' / 'a.png'))
+    assert os.path.getsize(fileName) == 16
+
+def getEntrySize(cache, key):
+    entryFolder = os.path.join(cache.getFolder(), key)
+    return sum(os.path.getsize(os.path.join(entryFolder, fileName)) for fileName in os.listdir(entryFolder))
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = TextureBakeCache(str(tmp_path / 'cache'))
+    for index, key in enumerate(['a', 'b', 'c']):
+        addEntry(cache, key, str(tmp_path / 'baked'), 1000)
+        os.utime(os.path.join(cache.getFolder(), key), (index, index))
+    # Room for three entries
+    cache = TextureBakeCache(cache.getFolder(), maxSize=3 * getEntrySize(cache, 'a'))
+    assert cache.evict() == []
+
+    # Using an entry makes it the most recently used
+    assert cache.getEntry('a', str(tmp_path / 'output'))
+    addEntry(cache, 'd', str(tmp_path / 'baked'), 1000)
+    os.utime(os.path.join(cache.getFolder(), 'd'), (10, 10))
+    assert cache.evict(keep=['b']) == ['c']
+    assert cache.hasEntry('b')
+    assert not cache.hasEntry('c')
+
+    cache = TextureBakeCache(cache.getFolder(), maxSize=0)
+    assert sorted(cache.evict(keep=['a'])) == ['b', 'd']
+    assert cache.hasEntry('a')
+
+@pytest.mark.skipif(not CPUTextureBaker.isAvailable(), reason='NumPy is not available')
+def test_writer_reuses_cached_materials(tmp_path):
+    options = MTLX2GLTFOptions()
+    options['cpuBake'] = True
+    options['bakeCache'] = str(tmp_path / 'cache')
+    options['debugOutput'] = False
+    for roughness, hits, misses in [ ('0.5', 0, 1), ('0.5', 1, 0), ('0.25', 0, 1) ]:
+        doc, material = createDocument(roughness)
+        writer = MTLX2GLTFWriter()
+        writer.setOptions(options)
+        profiler = ConversionProfiler()
+        writer.setProfiler(profiler)
+        fileName = str(tmp_path / 'baked.mtlx')
+        assert writer.bakeTextures(doc, False, 4, 4, True, False, False, fileName)
+        counters = profiler.getCounters()
+        assert (counters.get('bakeCacheHits', 0), counters.get('bakeCacheMisses', 0)) == (hits, misses)
+
+        bakedDoc = mx.createDocument()
+        mx.readFromXmlFile(bakedDoc, fileName)
+        assert bakedDoc.getNode('test_shader').getInputValue('roughness') == pytest.approx(float(roughness))
@@ -0,0 +1,183 @@
+'''
+Tests for baking pattern graphs on the CPU with CPUTextureBaker.
+'''
+import types
+
+import pytest
+import MaterialX as mx
+
+np = pytest.importorskip('numpy')
+
+import materialxgltf.core as core
+from materialxgltf.core import CPUTextureBaker, MTLX2GLTFWriter, MTLX2GLTFOptions, Util
+
+def createDocument():
+    '''
+    @brief Create a document with one gltf_pbr material.
+    @return The document and shader node.
+    '''
+    doc, libFiles = Util.createMaterialXDoc()
+    shader = doc.addNode('gltf_pbr', 'test_shader', 'surfaceshader')
+    material = doc.addMaterialNode('test_material')
+    material.setConnectedNode('surfaceshader', shader)
+    return doc, shader
+
+def addNode(doc, category, nodeType, inputs):
+    '''
+    @brief Add a node with input values given as (name, type, value string).
+    '''
+    node = doc.addNode(category, category + str(len(doc.getNodes())), nodeType)
+    for name, inputType, value in inputs:
+        node.setInputValue(name, value, inputType)
+    return node
+
+def connect(shader, inputName, node):
+    shader.addInput(inputName, node.getType()).setConnectedNode(node)
+
+def bake(doc, folder, width=4, height=4):
+    '''
+    @brief Bake a document and read back the baked document.
+    @return The baker, and the baked document or None if baking failed.
+    '''
+    baker = CPUTextureBaker(width, height)
+    fileName = str(folder / 'baked.mtlx')
+    if not baker.bakeAllMaterials(doc, fileName):
+        return baker, None
+    bakedDoc = mx.createDocument()
+    mx.readFromXmlFile(bakedDoc, fileName)
+    return baker, bakedDoc
+
+def readBakedImage(bakedInput, folder):
+    output = bakedInput.getConnectedOutput()
+    node = output.getConnectedNode()
+    if node.getCategory() == 'normalmap':
+        node = node.getInput('in').getConnectedNode()
+    return CPUTextureBaker(1, 1, searchPath=mx.FileSearchPath(str(folder)))._loadImage(node.getInputValue('file'))
+
+def test_mix_of_constants_is_baked_to_a_value(tmp_path):
+    doc, shader = createDocument()
+    mix = addNode(doc, 'mix', 'float', [('fg', 'float', '0.2'), ('bg', 'float', '0.6'), ('mix', 'float', '0.25')])
+    connect(shader, 'roughness', mix)
+    baker, bakedDoc = bake(doc, tmp_path)
+    assert bakedDoc, baker.getError()
+    bakedShader = bakedDoc.getNode('test_shader')
+    assert bakedShader.getInputValue('roughness') == pytest.approx(0.5)
+    assert not list(tmp_path.glob('*.png'))
+
+def test_values_equal_to_the_default_are_omitted(tmp_path):
+    doc, shader = createDocument()
+    # The gltf_pbr roughness default is 1
+    connect(shader, 'roughness', addNode(doc, 'constant', 'float', [('value', 'float', '1')]))
+    connect(shader, 'metallic', addNode(doc, 'constant', 'float', [('value', 'float', '0.25')]))
+    shader.setInputValue('occlusion', 0.5)
+    baker, bakedDoc = bake(doc, tmp_path)
+    assert bakedDoc, baker.getError()
+    bakedShader = bakedDoc.getNode('test_shader')
+    assert bakedShader.getInput('roughness') is None
+    assert bakedShader.getInputValue('metallic') == pytest.approx(0.25)
+    # Unconnected inputs are copied
+    assert bakedShader.getInputValue('occlusion') == pytest.approx(0.5)
+
+def test_uniform_colors_are_written_linear(tmp_path):
+    doc, shader = createDocument()
+    constant = addNode(doc, 'constant', 'color3', [('value', 'color3', '0.5, 0.5, 0.5')])
+    constant.getInput('value').setColorSpace('srgb_texture')
+    connect(shader, 'base_color', constant)
+    baker, bakedDoc = bake(doc, tmp_path)
+    assert bakedDoc, baker.getError()
+    bakedShader = bakedDoc.getNode('test_shader')
+    assert list(bakedShader.getInputValue('base_color').asTuple()) == pytest.approx([0.21404] * 3, abs=1e-4)
+
+@pytest.mark.parametrize('category, expected', [
+    ('ramplr', [[0.125, 0.375, 0.625, 0.875]] * 4),
+    ('ramptb', [[0.875] * 4, [0.625] * 4, [0.375] * 4, [0.125] * 4]),
+])
+def test_ramps_are_baked_to_images(tmp_path, category, expected):
+    doc, shader = createDocument()
+    if category == 'ramplr':
+        inputs = [('valuel', 'float', '0'), ('valuer', 'float', '1')]
+    else:
+        inputs = [('valueb', 'float', '0'), ('valuet', 'float', '1')]
+    connect(shader, 'roughness', addNode(doc, category, 'float', inputs))
+    baker, bakedDoc = bake(doc, tmp_path)
+    assert bakedDoc, baker.getError()
+    bakedShader = bakedDoc.getNode('test_shader')
+    data = readBakedImage(bakedShader.getInput('roughness'), tmp_path)
+    assert data[..., 0] == pytest.approx(np.array(expected), abs=1.0 / 255.0)
+
+def test_images_are_sampled(tmp_path):
+    source = np.array([[[0.0], [1.0 / 3.0]], [[2.0 / 3.0], [1.0]]], dtype=np.float32)
+    assert CPUTextureBaker(2, 2).writeImage(source, str(tmp_path / 'source.png'))
+    doc, shader = createDocument()
+    image = addNode(doc, 'image', 'float', [('file', 'filename', 'source.png'), ('filtertype', 'string', 'closest')])
+    connect(shader, 'roughness', image)
+    baker = CPUTextureBaker(2, 2, searchPath=mx.FileSearchPath(str(tmp_path)))
+    fileName = str(tmp_path / 'baked.mtlx')
+    assert baker.bakeAllMaterials(doc, fileName), baker.getError()
+    bakedDoc = mx.createDocument()
+    mx.readFromXmlFile(bakedDoc, fileName)
+    data = readBakedImage(bakedDoc.getNode('test_shader').getInput('roughness'), tmp_path)
+    assert data == pytest.approx(source, abs=1.0 / 255.0)
+
+# Texel values 0 and 1 sampled outside the 0 to 1 range with nearest filtering
+@pytest.mark.parametrize('addressMode, expected', [
+    ('periodic', [1.0, 0.0]),
+    ('mirror', [0.0, 1.0]),
+    ('clamp', [0.0, 1.0]),
+    ('constant', [0.5, 0.5]),
+])
+def test_address_modes(addressMode, expected):
+    data = np.array([[[0.0], [1.0]]], dtype=np.float32)
+    texcoord = np.array([[[-0.25, 0.5], [1.25, 0.5]]], dtype=np.float32)
+    result = CPUTextureBaker.sampleImage(data, texcoord, addressMode, 'clamp', 'closest', np.full((1,), 0.5, dtype=np.float32))
+    assert result[0, :, 0] == pytest.approx(expected)
+
+def test_normal_maps_are_recreated(tmp_path):
+    doc, shader = createDocument()
+    constant = addNode(doc, 'constant', 'vector3', [('value', 'vector3', '0.5, 0.5, 1')])
+    normalMap = addNode(doc, 'normalmap', 'vector3', [('scale', 'float', '0.5')])
+    normalMap.addInput('in', 'vector3').setConnectedNode(constant)
+    connect(shader, 'normal', normalMap)
+    baker, bakedDoc = bake(doc, tmp_path)
+    assert bakedDoc, baker.getError()
+    bakedShader = bakedDoc.getNode('test_shader')
+
+    # The value before the normal map is baked to an image, even if uniform
+    bakedNormalMap = bakedShader.getInput('normal').getConnectedOutput().getConnectedNode()
+    assert bakedNormalMap.getCategory() == 'normalmap'
+    assert bakedNormalMap.getInputValue('scale') == pytest.approx(0.5)
+    data = readBakedImage(bakedShader.getInput('normal'), tmp_path)
+    assert data[0, 0] == pytest.approx([0.5, 0.5, 1.0], abs=1.0 / 255.0)
+
+def test_unsupported_graphs_are_not_baked(tmp_path):
+    doc, shader = createDocument()
+    extract = addNode(doc, 'extract', 'float', [('index', 'integer', '0')])
+    extract.addInput('in', 'vector3').setConnectedNode(addNode(doc, 'position', 'vector3', []))
+    connect(shader, 'roughness', extract)
+    baker, bakedDoc = bake(doc, tmp_path)
+    assert bakedDoc is None
+    assert 'position' in baker.getError()
+    assert not list(tmp_path.iterdir())
+
+def test_gpu_baker_is_used_when_cpu_baking_fails(tmp_path, monkeypatch):
+    doc, shader = createDocument()
+    noise = addNode(doc, 'noise2d', 'float', [])
+    connect(shader, 'roughness', noise)
+
+    # Record the use of the GPU baker, without creating one
+    created = []
+    def create(*args):
+        created.append(args)
+        return None
+    textureBaker = types.SimpleNamespace(create=create)
+    monkeypatch.setattr(core, 'mx_render_glsl', types.SimpleNamespace(TextureBaker=textureBaker))
+    monkeypatch.setattr(core, 'mx_render_msl', types.SimpleNamespace(TextureBaker=textureBaker), raising=False)
+
+    options = MTLX2GLTFOptions()
+    options['cpuBake'] = True
+    options['debugOutput'] = False
+    writer = MTLX2GLTFWriter()
+    writer.setOptions(options)
+    writer.bakeTextures(doc, False, 4, 4, True, False, False, str(tmp_path / 'baked.mtlx'))
+    assert len(created) == 1
+    assert 'CPU baker cannot bake' in writer.getLog()
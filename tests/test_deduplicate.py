@@ -0,0 +1,50 @@
+'''
+Tests for deduplication of materials when converting glTF to MaterialX.
+'''
+import MaterialX as mx
+from materialxgltf.core import GLTF2MtlxReader, GLTF2MtlxOptions
+
+def createGLTFJson(colorMaterials):
+    '''
+    @brief Create a glTF document with two identical textured materials, each used by one mesh.
+    @param colorMaterials Indices of the materials whose primitive has a COLOR attribute.
+    '''
+    meshes = []
+    nodes = []
+    for index, name in enumerate(['A', 'B']):
+        attributes = { 'POSITION' : 0 }
+        if index in colorMaterials:
+            attributes['COLOR'] = 1
+        meshes.append({ 'name' : 'm' + name, 'primitives' : [ { 'attributes' : attributes, 'material' : index } ] })
+        nodes.append({ 'name' : name, 'mesh' : index })
+    materials = [ { 'name' : 'red', 'pbrMetallicRoughness' : { 'baseColorTexture' : { 'index' : 0 } } } for _ in range(2) ]
+    return { 'asset' : { 'version' : '2.0' }, 'scene' : 0, 'scenes' : [ { 'nodes' : [0, 1] } ],
+             'nodes' : nodes, 'meshes' : meshes, 'materials' : materials,
+             'textures' : [ { 'source' : 0 } ], 'images' : [ { 'uri' : 'red.png' } ] }
+
+def convert(gltfJson):
+    options = GLTF2MtlxOptions()
+    options['createAssignments'] = True
+    options['deduplicateMaterials'] = True
+    reader = GLTF2MtlxReader()
+    reader.setOptions(options)
+    doc = reader.convertJson(gltfJson)
+    assert doc
+    return doc, reader.getMaterialNames()
+
+def test_identical_materials_are_merged():
+    doc, materialNames = convert(createGLTFJson([]))
+    assert materialNames[0] == materialNames[1]
+    assert len(doc.getMaterialNodes()) == 1
+
+def test_vertex_color_use_prevents_merge():
+    doc, materialNames = convert(createGLTFJson([1]))
+    assert materialNames[0] != materialNames[1]
+    assert len(doc.getMaterialNodes()) == 2
+
+    # Only the material used with vertex colors multiplies its base color by them
+    for materialIndex, materialName in enumerate(materialNames):
+        shader = mx.getShaderNodes(doc.getNode(materialName))[0]
+        baseColorNode = shader.getInput('base_color').getConnectedNode()
+        geomcolorInput = baseColorNode.getInput('geomcolor')
+        assert (geomcolorInput is not None and geomcolorInput.getNodeName() != '') == (materialIndex == 1)
@@ -0,0 +1,35 @@
+'''
+Tests for deduplication of materials when converting MaterialX to glTF.
+'''
+from materialxgltf.core import MTLX2GLTFWriter
+
+def createGLTFJson():
+    '''
+    @brief Create a glTF document with two materials which only differ by name. Each references its
+    own texture, image and sampler entries, which have the same content.
+    '''
+    return { 'materials' : [ { 'name' : name, 'pbrMetallicRoughness' : { 'baseColorTexture' : { 'index' : index } } }
+                             for index, name in enumerate(['A', 'B']) ],
+             'textures' : [ { 'name' : 'tA', 'source' : 0, 'sampler' : 0 }, { 'name' : 'tB', 'source' : 1, 'sampler' : 1 } ],
+             'images' : [ { 'uri' : 'red.png' }, { 'uri' : 'red.png' } ],
+             'samplers' : [ { 'wrapS' : 33071 }, { 'wrapS' : 33071 } ],
+             'meshes' : [ { 'primitives' : [ { 'attributes' : { 'POSITION' : 0 }, 'material' : index } ] } for index in range(2) ] }
+
+def test_unreferenced_entries_are_removed():
+    gltfJson = createGLTFJson()
+    assert MTLX2GLTFWriter().deduplicateMaterials(gltfJson) == 1
+    assert [material['name'] for material in gltfJson['materials']] == ['A']
+    assert [primitive['material'] for mesh in gltfJson['meshes'] for primitive in mesh['primitives']] == [0, 0]
+    assert gltfJson['textures'] == [ { 'name' : 'tA', 'source' : 0, 'sampler' : 0 } ]
+    assert len(gltfJson['images']) == 1
+    assert len(gltfJson['samplers']) == 1
+
+def test_aliases_are_per_writer():
+    writer = MTLX2GLTFWriter()
+    writer.deduplicateMaterials(createGLTFJson())
+    assert writer.getMaterialAliases() == { 'B' : 'A' }
+    assert MTLX2GLTFWriter().getMaterialAliases() == {}
+
+    # Aliases are only kept for the last document
+    writer.deduplicateMaterials({ 'materials' : [ { 'name' : 'C' } ] })
+    assert writer.getMaterialAliases() == {}
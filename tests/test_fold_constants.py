@@ -0,0 +1,83 @@
+'''
+Tests for replacing pattern graphs which evaluate to constants by values.
+'''
+import pytest
+import MaterialX as mx
+
+np = pytest.importorskip('numpy')
+
+from materialxgltf.core import CPUTextureBaker, MTLX2GLTFWriter, MTLX2GLTFOptions, Util
+
+def createDocument():
+    '''
+    @brief Create a document with one gltf_pbr material.
+    @return The document and shader node.
+    '''
+    doc, libFiles = Util.createMaterialXDoc()
+    shader = doc.addNode('gltf_pbr', 'test_shader', 'surfaceshader')
+    material = doc.addMaterialNode('test_material')
+    material.setConnectedNode('surfaceshader', shader)
+    return doc, shader
+
+def fold(doc):
+    options = MTLX2GLTFOptions()
+    options['debugOutput'] = False
+    writer = MTLX2GLTFWriter()
+    writer.setOptions(options)
+    return writer.foldConstants(doc)
+
+def evaluate(port):
+    return list(CPUTextureBaker(2, 2)._evaluateConstant(port))
+
+def test_constant_graphs_are_folded():
+    doc, shader = createDocument()
+    constant = doc.addNode('constant', 'color', 'color3')
+    constant.setInputValue('value', mx.Color3(0.5, 0.5, 0.5))
+    constant.getInput('value').setColorSpace('srgb_texture')
+    mix = doc.addNode('mix', 'mix_color', 'color3')
+    mix.addInput('fg', 'color3').setConnectedNode(constant)
+    mix.setInputValue('bg', mx.Color3(0.0, 0.0, 0.0))
+    mix.setInputValue('mix', 0.5)
+    baseColor = shader.addInput('base_color', 'color3')
+    baseColor.setConnectedNode(mix)
+
+    assert fold(doc) == 1
+    assert not baseColor.getConnectedNode()
+    assert baseColor.getActiveColorSpace() == ''
+    assert list(baseColor.getValue().asTuple()) == pytest.approx([0.5 * 0.21404] * 3, abs=1e-4)
+
+def test_varying_and_image_graphs_are_not_folded():
+    doc, shader = createDocument()
+    ramp = doc.addNode('ramplr', 'ramp', 'float')
+    shader.addInput('roughness', 'float').setConnectedNode(ramp)
+    image = doc.addNode('image', 'metallic_image', 'float')
+    image.setInputValue('file', 'missing.png', 'filename')
+    shader.addInput('metallic', 'float').setConnectedNode(image)
+
+    assert fold(doc) == 0
+    assert shader.getInput('roughness').getConnectedNode() == ramp
+    assert shader.getInput('metallic').getConnectedNode() == image
+
+def test_inputs_in_srgb_graphs_keep_their_value():
+    doc, shader = createDocument()
+    graph = doc.addNodeGraph('srgb_graph')
+    graph.setColorSpace('srgb_texture')
+    # The constant value inherits the sRGB color space of the graph
+    constant = graph.addNode('constant', 'color', 'color3')
+    constant.setInputValue('value', mx.Color3(0.5, 0.5, 0.5))
+    image = graph.addNode('image', 'color_image', 'color3')
+    image.setInputValue('file', 'missing.png', 'filename')
+    multiply = graph.addNode('multiply', 'tint', 'color3')
+    multiply.addInput('in1', 'color3').setConnectedNode(image)
+    tint = multiply.addInput('in2', 'color3')
+    tint.setConnectedNode(constant)
+    graph.addOutput('out', 'color3').setConnectedNode(multiply)
+    shader.addInput('base_color', 'color3').setConnectedOutput(graph.getOutput('out'))
+    expected = evaluate(tint)
+    assert expected == pytest.approx([0.21404] * 3, abs=1e-4)
+
+    # Only the input of the multiply node is folded, as the image is not constant
+    assert fold(doc) == 1
+    assert not tint.getConnectedNode()
+    assert tint.getActiveColorSpace() == 'lin_rec709'
+    assert evaluate(tint) == pytest.approx(expected, abs=1e-6)
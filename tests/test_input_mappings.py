@@ -0,0 +1,56 @@
+'''
+Tests for writing gltf_pbr inputs to glTF using GLTF_PBR_INPUT_MAPPINGS.
+'''
+import MaterialX as mx
+from materialxgltf.core import MTLX2GLTFWriter, MTLX2GLTFOptions, Util
+
+def createDocument(inputs):
+    '''
+    @brief Create a document with one gltf_pbr material.
+    @param inputs List of (input name, type, value string) to set on the shader.
+    '''
+    doc, libFiles = Util.createMaterialXDoc()
+    shader = doc.addNode('gltf_pbr', 'test_shader', 'surfaceshader')
+    for name, inputType, value in inputs:
+        shader.setInputValue(name, value, inputType)
+    material = doc.addMaterialNode('test_material')
+    material.setConnectedNode('surfaceshader', shader)
+    return doc, shader
+
+def convert(doc):
+    options = MTLX2GLTFOptions()
+    options['debugOutput'] = False
+    writer = MTLX2GLTFWriter()
+    writer.setOptions(options)
+    gltfJson = writer.convertToJson(doc)
+    assert gltfJson
+    return gltfJson
+
+def test_alpha_cutoff_is_written_for_masked_materials():
+    doc, shader = createDocument([('alpha_mode', 'integer', '1'), ('alpha_cutoff', 'float', '0.25')])
+    material = convert(doc)['materials'][0]
+    assert material['alphaMode'] == 'MASK'
+    assert material['alphaCutoff'] == 0.25
+
+    shader.setInputValue('alpha_mode', '2', 'integer')
+    material = convert(doc)['materials'][0]
+    assert material['alphaMode'] == 'BLEND'
+    assert 'alphaCutoff' not in material
+
+def test_volume_values_are_typed():
+    doc, shader = createDocument([('thickness', 'float', '0.5'), ('attenuation_color', 'color3', '0.5, 0.25, 1')])
+    gltfJson = convert(doc)
+    volume = gltfJson['materials'][0]['extensions']['KHR_materials_volume']
+    assert volume == { 'thicknessFactor' : 0.5, 'attenuationColor' : [0.5, 0.25, 1.0] }
+    assert 'KHR_materials_volume' in gltfJson['extensionsUsed']
+
+def test_clearcoat_normal_is_written_to_clearcoat():
+    doc, shader = createDocument([('clearcoat', 'float', '1')])
+    image = doc.addNode('gltf_normalmap', 'clearcoat_normal_image', 'vector3')
+    image.setInputValue('file', 'normal.png', 'filename')
+    shader.addInput('clearcoat_normal', 'vector3').setConnectedNode(image)
+    gltfJson = convert(doc)
+    clearcoat = gltfJson['materials'][0]['extensions']['KHR_materials_clearcoat']
+    assert clearcoat['clearcoatFactor'] == 1.0
+    assert gltfJson['images'][gltfJson['textures'][clearcoat['clearcoatNormalTexture']['index']]['source']]['uri'] == 'normal.png'
+    assert 'KHR_materials_volume' not in gltfJson['materials'][0]['extensions']